@@ -5,9 +5,10 @@ import json
 import os
 import time
 import uuid
+from collections import deque
 from typing import Any, Dict, List, Optional
 
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Depends
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 from fastapi.responses import Response
@@ -19,11 +20,15 @@ from prometheus_client import (
     CollectorRegistry,
     generate_latest,
 )
+from prometheus_client.core import CounterMetricFamily
 from pydantic import BaseModel, Field
 import requests
 from fastapi.responses import StreamingResponse
 
+from packages.memory.olympus_memory import blobs as blobcodec
 from packages.memory.olympus_memory.db import MemoryDB
+from packages.memory.olympus_memory.cache import CacheSweeper
+from packages.memory.olympus_memory.retention import RetentionWorker
 from packages.plan.olympus_plan.models import (
     CapabilityRef,
     Guard,
@@ -32,7 +37,8 @@ from packages.plan.olympus_plan.models import (
     PlanState,
     Step,
 )
-from apps.worker.olympus_worker.main import PlanExecutor
+from apps.worker.olympus_worker.main import PLAN_LEASE_MS, PlanExecutor
+from apps.worker.olympus_worker.queue_worker import enqueue_plan
 from packages.tools.olympus_tools.fs import ConsentToken
 from .settings import get_settings
 from .middleware import (
@@ -43,13 +49,18 @@ from .middleware import (
 )
 from .cors import build_cors_kwargs
 import asyncio
-from packages.llm.olympus_llm.router import LLMRouter
+from packages.llm.olympus_llm.router import TOKEN_COUNTER, USD_COUNTER, LLMRouter
 from .auth import get_current_user
 from .planner import propose_plan, reflect_and_revise
 from .nl_agent import handle_chat_turn
 
 APP_NAME = "Olympus API"
 ASK_BEFORE_DOING = os.getenv("APP_ASK_BEFORE_DOING", "true").lower() == "true"
+# "inline": /v1/plan/{id}/run executes in this process; "queue": hand steps to `--daemon` workers
+EXEC_MODE = os.getenv("OLY_EXEC_MODE", "inline").lower()
+SSE_POLL_MS = int(os.getenv("OLY_SSE_POLL_MS", "2000"))  # DB re-check for events from other processes
+SSE_KEEPALIVE_S = 15
+RECOVER_ON_STARTUP = os.getenv("OLY_RECOVER_ON_STARTUP", "true").lower() in ("1", "true", "yes")
 
 
 # ---------- Logging ----------
@@ -80,6 +91,26 @@ LAT = Histogram(
 )
 CIRCUIT = Gauge("circuit_open", "Breaker (compat)", registry=REG)
 QUEUE_DEPTH = Gauge("queue_depth", "In-flight requests", registry=REG)
+DB_LOCK_WAIT_MAX = Gauge(
+    "db_lock_wait_seconds_max", "Longest single DB connection wait", ["kind"], registry=REG
+)
+DB_READ_POOL = Gauge(
+    "db_read_pool_connections", "Read pool connections", ["state"], registry=REG
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_stream_subscribers", "Open plan event streams (SSE)", registry=REG
+)
+STEP_QUEUE = Gauge(
+    "step_queue_depth", "Queued plan steps by lease state", ["state"], registry=REG
+)
+DB_RECLAIMED = Counter(
+    "db_retention_reclaimed_bytes_total", "Disk space reclaimed by retention passes", registry=REG
+)
+DB_PRUNED = Counter(
+    "db_retention_deleted_total", "Rows removed by retention passes", ["kind"], registry=REG
+)
+DB_SIZE = Gauge("db_size_bytes", "DB file size including WAL", registry=REG)
+CACHE_SIZE = Gauge("cache_items", "cache_items table size (unit=l1_entries: in-process L1)", ["unit"], registry=REG)
 
 # ---------- App ----------
 app = FastAPI(title=APP_NAME)
@@ -146,7 +177,91 @@ DB = MemoryDB()
 EXECUTOR = PlanExecutor(db=DB)
 ROUTER = LLMRouter()
 
+
+def _record_retention(report: Dict[str, Any]) -> None:
+    DB_RECLAIMED.inc(report["reclaimed_bytes"])
+    DB_PRUNED.labels(kind="events").inc(sum(report["events_pruned"].values()))
+    DB_PRUNED.labels(kind="plans_archived").inc(report["plans_archived"])
+    DB_PRUNED.labels(kind="blobs").inc(report["blobs_deleted"])
+
+
+class _DbCounters:
+    """
+    MemoryDB's cumulative totals (cache lookups and removals, lock waits) as counters:
+    MemoryDB keeps the running totals, so they are read at scrape time rather than
+    mirrored into Gauges.
+    """
+
+    def _families(self):
+        return (
+            CounterMetricFamily("cache_requests", "cache_get lookups by result", labels=["result"]),
+            CounterMetricFamily("cache_evictions", "cache_items rows removed by reason", labels=["reason"]),
+            CounterMetricFamily(
+                "db_lock_wait_seconds", "Cumulative time spent waiting for a DB connection", labels=["kind"]
+            ),
+            CounterMetricFamily("db_lock_acquisitions", "DB connection acquisitions", labels=["kind"]),
+        )
+
+    def describe(self):
+        return self._families()
+
+    def collect(self):
+        lookups, removed, lock_wait, acquired = self._families()
+        cs = DB.cache_stats()
+        for result, key in (("hit", "hits"), ("miss", "misses"), ("l1_hit", "l1_hits")):
+            lookups.add_metric([result], cs[key])
+        for reason in ("expired", "evicted"):
+            removed.add_metric([reason], cs[reason])
+        for kind, d in DB.pool_stats()["locks"].items():
+            lock_wait.add_metric([kind], d["wait_seconds_total"])
+            acquired.add_metric([kind], d["acquisitions"])
+        return [lookups, removed, lock_wait, acquired]
+
+
+REG.register(_DbCounters())
+RETENTION = RetentionWorker(DB, on_report=_record_retention)
+CACHE_SWEEPER = CacheSweeper(DB)
+
 # ---------- Routes ----------
+_BACKGROUND: set = set()
+
+
+async def _recover_loop():
+    # Every lease period, since an executor that just died (possibly this process's
+    # predecessor) keeps a fresh heartbeat for up to PLAN_LEASE_MS. Claims make it safe
+    # for several API workers to run this side by side.
+    while True:
+        task = asyncio.create_task(EXECUTOR.recover_interrupted())
+        _BACKGROUND.add(task)
+        task.add_done_callback(_BACKGROUND.discard)
+        await asyncio.sleep(PLAN_LEASE_MS / 1000.0)
+
+
+@app.on_event("startup")
+async def _recover_interrupted_plans():
+    # Inline mode: this process is an executor, so resume plans whose executor died
+    # mid-run. In queue mode the --daemon workers do this themselves.
+    if EXEC_MODE == "inline" and RECOVER_ON_STARTUP:
+        app.state.recover_task = asyncio.create_task(_recover_loop())
+
+
+@app.on_event("shutdown")
+async def _stop_recovery():
+    task = getattr(app.state, "recover_task", None)
+    if task is not None:
+        task.cancel()
+
+
+@app.on_event("startup")
+async def _start_maintenance():
+    RETENTION.start()  # no-op when OLY_RETENTION_INTERVAL_S=0
+    CACHE_SWEEPER.start()  # no-op when OLY_CACHE_SWEEP_INTERVAL_S=0
+
+
+@app.on_event("shutdown")
+async def _stop_maintenance():
+    RETENTION.stop()
+    CACHE_SWEEPER.stop()
 
 
 @app.get("/healthz")
@@ -159,8 +274,27 @@ def health():
     return {"status": "ok"}
 
 
+def _export_db_stats() -> None:
+    stats = DB.pool_stats()
+    for kind, d in stats["locks"].items():
+        DB_LOCK_WAIT_MAX.labels(kind=kind).set(d["wait_seconds_max"])
+    DB_READ_POOL.labels(state="size").set(stats["read_pool_size"])
+    DB_READ_POOL.labels(state="open").set(stats["read_pool_open"])
+    DB_READ_POOL.labels(state="in_use").set(stats["read_pool_in_use"])
+    for state, n in DB.queue_stats().items():
+        STEP_QUEUE.labels(state=state).set(n)
+    EVENT_SUBSCRIBERS.set(DB.bus.subscribers())
+    st = DB.storage_stats()
+    DB_SIZE.set(st["db_bytes"] + st["wal_bytes"])
+    cs = DB.cache_stats()
+    CACHE_SIZE.labels(unit="entries").set(cs["entries"])
+    CACHE_SIZE.labels(unit="bytes").set(cs["bytes"])
+    CACHE_SIZE.labels(unit="l1_entries").set(cs["l1_entries"])
+
+
 @app.get("/metrics")
 def metrics():
+    _export_db_stats()
     return Response(generate_latest(REG), media_type=CONTENT_TYPE_LATEST)
 
 
@@ -169,13 +303,9 @@ def config_echo():
     cfg = get_settings().as_redacted_dict()
     # Attach a lightweight LLM usage snapshot
     try:
-        today = time.strftime("%Y-%m-%d", time.gmtime())
-        db = DB  # reuse
-        usd = db.cache_get(f"budget:{today}") or {"value": {"usd": 0.0}}
-        toks = db.cache_get(f"budget_tokens:{today}") or {"value": {"tokens": 0}}
         cfg["LLM_USAGE_TODAY"] = {
-            "usd": float(usd["value"].get("usd", 0.0)),
-            "tokens": int(toks["value"].get("tokens", 0)),
+            "usd": float(DB.counter(USD_COUNTER)),
+            "tokens": int(DB.counter(TOKEN_COUNTER)),
         }
     except Exception:
         cfg["LLM_USAGE_TODAY"] = {"usd": 0.0, "tokens": 0}
@@ -224,12 +354,10 @@ def llm_health():
 @app.get("/v1/llm/usage")
 def llm_usage():
     today = time.strftime("%Y-%m-%d", time.gmtime())
-    usd = DB.cache_get(f"budget:{today}") or {"value": {"usd": 0.0}}
-    toks = DB.cache_get(f"budget_tokens:{today}") or {"value": {"tokens": 0}}
     return {
         "date": today,
-        "usd": float(usd["value"].get("usd", 0.0)),
-        "tokens": int(toks["value"].get("tokens", 0)),
+        "usd": float(DB.counter(USD_COUNTER)),
+        "tokens": int(DB.counter(TOKEN_COUNTER)),
     }
 
 
@@ -284,7 +412,175 @@ def get_plan(plan_id: str, user: Dict = Depends(get_current_user)):
     if not row:
         raise HTTPException(status_code=404, detail="plan not found")
     steps = DB.get_steps(plan_id)
-    return {"plan": row, "steps": steps, "events": list(DB.events_for_plan(plan_id))}
+    # Events are summarized; page through them with /v1/plan/{plan_id}/events from `cursor`.
+    summary = DB.event_summary(plan_id)
+    out = {
+        "plan": row,
+        "steps": steps,
+        "events": {"count": summary["count"], "by_type": summary["by_type"]},
+        "cursor": summary["cursor"],
+    }
+    rollup = DB.get_rollup(plan_id)
+    if rollup:
+        out["archived"] = rollup  # events/outputs moved to rollup["archive_path"]
+    return out
+
+
+@app.get("/v1/plan/{plan_id}/events")
+def plan_events(
+    plan_id: str,
+    after_ts: Optional[int] = None,
+    after_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    type: Optional[List[str]] = Query(None, description="Exact type or prefix ending in '*', repeatable"),
+    step_id: Optional[str] = None,
+    resolve_blobs: bool = True,
+    user: Dict = Depends(get_current_user),
+):
+    if after_id is not None and after_ts is None:
+        raise HTTPException(status_code=400, detail="after_id requires after_ts")
+    if not DB.get_plan(plan_id):
+        raise HTTPException(status_code=404, detail="plan not found")
+    events = DB.events_page(plan_id, after_ts, after_id, limit, type, step_id, resolve_blobs)
+    cursor = {"after_ts": after_ts, "after_id": after_id}
+    if events:
+        cursor = {"after_ts": events[-1]["ts"], "after_id": events[-1]["id"]}
+    return {"plan_id": plan_id, "events": events, "cursor": cursor, "has_more": len(events) == limit}
+
+
+@app.get("/v1/memory/search")
+def memory_search(
+    q: str,
+    kind: Optional[List[str]] = Query(None, description="fact, step or chat; repeatable (default: all)"),
+    plan_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    user: Dict = Depends(get_current_user),
+):
+    """BM25-ranked full-text search over facts, step outputs and chat history."""
+    try:
+        results = DB.search(q, kinds=kind, limit=limit, plan_id=plan_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "results": results}
+
+
+
+@app.get("/v1/blob/{blob_hash}")
+def get_blob(blob_hash: str, user: Dict = Depends(get_current_user)):
+    """Fetch one large value referenced as {"$blob": hash} by steps/events read with resolve_blobs=false."""
+    value = DB.get_blob(blob_hash)
+    if value is None:
+        raise HTTPException(status_code=404, detail="blob not found")
+    return {"hash": blob_hash, "value": value}
+
+
+_TERMINAL_EVENTS = ("plan.done", "plan.failed", "plan.cancelled")
+
+
+def _type_matches(types: Optional[List[str]], t: str) -> bool:
+    if not types:
+        return True
+    return any(t.startswith(x[:-1]) if x.endswith("*") else t == x for x in types)
+
+
+def _sse_frame(ev: Dict[str, Any]) -> str:
+    return f"id: {ev['ts']}:{ev['id']}\nevent: {ev['type']}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n"
+
+
+@app.get("/v1/plan/{plan_id}/events/stream")
+async def plan_events_stream(
+    plan_id: str,
+    request: Request,
+    after_ts: Optional[int] = None,
+    after_id: Optional[str] = None,
+    type: Optional[List[str]] = Query(None, description="Exact type or prefix ending in '*', repeatable"),
+    until_done: bool = True,
+    user: Dict = Depends(get_current_user),
+):
+    """
+    Server-Sent Events feed of a plan's events. Replays stored events after the cursor
+    (query params, or the `Last-Event-ID` header a reconnecting EventSource sends),
+    then pushes new ones as MemoryDB.append_event publishes them. With until_done the
+    stream closes after plan.done / plan.failed / plan.cancelled.
+    """
+    # Every DB read here goes through to_thread: they are synchronous SQLite calls
+    # and would otherwise stall the event loop for all open streams.
+    if not await asyncio.to_thread(DB.get_plan, plan_id):
+        raise HTTPException(status_code=404, detail="plan not found")
+    last_event_id = request.headers.get("last-event-id", "")
+    if after_ts is None and ":" in last_event_id:
+        ts_s, _, after_id = last_event_id.partition(":")
+        after_ts = int(ts_s) if ts_s.isdigit() else None
+
+    async def gen():
+        # Subscribe before the catch-up read so nothing appended in between is missed;
+        # events seen by both paths are de-duplicated by id.
+        with DB.bus.subscribe(plan_id) as sub:
+            cursor = [after_ts, after_id]
+            sent: deque = deque(maxlen=4096)
+            sent_ids: set = set()
+
+            def emit(ev: Dict[str, Any]) -> Optional[str]:
+                if ev["id"] in sent_ids:
+                    return None
+                if len(sent) == sent.maxlen:
+                    sent_ids.discard(sent[0])
+                sent.append(ev["id"])
+                sent_ids.add(ev["id"])
+                # Pages arrive in append order; a live event that is older than the
+                # cursor (appended late by another thread) must not move it back.
+                if cursor[0] is None or ev["ts"] >= cursor[0]:
+                    cursor[0], cursor[1] = ev["ts"], ev["id"]
+                return _sse_frame(ev) if _type_matches(type, ev["type"]) else None
+
+            async def catch_up():
+                frames, done = [], False
+                while True:
+                    page = await asyncio.to_thread(DB.events_page, plan_id, cursor[0], cursor[1], 500)
+                    for ev in page:
+                        f = emit(ev)
+                        if f:
+                            frames.append(f)
+                        done = done or ev["type"] in _TERMINAL_EVENTS
+                    if len(page) < 500:
+                        return frames, done
+
+            frames, done = await catch_up()
+            for f in frames:
+                yield f
+            if until_done and not done:
+                plan = await asyncio.to_thread(DB.get_plan, plan_id)
+                done = (plan or {}).get("state") in ("DONE", "FAILED", "CANCELLED")
+            if until_done and done:
+                return
+            idle = 0.0
+            while not await request.is_disconnected():
+                wait_s = min(SSE_POLL_MS / 1000.0, SSE_KEEPALIVE_S)
+                ev = await sub.get(timeout=wait_s)
+                if ev is not None and not sub.overflowed:
+                    idle = 0.0
+                    f = emit(ev)
+                    if f:
+                        yield f
+                    if until_done and ev["type"] in _TERMINAL_EVENTS:
+                        return
+                    continue
+                # Quiet (or we fell behind the bus): re-read by cursor, which also picks
+                # up events appended by worker processes this bus cannot see.
+                sub.overflowed = False
+                frames, done = await catch_up()
+                for f in frames:
+                    yield f
+                if until_done and done:
+                    return
+                idle = 0.0 if frames else idle + wait_s
+                if idle >= SSE_KEEPALIVE_S:
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        gen(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 class RunBody(BaseModel):
@@ -305,6 +601,11 @@ async def run_plan(
         consent = ConsentToken(
             token=body.consent_token or "user", scopes=body.consent_scopes or []
         )
+    if EXEC_MODE == "queue":
+        queued = enqueue_plan(DB, plan_id, consent)
+        if queued is None:
+            raise HTTPException(status_code=404, detail="plan not found")
+        return {"ok": True, **queued}
     (
         background.add_task(EXECUTOR.run_by_id, plan_id)
         if consent is None
@@ -321,7 +622,7 @@ class ActBody(BaseModel):
 
 
 @app.post("/v1/act")
-def act(body: ActBody, user: Dict = Depends(get_current_user)):
+async def act(body: ActBody, user: Dict = Depends(get_current_user)):
     """
     Direct capability execution with explicit consent (bypasses planning).
     """
@@ -337,7 +638,7 @@ def act(body: ActBody, user: Dict = Depends(get_current_user)):
     # Use the same registry the worker uses
     tool = EXECUTOR.registry.resolve(body.capability)
     try:
-        out = tool["fn"](body.input, consent)
+        out = await EXECUTOR.registry.invoke(tool, body.input, consent)
         return {"ok": True, "output": out}
     except Exception as e:
         ERRORS.labels(route="/v1/act", error_class=type(e).__name__).inc()
@@ -377,6 +678,7 @@ async def agent_execute(body: AgentExecuteBody, user: Dict = Depends(get_current
         model=body.model,
         temperature=0.2,
         max_tokens=body.max_tokens,
+        db=DB,
     )
     # Persist
     DB.upsert_plan(plan.dict())
@@ -467,23 +769,17 @@ async def agent_execute(body: AgentExecuteBody, user: Dict = Depends(get_current
 def build_failure_summary(plan_id: str) -> Dict[str, Any]:
     # Collect failed steps, error messages, and recent event payloads
     summary: Dict[str, Any] = {"plan_id": plan_id, "failed_steps": []}
-    steps = DB.get_steps(plan_id)
-    events = list(DB.events_for_plan(plan_id))
-    events_by_step: Dict[str, List[Dict[str, Any]]] = {}
-    for ev in events:
-        sid = ev.get("step_id")
-        if sid:
-            events_by_step.setdefault(sid, []).append(ev)
+    steps = DB.get_steps(plan_id, resolve_blobs=False)
     for s in steps:
         if s.get("state") == "FAILED":
             sid = s["id"]
-            recents = [e for e in events_by_step.get(sid, [])][-5:]
+            recents = list(DB.events_for_plan(plan_id, step_id=sid, resolve_blobs=False))[-5:]
             previews: Dict[str, Any] = {}
             out = s.get("output") or {}
             for k in ("stdout", "stderr", "text", "content"):
-                v = out.get(k)
+                v = blobcodec.preview(out.get(k), 512)
                 if isinstance(v, str) and v:
-                    previews[k] = v[:512] + ("..." if len(v) > 512 else "")
+                    previews[k] = v
             summary["failed_steps"].append(
                 {
                     "id": sid,
@@ -526,16 +822,25 @@ def chat_stream(body: ChatBody, user: Dict = Depends(get_current_user)):
 
 
 @app.get("/v1/chat/{session_id}/history")
-def chat_history(session_id: str, user: Dict = Depends(get_current_user)):
+def chat_history(
+    session_id: str,
+    q: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    user: Dict = Depends(get_current_user),
+):
     # Return chat.* events for this session id (we use session_id as plan_id key for chat logs)
+    if q:
+        # Only the turns matching q, best first, from the full-text index.
+        hits = DB.search(q, kinds=["chat"], plan_id=session_id, limit=limit)
+        events = [{"ts": h["ts"], "type": h["label"], "snippet": h["snippet"], "score": h["score"]} for h in hits]
+        return {"session_id": session_id, "query": q, "events": events}
     events = [
         {
             "ts": ev.get("ts"),
             "type": ev.get("type"),
             "payload": ev.get("payload"),
         }
-        for ev in DB.events_for_plan(session_id)
-        if str(ev.get("type", "")).startswith("chat.")
+        for ev in DB.events_for_plan(session_id, types=["chat.*"])
     ]
     return {"session_id": session_id, "events": events}
 
@@ -545,16 +850,16 @@ def plan_summary(plan_id: str, user: Dict = Depends(get_current_user)):
     row = DB.get_plan(plan_id)
     if not row:
         raise HTTPException(status_code=404, detail="plan not found")
-    steps = DB.get_steps(plan_id)
+    steps = DB.get_steps(plan_id, resolve_blobs=False)  # previews only: never decode blobs
     simple = []
     for s in steps:
         cap = (s.get("capability") or {}).get("name")
         out = s.get("output") or {}
         preview = {}
         for k in ("stdout", "stderr", "text", "content"):
-            v = out.get(k)
+            v = blobcodec.preview(out.get(k), 256)
             if isinstance(v, str) and v:
-                preview[k] = v[:256] + ("..." if len(v) > 256 else "")
+                preview[k] = v
         simple.append(
             {
                 "id": s.get("id"),
@@ -736,16 +1041,14 @@ def agent_trace(plan_id: str, user: Dict = Depends(get_current_user)):
             {"plan_id": cur, "title": plan.get("title"), "state": plan.get("state")}
         )
         next_id = None
-        for ev in DB.events_for_plan(cur):
-            if ev.get("type") == "plan.revised_to":
-                next_id = (ev.get("payload") or {}).get("child_plan_id")
+        for ev in DB.events_for_plan(cur, types=["plan.revised_to"]):
+            next_id = (ev.get("payload") or {}).get("child_plan_id")
         cur = next_id
     revisions = []
     for node in chain:
         pid = node["plan_id"]
         revs = [
             {"plan_id": pid, "failure": (ev.get("payload") or {}).get("failure")}
-            for ev in DB.events_for_plan(pid)
-            if ev.get("type") == "plan.revised"
+            for ev in DB.events_for_plan(pid, types=["plan.revised"])
         ]
     return {"chain": chain, "revisions": revisions}
@@ -32,10 +32,11 @@ class BodySizeLimitMiddleware(BaseHTTPMiddleware):
 
         # Wrap receive to enforce size for unknown Content-Length
         received = 0
+        original_receive = request._receive
 
         async def limited_receive() -> dict:
             nonlocal received
-            message = await request._receive()
+            message = await original_receive()
             if message.get("type") == "http.request":
                 body = message.get("body") or b""
                 received += len(body)
@@ -43,7 +44,6 @@ class BodySizeLimitMiddleware(BaseHTTPMiddleware):
                     return {"type": "http.request", "body": b"", "more_body": False}
             return message
 
-        original_receive = request._receive
         request._receive = limited_receive  # type: ignore
         try:
             response = await call_next(request)
@@ -16,9 +16,11 @@ SYSTEM_PROMPT = (
 )
 
 
-def build_context_for_goal(goal: str, max_chars: int = 4000) -> Optional[str]:
+def build_context_for_goal(goal: str, max_chars: int = 4000, db: Optional[Any] = None) -> Optional[str]:
     """Lightweight context builder: scan common files for keywords in the goal and return snippets.
     This is a simple local heuristic to avoid requiring the external retrieval service.
+    With a MemoryDB, its full-text index (facts, step outputs, chat) is queried before
+    falling back to the filesystem scan.
     """
     # Try retrieval service first (if configured)
     try:
@@ -42,6 +44,20 @@ def build_context_for_goal(goal: str, max_chars: int = 4000) -> Optional[str]:
                     return "".join(parts)
     except Exception:
         pass
+    if db is not None:
+        try:
+            parts = []
+            total = 0
+            for hit in db.search(goal, limit=8, snippet_tokens=64):
+                block = f"MEMORY ({hit['kind']}: {hit['label']} {hit['id']}):\n{hit['snippet']}\n\n"
+                if total + len(block) > max_chars:
+                    break
+                parts.append(block)
+                total += len(block)
+            if parts:
+                return "".join(parts)
+        except Exception:
+            pass
     try:
         import os
         import re
@@ -90,7 +106,7 @@ TOOL_SCOPE = {
     "fs.write": "write_fs",
     "fs.delete": "delete_fs",
     "fs.list": "list_fs",
-    "fs.glob": "list_fs",
+    "fs.glob": "search_fs",
     "fs.search": "search_fs",
     "shell.run": "exec_shell",
     "git.status": "git_ops",
@@ -154,10 +170,10 @@ def _mk_prompt(goal: str, context: Optional[str], allowed_tools: Optional[List[D
     return messages
 
 
-def propose_plan(goal: str, router: Optional[LLMRouter] = None, context: Optional[str] = None, model: Optional[str] = None, temperature: float = 0.2, max_tokens: Optional[int] = 800, allowed_scopes: Optional[List[str]] = None) -> Plan:
+def propose_plan(goal: str, router: Optional[LLMRouter] = None, context: Optional[str] = None, model: Optional[str] = None, temperature: float = 0.2, max_tokens: Optional[int] = 800, allowed_scopes: Optional[List[str]] = None, db: Optional[Any] = None) -> Plan:
     router = router or LLMRouter()
     allowed_tools = _available_tools(allowed_scopes)
-    ctx = context or build_context_for_goal(goal)
+    ctx = context or build_context_for_goal(goal, db=db)
     messages = _mk_prompt(goal, ctx, allowed_tools)
     # Use async path via sync wrapper for compatibility: router.chat is async; generate() is sync.
     # Prefer generate() for simpler environments (fallback) by concatenating messages.
@@ -2,29 +2,53 @@
 from __future__ import annotations
 
 import asyncio
+import inspect
 import json
 import os
 import random
+import socket
+import threading
 import time
 import uuid
-from typing import Any, Dict, List, Optional, Tuple
+import weakref
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests
 
+try:
+    import httpx  # optional: enables the pooled async net.http_get
+except Exception:  # pragma: no cover
+    httpx = None  # type: ignore
+
+from apps.worker.olympus_worker.memo import memo_key, memo_ttl_ms
 from packages.memory.olympus_memory.db import MemoryDB
 from packages.plan.olympus_plan.models import Guard, Plan, PlanEvent, PlanState, Step, StepState
 from packages.tools.olympus_tools import fs as fstool
+from packages.tools.olympus_tools.search import SEARCH_SCOPE, _check_search_consent
 from packages.tools.olympus_tools import (
     glob_paths as tool_glob,
     search_file_content as tool_search,
     run_shell_command as tool_shell,
+    run_shell_command_async as tool_shell_async,
     git_status as tool_git_status,
     git_add as tool_git_add,
     git_commit as tool_git_commit,
 )
 
 CONCURRENCY = int(os.getenv("OLY_EXEC_CONCURRENCY", "2"))
+IO_WORKERS = int(os.getenv("OLY_TOOL_IO_WORKERS", "16"))  # thread pool for blocking I/O tools
+CPU_WORKERS = int(os.getenv("OLY_TOOL_CPU_WORKERS", "0"))  # process pool; 0 => cpu tools use the I/O pool
+HTTP_MAX_CONNECTIONS = int(os.getenv("OLY_HTTP_MAX_CONNECTIONS", "100"))
+SHELL_PROGRESS_INTERVAL_MS = int(os.getenv("OLY_SHELL_PROGRESS_INTERVAL_MS", "1000"))
+MEMOIZE = os.getenv("OLY_MEMOIZE", "false").lower() in ("1", "true", "yes")  # reuse idempotent step results
 AUTO_CONSENT = os.getenv("OLY_AUTO_CONSENT", "false").lower() in ("1", "true", "yes")  # dev convenience
+# A running plan's owner refreshes plan_runs.heartbeat_at every PLAN_HEARTBEAT_MS; recovery
+# only takes over plans whose heartbeat is older than PLAN_LEASE_MS.
+PLAN_LEASE_MS = int(os.getenv("OLY_PLAN_LEASE_MS", "30000"))
+PLAN_HEARTBEAT_MS = int(os.getenv("OLY_PLAN_HEARTBEAT_MS", "10000"))
 
 def now_ms() -> int:
     return int(time.time() * 1000)
@@ -33,35 +57,166 @@ def log(msg: str, **fields):
     rec = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()), "msg": msg, **fields}
     print(json.dumps(rec, ensure_ascii=False))
 
+class ToolError(Exception): ...
+
+
+def _scope_check(scopes: List[str]) -> Callable[[Optional[fstool.ConsentToken]], None]:
+    def check(consent: Optional[fstool.ConsentToken]) -> None:
+        if not fstool.REQUIRE_CONSENT:
+            return
+        if consent is None or ("*" not in consent.scopes and not all(sc in consent.scopes for sc in scopes)):
+            raise fstool.ConsentError(f"Consent with scopes {scopes} required")
+
+    return check
+
+
+def _consent_allows(tool: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> bool:
+    # A cached result must not bypass the scope check the tool itself would make,
+    # so this runs the tool's own check rather than a parallel list of scopes.
+    try:
+        tool["check"](consent)
+    except (fstool.ConsentError, PermissionError, ToolError):
+        return False
+    return True
+
+
+def consent_dict(consent: Optional[fstool.ConsentToken]) -> Optional[Dict[str, Any]]:
+    if consent is None:
+        return None
+    return {"token": consent.token, "scopes": list(consent.scopes)}
+
 # ------------------ Tool Registry ------------------
 
-class ToolError(Exception): ...
+class ToolProgress(dict):
+    """Progress update yielded by async-generator tools; any other yielded dict is the result."""
+
+
+TOOL_POOLS = ("io", "cpu", "inline")
+
 
 class ToolRegistry:
+    """
+    Named tools of the form fn(args, consent) -> dict.
+    Each sync tool declares the pool it runs in so blocking work stays off the event loop:
+      - "io": shared thread pool (default; subprocesses, HTTP, file I/O)
+      - "cpu": process pool when OLY_TOOL_CPU_WORKERS > 0 (fn and args must be picklable)
+      - "inline": called directly on the event loop (cheap, non-blocking tools only)
+    Tools may also be native async: a coroutine function, or an async generator that
+    yields ToolProgress updates followed by its result. Passing `afn` alongside a sync
+    `fn` registers both; the executor awaits `afn` and sync callers keep using `fn`.
+    """
+
     def __init__(self):
         self._tools: Dict[str, Any] = {}
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # One AsyncClient per event loop (connections are bound to the loop that opened them)
+        self._http: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
         # register built-ins
-        self.register("fs.read", self._fs_read, scopes=[fstool.READ_SCOPE])
+        self.register("fs.read", self._fs_read, scopes=[fstool.READ_SCOPE], check=partial(fstool._check_consent, scope=fstool.READ_SCOPE))
         self.register("fs.write", self._fs_write, scopes=[fstool.WRITE_SCOPE])
         self.register("fs.delete", self._fs_delete, scopes=[fstool.DELETE_SCOPE])
-        self.register("fs.list", self._fs_list, scopes=[fstool.LIST_SCOPE])
-        self.register("net.http_get", self._http_get, scopes=["net_get"])
+        self.register("fs.list", self._fs_list, scopes=[fstool.LIST_SCOPE], check=partial(fstool._check_consent, scope=fstool.LIST_SCOPE))
+        self.register(
+            "net.http_get",
+            self._http_get,
+            scopes=["net_get"],
+            afn=self._http_get_async if httpx is not None else None,
+        )
         # Developer tools
-        self.register("fs.glob", self._fs_glob, scopes=[fstool.LIST_SCOPE])
-        self.register("fs.search", self._fs_search, scopes=["search_fs"])  # custom scope
-        self.register("shell.run", self._shell_run, scopes=["exec_shell"])  # custom scope
+        self.register("fs.glob", self._fs_glob, scopes=[SEARCH_SCOPE], check=_check_search_consent)
+        self.register("fs.search", self._fs_search, scopes=[SEARCH_SCOPE], check=_check_search_consent)
+        self.register("shell.run", self._shell_run, scopes=["exec_shell"], afn=self._shell_run_async)  # custom scope
         self.register("git.status", self._git_status, scopes=["git_ops"])  # custom scope
         self.register("git.add", self._git_add, scopes=["git_ops"])  # custom scope
         self.register("git.commit", self._git_commit, scopes=["git_ops"])  # custom scope
 
-    def register(self, name: str, fn, scopes: List[str]):
-        self._tools[name] = {"fn": fn, "scopes": scopes}
+    def register(self, name: str, fn, scopes: List[str], pool: str = "io", afn=None, check=None):
+        """`check(consent)` raises when the token may not use the tool; defaults to requiring `scopes`."""
+        if pool not in TOOL_POOLS:
+            raise ValueError(f"Unknown tool pool '{pool}' for {name}")
+        if inspect.iscoroutinefunction(fn) or inspect.isasyncgenfunction(fn):
+            fn, afn = None, fn
+        self._tools[name] = {"fn": fn, "afn": afn, "scopes": scopes, "pool": pool, "check": check or _scope_check(scopes)}
 
     def resolve(self, name: str):
         if name not in self._tools:
             raise ToolError(f"Unknown tool: {name}")
         return self._tools[name]
 
+    def _executor_for(self, pool: str) -> Optional[Executor]:
+        if pool == "inline":
+            return None
+        with self._pool_lock:
+            if pool == "cpu" and CPU_WORKERS > 0:
+                if self._cpu_pool is None:
+                    self._cpu_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+                return self._cpu_pool
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="oly-tool")
+            return self._io_pool
+
+    async def invoke(
+        self,
+        tool: Dict[str, Any],
+        args: Dict[str, Any],
+        consent: Optional[fstool.ConsentToken],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Await a resolved tool: natively if async, else in its configured pool."""
+        afn = tool.get("afn")
+        if afn is not None:
+            if not inspect.isasyncgenfunction(afn):
+                return await afn(args, consent)
+            result: Dict[str, Any] = {}
+            async for item in afn(args, consent):
+                if isinstance(item, ToolProgress):
+                    if on_progress is not None:
+                        on_progress(dict(item))
+                else:
+                    result = item
+            return result
+        executor = self._executor_for(tool.get("pool", "io"))
+        if executor is None:
+            return tool["fn"](args, consent)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, tool["fn"], args, consent)
+
+    async def _http_client(self):
+        loop = asyncio.get_running_loop()
+        entry = self._http.get(loop)
+        if entry is None:
+            client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS),
+            )
+            entry = self._http[loop] = (client, self._close_with_loop(client))
+            await entry[1].__anext__()
+        return entry[0]
+
+    async def _close_with_loop(self, client: Any):
+        # Registered with the loop as a live async generator, so loop shutdown
+        # (asyncio.run, uvicorn) finalizes it while the loop can still close sockets.
+        try:
+            yield
+        finally:
+            self._http.pop(asyncio.get_running_loop(), None)
+            await client.aclose()
+
+    async def aclose(self) -> None:
+        """Close this loop's HTTP client now instead of at loop shutdown."""
+        entry = self._http.get(asyncio.get_running_loop())
+        if entry is not None:
+            await entry[1].aclose()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._pool_lock:
+            pools, self._io_pool, self._cpu_pool = [self._io_pool, self._cpu_pool], None, None
+        for p in pools:
+            if p is not None:
+                p.shutdown(wait=wait)
+
     # ---- implementations ----
     def _fs_read(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
         return fstool.read_file(args["path"], token=consent)
@@ -75,7 +230,7 @@ class ToolRegistry:
     def _fs_list(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
         return fstool.list_dir(args.get("path", "/"), token=consent)
 
-    def _http_get(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
+    def _check_http(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> str:
         # Enforce consent for network access when required
         if fstool.REQUIRE_CONSENT:
             if consent is None or ("*" not in consent.scopes and "net_get" not in consent.scopes):
@@ -89,10 +244,20 @@ class ToolRegistry:
             allowed_set = {d.strip() for d in allowed.split(",") if d.strip()}
             if not any(host == d or host.endswith("." + d) for d in allowed_set):
                 raise ToolError(f"Domain '{host}' not allowed")
+        return url
+
+    def _http_get(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
+        url = self._check_http(args, consent)
         timeout = float(args.get("timeout", 20))
         r = requests.get(url, timeout=timeout)
         return {"url": url, "status": r.status_code, "headers": dict(r.headers), "text": r.text}
 
+    async def _http_get_async(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
+        url = self._check_http(args, consent)
+        timeout = float(args.get("timeout", 20))
+        r = await (await self._http_client()).get(url, timeout=timeout)
+        return {"url": url, "status": r.status_code, "headers": dict(r.headers), "text": r.text}
+
     def _fs_glob(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
         pattern = args.get("pattern", "**/*")
         start = args.get("start", "/")
@@ -109,6 +274,36 @@ class ToolRegistry:
         timeout = int(args.get("timeout", 120))
         return tool_shell(cmd=cmd, workdir=workdir, timeout=timeout, token=consent)
 
+    async def _shell_run_async(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]):
+        cmd = args["cmd"]
+        workdir = args.get("workdir", "/")
+        timeout = int(args.get("timeout", 120))
+        counts = {"stdout": 0, "stderr": 0}
+
+        def on_output(name: str, chunk: bytes) -> None:
+            counts[name] += len(chunk)
+
+        task = asyncio.create_task(
+            tool_shell_async(
+                cmd=cmd,
+                workdir=workdir,
+                timeout=timeout,
+                token=consent,
+                on_output=on_output,
+                head_bytes=args.get("head_bytes"),
+                tail_bytes=args.get("tail_bytes"),
+            )
+        )
+        try:
+            while not task.done():
+                done, _ = await asyncio.wait({task}, timeout=SHELL_PROGRESS_INTERVAL_MS / 1000.0)
+                if not done:
+                    yield ToolProgress(stdout_bytes=counts["stdout"], stderr_bytes=counts["stderr"])
+            yield task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+
     def _git_status(self, args: Dict[str, Any], consent: Optional[fstool.ConsentToken]) -> Dict[str, Any]:
         workdir = args.get("workdir", "/")
         return tool_git_status(workdir=workdir, token=consent)
@@ -127,26 +322,45 @@ class ToolRegistry:
 # ------------------ Executor ------------------
 
 class PlanExecutor:
-    def __init__(self, db: Optional[MemoryDB] = None, registry: Optional[ToolRegistry] = None):
+    def __init__(
+        self,
+        db: Optional[MemoryDB] = None,
+        registry: Optional[ToolRegistry] = None,
+        memoize: Optional[bool] = None,
+        owner_id: Optional[str] = None,
+    ):
         self.db = db or MemoryDB()
         self.registry = registry or ToolRegistry()
         self.sem = asyncio.Semaphore(CONCURRENCY)
+        self.memoize = MEMOIZE if memoize is None else memoize
+        self.owner_id = owner_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
 
     def _emit(self, ev: PlanEvent):
         self.db.append_event(ev.dict())
 
-    def _persist_plan(self, plan: Plan):
-        self.db.upsert_plan(plan.dict())
-        for s in plan.steps:
+    def _persist_plan(self, plan: Plan, steps: Optional[List[Step]] = None):
+        # Plan header plus only the steps changed since the last persist.
+        self.db.upsert_plan(plan.dict(exclude={"steps"}))
+        self._persist_steps(plan, plan.dirty_steps() if steps is None else steps)
+
+    def _persist_steps(self, plan: Plan, steps: List[Step]):
+        # Step transitions leave the plan header alone, so they never clobber a plan
+        # state set elsewhere (e.g. by another queue worker).
+        dirty = [s for s in steps if s.is_dirty]
+        rows = []
+        for s in dirty:
             row = s.dict()
             row["plan_id"] = plan.id
             row["max_retries"] = s.guard.max_retries
-            self.db.upsert_step(row)
+            rows.append(row)
+        self.db.upsert_steps(rows)
+        for s in dirty:
+            s.clear_dirty()
 
     async def _run_step(self, plan: Plan, step: Step, consent: Optional[fstool.ConsentToken]) -> None:
         step.attempts += 1
         step.mark_running()
-        self._persist_plan(plan)
+        self._persist_steps(plan, [step])
         self._emit(PlanEvent(type="step.started", plan_id=plan.id, step_id=step.id, payload={"attempt": step.attempts}))
 
         tool = self.registry.resolve(step.capability.name)
@@ -156,6 +370,15 @@ class PlanExecutor:
         elif fstool.REQUIRE_CONSENT and consent is None:
             raise ToolError("Consent required")
 
+        memo = None
+        if plan.metadata.get("memoize", self.memoize) and _consent_allows(tool, consent):
+            memo = await self._memo_lookup(plan, step)
+            if memo is not None and memo.get("hit"):
+                return
+
+        def progress(payload: Dict[str, Any]) -> None:
+            self._emit(PlanEvent(type="step.progress", plan_id=plan.id, step_id=step.id, payload=payload))
+
         # Retry loop with jitter
         backoff = step.guard.retry_backoff_ms
         jitter = step.guard.retry_backoff_jitter_ms
@@ -163,10 +386,12 @@ class PlanExecutor:
         start = now_ms()
         for attempt in range(step.guard.max_retries + 1):
             try:
-                out = tool["fn"](step.input, consent)
+                out = await self.registry.invoke(tool, step.input, consent, on_progress=progress)
+                if memo is not None:
+                    self.db.cache_put(memo["key"], out, memo["ttl_ms"], meta={"capability": step.capability.name})
                 step.mark_done(out)
                 self._emit(PlanEvent(type="step.done", plan_id=plan.id, step_id=step.id, payload={"attempt": attempt, "output": out}))
-                self._persist_plan(plan)
+                self._persist_steps(plan, [step])
                 return
             except Exception as e:  # noqa
                 last_err = str(e)
@@ -180,59 +405,217 @@ class PlanExecutor:
 
         step.mark_failed(last_err or "unknown_error")
         self._emit(PlanEvent(type="step.failed", plan_id=plan.id, step_id=step.id, payload={"error": step.error}))
-        self._persist_plan(plan)
+        self._persist_steps(plan, [step])
+
+    async def _memo_lookup(self, plan: Plan, step: Step) -> Optional[Dict[str, Any]]:
+        """
+        Resolve the step's memo key (stat calls run in the I/O pool) and, on a cache
+        hit, settle the step with the stored output. Returns None when the step is not
+        memoizable, else {"key", "ttl_ms", "hit"}.
+        """
+        name = step.capability.name
+        ttl_ms = memo_ttl_ms(name)
+        if ttl_ms is None:
+            return None
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(self.registry._executor_for("io"), memo_key, name, step.input)
+        if key is None:
+            return None
+        hit = self.db.cache_get(key)
+        if hit is None:
+            return {"key": key, "ttl_ms": ttl_ms, "hit": False}
+        out = hit["value"]
+        self._emit(
+            PlanEvent(
+                type="step.cache_hit",
+                plan_id=plan.id,
+                step_id=step.id,
+                payload={"capability": name, "key": key, "age_ms": now_ms() - hit["created_at"]},
+            )
+        )
+        step.mark_done(out)
+        self._emit(PlanEvent(type="step.done", plan_id=plan.id, step_id=step.id, payload={"attempt": 0, "output": out, "cached": True}))
+        self._persist_steps(plan, [step])
+        return {"key": key, "ttl_ms": ttl_ms, "hit": True}
+
+    # ---- step runner, shared by run() and queue workers (queue_worker.StepWorker) ----
+    async def run_step(self, plan: Plan, step: Step, consent: Optional[fstool.ConsentToken]) -> None:
+        """
+        Run one step until it settles (DONE or FAILED), persisting and emitting each
+        transition. A step that raises before settling (unknown tool, missing consent)
+        is failed with that error.
+        """
+        try:
+            await self._run_step(plan, step, consent)
+        except Exception as e:  # noqa
+            self.fail_step(plan, step, e)
+
+    def fail_step(self, plan: Plan, step: Step, exc: BaseException) -> None:
+        """Fail a step that has not settled yet, persisting it and emitting step.failed."""
+        if step.state == StepState.FAILED:
+            return
+        step.mark_failed(str(exc) or type(exc).__name__)
+        self._emit(PlanEvent(type="step.failed", plan_id=plan.id, step_id=step.id, payload={"error": step.error}))
+        self._persist_steps(plan, [step])
+
+    def _recover_orphans(self, plan: Plan) -> Dict[str, List[str]]:
+        """
+        Settle steps left RUNNING by an executor that died. A step is rescheduled while
+        its Guard still allows another attempt (attempts <= max_retries, deadline not
+        passed since it started), otherwise it is failed. Returns the affected step ids.
+        """
+        out: Dict[str, List[str]] = {"rescheduled": [], "failed": []}
+        for s in plan.steps:
+            if s.state != StepState.RUNNING:
+                continue
+            g = s.guard
+            expired = g.deadline_ms is not None and s.started_at is not None and now_ms() - s.started_at > g.deadline_ms
+            if s.attempts <= g.max_retries and not expired:
+                s.mark_pending()
+                out["rescheduled"].append(s.id)
+            else:
+                s.mark_failed(f"interrupted while running (attempt {s.attempts})")
+                self._emit(PlanEvent(type="step.failed", plan_id=plan.id, step_id=s.id, payload={"error": s.error}))
+                out["failed"].append(s.id)
+        return out
+
+    def recover_plan(self, plan: Plan) -> Dict[str, List[str]]:
+        """Settle and persist the steps a dead executor left RUNNING (see _recover_orphans)."""
+        recovered = self._recover_orphans(plan)
+        self._persist_steps(plan, plan.dirty_steps())
+        return recovered
 
     async def run(self, plan: Plan, consent: Optional[fstool.ConsentToken] = None) -> Plan:
         if plan.state in (PlanState.DONE, PlanState.CANCELLED, PlanState.FAILED):
             return plan
+        # Only one executor may run a plan: the claim fails while another process holds
+        # it and keeps its heartbeat fresh (e.g. an API worker running it inline).
+        if not self.db.claim_plan_run(plan.id, self.owner_id, PLAN_LEASE_MS):
+            log("executor.plan_owned_elsewhere", plan_id=plan.id, owner_id=self.owner_id)
+            return plan
+        lease_lost = asyncio.Event()
+        beat = asyncio.create_task(self._heartbeat_plan(plan.id, lease_lost))
+        try:
+            return await self._run_owned(plan, consent, lease_lost)
+        finally:
+            beat.cancel()
+
+    async def _heartbeat_plan(self, plan_id: str, lease_lost: asyncio.Event) -> None:
+        while True:
+            await asyncio.sleep(PLAN_HEARTBEAT_MS / 1000.0)
+            if not self.db.heartbeat_plan_run(plan_id, self.owner_id):
+                log("executor.plan_lease_lost", plan_id=plan_id, owner_id=self.owner_id)
+                lease_lost.set()
+                return
+
+    async def _run_owned(self, plan: Plan, consent: Optional[fstool.ConsentToken], lease_lost: asyncio.Event) -> Plan:
+        # Resuming: completed steps keep their stored outputs and are never re-run;
+        # only the steps that were in flight when the previous executor died are settled.
+        resuming = plan.state in (PlanState.QUEUED, PlanState.RUNNING) or any(
+            s.state not in (StepState.PENDING, StepState.BLOCKED) for s in plan.steps
+        )
+        recovered = self.recover_plan(plan) if resuming else None
         plan.state = PlanState.RUNNING
         self._persist_plan(plan)
+        self.db.save_plan_run(plan.id, consent_dict(consent), resumed=resuming)
         self._emit(PlanEvent(type="plan.started", plan_id=plan.id, payload={"title": plan.title}))
-
-        # Basic DAG execution with limited concurrency
-        pending: Dict[str, Step] = {s.id: s for s in plan.steps}
-        while True:
-            # Determine runnable
-            completed = {s.id for s in plan.steps if s.state == StepState.DONE}
-            failed = [s for s in plan.steps if s.state == StepState.FAILED]
-            if failed:
-                plan.state = PlanState.FAILED
-                self._persist_plan(plan)
-                self._emit(PlanEvent(type="plan.failed", plan_id=plan.id, payload={"failed_steps": [f.id for f in failed]}))
-                return plan
-            if plan.all_done():
-                plan.state = PlanState.DONE
-                self._persist_plan(plan)
-                self._emit(PlanEvent(type="plan.done", plan_id=plan.id, payload={}))
-                return plan
-
-            runnable = [s for s in plan.runnable_steps() if s.id in pending]
-            if not runnable:
-                # No runnable but not done -> blocked wait
-                await asyncio.sleep(0.05)
-                continue
-
-            tasks = []
-            for s in runnable:
-                pending.pop(s.id, None)
-                await self.sem.acquire()
-                tasks.append(asyncio.create_task(self._run_step(plan, s, consent)))
-                # release semaphore on completion
-                tasks[-1].add_done_callback(lambda _: self.sem.release())
-
-            # Let at least one task progress
-            await asyncio.sleep(0)
-
-    # Convenience: run plan dict loaded from DB
-    async def run_by_id(self, plan_id: str) -> Plan:
+        if recovered is not None:
+            reused = [s.id for s in plan.steps if s.state in (StepState.DONE, StepState.SKIPPED)]
+            self._emit(PlanEvent(type="plan.resumed", plan_id=plan.id, payload={"reused_steps": reused, **recovered}))
+
+        # Event-driven DAG execution: track unmet-dependency counts, dispatch steps as
+        # soon as they reach zero, and sleep on a completion queue in between.
+        idx = plan.index()
+        children: Dict[str, List[str]] = {sid: [] for sid in idx}
+        for s in plan.steps:
+            for d in s.deps:
+                children[d].append(s.id)
+        satisfied = (StepState.DONE, StepState.SKIPPED)
+        indegree = {s.id: sum(1 for d in s.deps if idx[d].state not in satisfied) for s in plan.steps}
+        ready = deque(
+            s for s in plan.steps if s.state in (StepState.PENDING, StepState.BLOCKED) and indegree[s.id] == 0
+        )
+        finished: "asyncio.Queue[Tuple[Step, Optional[BaseException]]]" = asyncio.Queue()
+        failed = [s for s in plan.steps if s.state == StepState.FAILED]
+        running: Dict[str, "asyncio.Task[None]"] = {}
+
+        def _on_done(task: "asyncio.Task[None]", step: Step) -> None:
+            self.sem.release()
+            exc = None if task.cancelled() else task.exception()
+            finished.put_nowait((step, exc))
+
+        # Losing the lease wakes the loop below (step None): another executor owns the plan now.
+        lost_waiter = asyncio.create_task(lease_lost.wait())
+        lost_waiter.add_done_callback(lambda t: t.cancelled() or finished.put_nowait((None, None)))
+        try:
+            while True:
+                # Stop dispatching after the first failure; in-flight steps drain below.
+                while ready and not failed and not lease_lost.is_set():
+                    s = ready.popleft()
+                    await self.sem.acquire()
+                    task = asyncio.create_task(self.run_step(plan, s, consent))
+                    running[s.id] = task
+                    task.add_done_callback(lambda t, s=s: _on_done(t, s))
+                if lease_lost.is_set():
+                    return await self._abandon(plan, running)
+                if not running:
+                    break
+                s, exc = await finished.get()
+                if s is None:
+                    continue
+                running.pop(s.id, None)
+                if exc is not None:
+                    self.fail_step(plan, s, exc)
+                if s.state == StepState.DONE:
+                    for c in children[s.id]:
+                        indegree[c] -= 1
+                        if indegree[c] == 0 and idx[c].state in (StepState.PENDING, StepState.BLOCKED):
+                            ready.append(idx[c])
+                elif s.state == StepState.FAILED:
+                    failed.append(s)
+        finally:
+            lost_waiter.cancel()
+
+        # The heartbeat only runs every PLAN_HEARTBEAT_MS: confirm ownership before the plan-level write.
+        if not self.db.heartbeat_plan_run(plan.id, self.owner_id):
+            log("executor.plan_lease_lost", plan_id=plan.id, owner_id=self.owner_id)
+            return plan
+        if failed:
+            plan.state = PlanState.FAILED
+            self._persist_plan(plan)
+            self._emit(PlanEvent(type="plan.failed", plan_id=plan.id, payload={"failed_steps": [f.id for f in failed]}))
+        elif plan.all_done():
+            plan.state = PlanState.DONE
+            self._persist_plan(plan)
+            self._emit(PlanEvent(type="plan.done", plan_id=plan.id, payload={}))
+        else:
+            # Nothing runnable and nothing in flight: remaining steps can never start.
+            blocked = [s.id for s in plan.steps if s.state not in satisfied]
+            plan.state = PlanState.FAILED
+            self._persist_plan(plan)
+            self._emit(PlanEvent(type="plan.failed", plan_id=plan.id, payload={"failed_steps": [], "blocked_steps": blocked}))
+        self.db.flush()
+        return plan
+
+    async def _abandon(self, plan: Plan, running: Dict[str, "asyncio.Task[None]"]) -> Plan:
+        """
+        Stop work on a plan whose lease was claimed by another executor: cancel the steps
+        still in flight and leave the plan header and run record to the new owner.
+        """
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*running.values(), return_exceptions=True)
+        log("executor.plan_abandoned", plan_id=plan.id, owner_id=self.owner_id, cancelled=list(running))
+        return plan
+
+    def load_plan(self, plan_id: str) -> Optional[Plan]:
+        """Rebuild a Plan (steps included) from its persisted rows."""
         row = self.db.get_plan(plan_id)
         if not row:
-            raise RuntimeError(f"Plan {plan_id} not found")
-        from packages.plan.olympus_plan.models import Plan as PydPlan, Step as PydStep  # avoid circulars
-        steps_rows = self.db.get_steps(plan_id)
+            return None
         steps = []
-        for r in steps_rows:
-            s = PydStep(
+        for r in self.db.get_steps(plan_id):
+            s = Step(
                 id=r["id"],
                 name=r["name"],
                 capability=r["capability"],
@@ -246,8 +629,9 @@ class PlanExecutor:
                 error=r["error"],
                 output=r["output"],
             )
+            s.clear_dirty()  # matches what is stored
             steps.append(s)
-        plan = PydPlan(
+        return Plan(
             id=row["id"],
             title=row["title"],
             state=row["state"],
@@ -257,44 +641,40 @@ class PlanExecutor:
             steps=steps,
             metadata=row["metadata"],
         )
-        return await self.run(plan)
 
+    # Convenience: run plan dict loaded from DB
+    async def run_by_id(self, plan_id: str) -> Plan:
+        return await self.run_by_id_with_consent(plan_id, None)
 
     async def run_by_id_with_consent(self, plan_id: str, consent: Optional[fstool.ConsentToken]) -> Plan:
-        row = self.db.get_plan(plan_id)
-        if not row:
+        plan = self.load_plan(plan_id)
+        if plan is None:
             raise RuntimeError(f"Plan {plan_id} not found")
-        from packages.plan.olympus_plan.models import Plan as PydPlan, Step as PydStep
-        steps_rows = self.db.get_steps(plan_id)
-        steps = []
-        for r in steps_rows:
-            s = PydStep(
-                id=r["id"],
-                name=r["name"],
-                capability=r["capability"],
-                input=r["input"],
-                deps=r["deps"],
-                guard=r["guard"],
-                state=r["state"],
-                attempts=r["attempts"],
-                started_at=r["started_at"],
-                ended_at=r["ended_at"],
-                error=r["error"],
-                output=r["output"],
-            )
-            steps.append(s)
-        plan = PydPlan(
-            id=row["id"],
-            title=row["title"],
-            state=row["state"],
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
-            budget=row["budget"],
-            steps=steps,
-            metadata=row["metadata"],
-        )
+        if consent is None:
+            # Resuming after a restart: reuse the consent the run was started with
+            run = self.db.get_plan_run(plan_id)
+            if run and run["consent"]:
+                consent = fstool.ConsentToken(**run["consent"])
         return await self.run(plan, consent=consent)
 
+    async def recover_interrupted(self) -> List[str]:
+        """
+        Recovery for inline execution: claim and resume every plan whose executor died
+        mid-run, i.e. stopped heartbeating (see MemoryDB.interrupted_plans). Returns the
+        resumed plan ids. Safe to call repeatedly and from several processes.
+        """
+        plan_ids = [
+            pid for pid in self.db.interrupted_plans(PLAN_LEASE_MS)
+            if self.db.claim_plan_run(pid, self.owner_id, PLAN_LEASE_MS)
+        ]
+        if plan_ids:
+            log("executor.recover", plans=plan_ids)
+        results = await asyncio.gather(*(self.run_by_id(pid) for pid in plan_ids), return_exceptions=True)
+        for pid, res in zip(plan_ids, results):
+            if isinstance(res, BaseException):
+                log("executor.recover_failed", plan_id=pid, error=str(res))
+        return plan_ids
+
 
 # -------------- CLI entry (optional) --------------
 if __name__ == "__main__":
@@ -303,12 +683,23 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--plan-id", help="Existing plan id to run")
+    parser.add_argument("--daemon", action="store_true", help="Pull steps from the shared step queue until stopped")
     args = parser.parse_args()
 
     db = MemoryDB()
     ex = PlanExecutor(db=db)
 
     async def main():
+        if args.daemon:
+            import signal
+            from apps.worker.olympus_worker.queue_worker import StepWorker
+
+            worker = StepWorker(db=db, executor=ex)
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, worker.stop)
+            await worker.run_forever()
+            return
         if args.plan_id:
             await ex.run_by_id(args.plan_id)
             return
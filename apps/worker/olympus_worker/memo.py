@@ -0,0 +1,134 @@
+# apps/worker/olympus_worker/memo.py
+"""
+Content-addressed memoization of idempotent step results.
+
+A step's cache key hashes its capability name, its canonical input JSON and a
+cheap fingerprint of the sandbox state the capability reads (stat of the file,
+of a directory's entries, of a tree for globs, or of HEAD, the index and the
+working tree outside .git for git). A changed file therefore
+changes the key instead of serving a stale result. Results live in the
+`cache_items` table under `memo:<sha256>` with a per-capability TTL.
+
+Only capabilities listed in MEMO_TTLS_MS are memoized; override the TTLs with
+OLY_MEMO_TTLS="fs.read=60000,git.status=0" (0 disables a capability).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+from packages.tools.olympus_tools import fs as fstool
+
+DEFAULT_MEMO_TTLS_MS: Dict[str, int] = {
+    "fs.read": 600_000,
+    "fs.search": 600_000,
+    "fs.list": 60_000,
+    "fs.glob": 60_000,
+    "git.status": 30_000,
+}
+
+
+def _parse_ttls(spec: str) -> Dict[str, int]:
+    ttls = dict(DEFAULT_MEMO_TTLS_MS)
+    for part in spec.split(","):
+        name, _, ms = part.partition("=")
+        if name.strip() and ms.strip():
+            ttls[name.strip()] = int(ms)
+    return {k: v for k, v in ttls.items() if v > 0}
+
+
+MEMO_TTLS_MS = _parse_ttls(os.getenv("OLY_MEMO_TTLS", ""))
+
+
+def _stat_fp(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _dir_fp(path: str) -> str:
+    """
+    Hash of a directory's stat plus (name, mtime, size) of each direct child: an
+    in-place rewrite changes the child's size/mtime but not the directory's mtime.
+    """
+    h = hashlib.sha256(f"{_stat_fp(path)}\n".encode())
+    for entry in sorted(os.scandir(path), key=lambda e: e.name):
+        try:
+            h.update(f"{entry.name}|{_stat_fp(entry.path)}\n".encode())
+        except OSError:
+            continue
+    return h.hexdigest()
+
+
+def _tree_fp(root: str, files: bool, prune: tuple = ()) -> str:
+    """
+    Hash of (path, mtime, size) over a directory tree, skipping directories named
+    in `prune`. Directories alone are enough when only the set of names matters (an
+    add/remove/rename bumps the parent mtime); files=True also covers content edits.
+    """
+    h = hashlib.sha256()
+    for base, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in prune)
+        h.update(f"{os.path.relpath(base, root)}|{_stat_fp(base)}\n".encode())
+        if files:
+            for n in sorted(names):
+                p = os.path.join(base, n)
+                try:
+                    h.update(f"{n}|{_stat_fp(p)}\n".encode())
+                except OSError:
+                    continue
+    return h.hexdigest()
+
+
+def _git_fp(workdir: str) -> str:
+    """
+    HEAD (and the ref it names), the index, and the working tree without .git:
+    commits, checkouts and staging move HEAD/the index, while working-tree edits
+    only show in file stats. Object and log files under .git are never walked.
+    """
+    git_dir = os.path.join(workdir, ".git")
+    parts = []
+    head = os.path.join(git_dir, "HEAD")
+    if os.path.isfile(head):
+        with open(head, "r", encoding="utf-8", errors="replace") as f:
+            ref = f.read().strip()
+        parts.append(ref)
+        if ref.startswith("ref: "):
+            ref_path = os.path.join(git_dir, ref[5:])
+            parts.append(_stat_fp(ref_path) if os.path.exists(ref_path) else "-")
+    index = os.path.join(git_dir, "index")
+    parts.append(_stat_fp(index) if os.path.exists(index) else "-")
+    parts.append(_tree_fp(workdir, files=True, prune=(".git",)))
+    return "|".join(parts)
+
+
+_FINGERPRINTS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "fs.read": lambda a: _stat_fp(fstool._normalize(a["path"])),
+    "fs.search": lambda a: _stat_fp(fstool._normalize(a["path"])),
+    "fs.list": lambda a: _dir_fp(fstool._normalize(a.get("path", "/"))),
+    "fs.glob": lambda a: _tree_fp(fstool._normalize(a.get("start", "/")), files=False),
+    "git.status": lambda a: _git_fp(fstool._normalize(a.get("workdir", "/"))),
+}
+
+
+def memo_ttl_ms(capability: str) -> Optional[int]:
+    return MEMO_TTLS_MS.get(capability)
+
+
+def memo_key(capability: str, args: Dict[str, Any]) -> Optional[str]:
+    """
+    Cache key for a step, or None if the capability is not memoizable or its
+    inputs cannot be fingerprinted (missing path, path outside the sandbox...),
+    in which case the step simply runs and reports its own error.
+    """
+    fp = _FINGERPRINTS.get(capability)
+    if fp is None or capability not in MEMO_TTLS_MS:
+        return None
+    try:
+        fingerprint = fp(args)
+        canonical = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+    except Exception:
+        return None
+    digest = hashlib.sha256(f"{capability}\0{canonical}\0{fingerprint}".encode()).hexdigest()
+    return f"memo:{digest}"
@@ -0,0 +1,223 @@
+# apps/worker/olympus_worker/queue_worker.py
+"""
+Distributed execution: any number of worker processes pull runnable steps from
+the shared `step_queue` table instead of one process owning a whole plan.
+
+A claimed step is leased for OLY_QUEUE_LEASE_MS and the lease is extended every
+OLY_QUEUE_HEARTBEAT_MS while the step runs. If a worker dies, its lease lapses and
+the step becomes claimable again (at-least-once delivery); after
+OLY_QUEUE_MAX_DELIVERIES deliveries the step is failed instead of retried.
+When a step settles, the worker enqueues the successors that became ready and
+settles the plan once all steps are done or one has failed.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from apps.worker.olympus_worker.main import CONCURRENCY, PLAN_LEASE_MS, PlanExecutor, consent_dict, log
+from packages.memory.olympus_memory.db import MemoryDB
+from packages.plan.olympus_plan.models import Plan, PlanEvent, PlanState, Step, StepState
+from packages.tools.olympus_tools import fs as fstool
+
+LEASE_MS = int(os.getenv("OLY_QUEUE_LEASE_MS", "30000"))
+HEARTBEAT_MS = int(os.getenv("OLY_QUEUE_HEARTBEAT_MS", "10000"))
+POLL_MS = int(os.getenv("OLY_QUEUE_POLL_MS", "500"))
+MAX_DELIVERIES = int(os.getenv("OLY_QUEUE_MAX_DELIVERIES", "3"))
+HEARTBEAT_PATH = os.getenv("WORKER_HEARTBEAT_PATH", ".sandbox/.status/worker.json")
+
+_TERMINAL = (PlanState.DONE, PlanState.FAILED, PlanState.CANCELLED)
+
+
+def _emit(db: MemoryDB, ev: PlanEvent) -> None:
+    db.append_event(ev.dict())
+
+
+def enqueue_plan(
+    db: MemoryDB, plan_id: str, consent: Optional[fstool.ConsentToken] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Hand a persisted plan to the worker fleet: mark it QUEUED and enqueue its
+    ready steps. Returns None if the plan does not exist. Terminal plans are
+    left untouched; calling this again for a running plan is harmless.
+    """
+    row = db.get_plan(plan_id)
+    if not row:
+        return None
+    if row["state"] in [s.value for s in _TERMINAL]:
+        return {"plan_id": plan_id, "state": row["state"], "enqueued": 0}
+    if db.transition_plan(plan_id, PlanState.QUEUED.value, from_states=("DRAFT", "PAUSED")):
+        _emit(db, PlanEvent(type="plan.queued", plan_id=plan_id, payload={}))
+    db.save_plan_run(plan_id, consent_dict(consent))
+    progress = db.enqueue_ready_steps(plan_id, consent_dict(consent))
+    if progress["total"] == 0 and db.transition_plan(plan_id, PlanState.DONE.value):
+        _emit(db, PlanEvent(type="plan.done", plan_id=plan_id, payload={}))
+    db.flush()
+    state = db.get_plan(plan_id)["state"]
+    return {"plan_id": plan_id, "state": state, "enqueued": progress["enqueued"]}
+
+
+class StepWorker:
+    """Claims queued steps and runs them with PlanExecutor's step runner."""
+
+    def __init__(
+        self,
+        db: Optional[MemoryDB] = None,
+        executor: Optional[PlanExecutor] = None,
+        worker_id: Optional[str] = None,
+        concurrency: int = CONCURRENCY,
+    ):
+        self.db = db or (executor.db if executor else MemoryDB())
+        self.executor = executor or PlanExecutor(db=self.db)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(1, concurrency)
+        self._stop = asyncio.Event()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._last_heartbeat = 0.0
+        self._last_recover = 0.0
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run_forever(self, stop_when_idle: bool = False) -> None:
+        """
+        Claim and run steps until stop() is called. With stop_when_idle=True, return
+        once this worker is idle and the queue holds no rows at all (ready or leased).
+        """
+        log("worker.start", worker_id=self.worker_id, concurrency=self.concurrency)
+        self.recover()
+        try:
+            while not self._stop.is_set():
+                self._write_heartbeat()
+                if time.monotonic() - self._last_recover >= PLAN_LEASE_MS / 1000.0:
+                    self.recover()  # plans whose inline executor has since died
+                claimed = False
+                while len(self._tasks) < self.concurrency:
+                    item = self.db.claim_step(self.worker_id, LEASE_MS)
+                    if item is None:
+                        break
+                    claimed = True
+                    task = asyncio.create_task(self._process(item))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                if claimed:
+                    await asyncio.sleep(0)
+                    continue
+                if stop_when_idle and not self._tasks:
+                    stats = self.db.queue_stats()
+                    if stats["ready"] == 0 and stats["leased"] == 0:
+                        break
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=POLL_MS / 1000.0)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            self.db.flush()
+            log("worker.stop", worker_id=self.worker_id)
+
+    def recover(self) -> List[str]:
+        """
+        Re-home plans whose executor died mid-run (inline runs, or a crash between
+        marking a plan QUEUED and enqueueing its steps), once their plan_runs heartbeat
+        is older than PLAN_LEASE_MS. Each plan is claimed first, so a plan that another
+        process still runs, or that another worker recovers concurrently, is left alone.
+        Orphaned RUNNING steps are rescheduled or failed per their Guard; DONE steps
+        keep their outputs. Runs at startup and then every PLAN_LEASE_MS.
+        """
+        self._last_recover = time.monotonic()
+        plan_ids = [
+            pid for pid in self.db.interrupted_plans(PLAN_LEASE_MS)
+            if self.db.claim_plan_run(pid, self.worker_id, PLAN_LEASE_MS)
+        ]
+        for plan_id in plan_ids:
+            plan = self.executor.load_plan(plan_id)
+            if plan is None:
+                continue
+            recovered = self.executor.recover_plan(plan)
+            run = self.db.get_plan_run(plan_id)
+            self.db.save_plan_run(plan_id, resumed=True)
+            reused = [s.id for s in plan.steps if s.state in (StepState.DONE, StepState.SKIPPED)]
+            _emit(self.db, PlanEvent(type="plan.resumed", plan_id=plan_id, payload={"reused_steps": reused, **recovered}))
+            self._advance(plan_id, run["consent"] if run else None)
+        if plan_ids:
+            log("worker.recover", worker_id=self.worker_id, plans=plan_ids)
+        self.db.flush()
+        return plan_ids
+
+    async def _process(self, item: Dict[str, Any]) -> None:
+        step_id, plan_id = item["step_id"], item["plan_id"]
+        try:
+            plan = self.executor.load_plan(plan_id)
+            step = plan.index().get(step_id) if plan else None
+            if plan is not None and step is not None and plan.state not in _TERMINAL:
+                await self._settle(plan, step, item)
+                # Successors are enqueued before the ack so a crash in between redelivers
+                # this (already settled) step rather than stranding the plan.
+                self._advance(plan_id, item.get("consent"))
+        except Exception as e:  # noqa
+            # Leave the row leased; it is redelivered once the lease lapses.
+            log("worker.step_error", worker_id=self.worker_id, step_id=step_id, error=str(e))
+            return
+        finally:
+            self.db.flush()
+        self.db.ack_step(step_id, self.worker_id)
+
+    async def _settle(self, plan: Plan, step: Step, item: Dict[str, Any]) -> None:
+        if self.db.transition_plan(plan.id, PlanState.RUNNING.value, from_states=("DRAFT", "QUEUED", "PAUSED")):
+            _emit(self.db, PlanEvent(type="plan.started", plan_id=plan.id, payload={"title": plan.title}))
+        if step.state in (StepState.DONE, StepState.SKIPPED):
+            return  # settled by a previous delivery that died before acking
+        if item["deliveries"] > MAX_DELIVERIES:
+            err = RuntimeError(f"lease expired {item['deliveries'] - 1} times; giving up")
+            self.executor.fail_step(plan, step, err)
+            return
+        consent = fstool.ConsentToken(**item["consent"]) if item.get("consent") else None
+        beat = asyncio.create_task(self._heartbeat(step.id))
+        try:
+            await self.executor.run_step(plan, step, consent)
+        finally:
+            beat.cancel()
+        self.db.flush()
+
+    def _advance(self, plan_id: str, consent: Optional[Dict[str, Any]]) -> None:
+        progress = self.db.enqueue_ready_steps(plan_id, consent)
+        if progress["failed"]:
+            if self.db.transition_plan(plan_id, PlanState.FAILED.value):
+                self.db.drop_queued(plan_id)
+                _emit(self.db, PlanEvent(type="plan.failed", plan_id=plan_id, payload={"failed_steps": progress["failed"]}))
+        elif progress["done"] == progress["total"]:
+            if self.db.transition_plan(plan_id, PlanState.DONE.value):
+                _emit(self.db, PlanEvent(type="plan.done", plan_id=plan_id, payload={}))
+
+    async def _heartbeat(self, step_id: str) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_MS / 1000.0)
+            if not self.db.heartbeat_lease(step_id, self.worker_id, LEASE_MS):
+                log("worker.lease_lost", worker_id=self.worker_id, step_id=step_id)
+                return
+
+    def _write_heartbeat(self) -> None:
+        now = time.monotonic()
+        if now - self._last_heartbeat < HEARTBEAT_MS / 1000.0:
+            return
+        self._last_heartbeat = now
+        try:
+            p = Path(HEARTBEAT_PATH)
+            p.parent.mkdir(parents=True, exist_ok=True)
+            rec = {
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "worker_id": self.worker_id,
+                "in_flight": len(self._tasks),
+            }
+            p.write_text(json.dumps(rec), encoding="utf-8")
+        except Exception:
+            pass
@@ -0,0 +1,2 @@
+# Re-export the JSON logging helpers so services can import olympus_api.logging from the repo root.
+from apps.api.olympus_api.logging import JsonRequestLogger, configure_json_logging  # noqa: F401
@@ -24,9 +24,10 @@ DAILY_USD_BUDGET = float(os.getenv("OLY_DAILY_USD_BUDGET", "0.0"))  # 0 => disab
 CACHE_TTL_MS = int(os.getenv("OLY_LLM_CACHE_TTL_MS", "1800000"))  # 30m
 DAILY_TOKEN_BUDGET = int(os.getenv("OLY_DAILY_TOKEN_BUDGET", "0"))  # 0 => unlimited for llama.cpp
 
-
-def _today_key() -> str:
-    return time.strftime("%Y-%m-%d", time.gmtime())
+# Daily spend lives in MemoryDB counters that reset at midnight UTC.
+USD_COUNTER = "budget:usd"
+TOKEN_COUNTER = "budget:tokens"
+BUDGET_WINDOW_MS = 86_400_000
 
 
 def _hash_prompt(prompt: str, system: Optional[str], tools: Optional[Dict[str, Any]]) -> str:
@@ -60,42 +61,46 @@ class LLMRouter:
 
     # --------------- Budget ----------------
     def _get_spend(self) -> float:
-        key = f"budget:{_today_key()}"
-        item = self.db.cache_get(key)
-        if not item:
-            return 0.0
-        return float(item["value"]["usd"])
-
-    def _add_spend(self, delta_usd: float):
-        key = f"budget:{_today_key()}"
-        cur = self._get_spend()
-        new_v = {"usd": round(cur + delta_usd, 6)}
-        self.db.cache_put(key, new_v, ttl_ms=86_400_000)  # 24h
-
-    def _ensure_budget(self, need_usd: float):
+        return float(self.db.counter(USD_COUNTER))
+
+    def _add_spend(self, delta_usd: float, reserved_at_ms: Optional[int] = None):
+        """Add spend; with `reserved_at_ms`, settle that reservation (see MemoryDB.settle)."""
+        if reserved_at_ms is None:
+            self.db.incr(USD_COUNTER, delta_usd, window_ms=BUDGET_WINDOW_MS)
+        else:
+            self.db.settle(USD_COUNTER, delta_usd, reserved_at_ms, window_ms=BUDGET_WINDOW_MS)
+
+    def _reserve_budget(self, need_usd: float) -> int:
+        """
+        Reserve `need_usd` of today's budget and return the reservation time; settle
+        with _add_spend(actual - need_usd, reserved_at_ms).
+        """
         if DAILY_USD_BUDGET <= 0:
             raise BudgetExceeded("Cloud disabled (budget=0)")
-        if self._get_spend() + need_usd > DAILY_USD_BUDGET:
+        now_ms = int(time.time() * 1000)
+        if self.db.reserve(USD_COUNTER, need_usd, DAILY_USD_BUDGET, window_ms=BUDGET_WINDOW_MS, now_ms=now_ms) is None:
             raise BudgetExceeded("Daily LLM budget exceeded")
+        return now_ms
 
     # --------------- Token budget (llama.cpp) ----------------
     def _get_token_spend(self) -> int:
-        key = f"budget_tokens:{_today_key()}"
-        item = self.db.cache_get(key)
-        if not item:
-            return 0
-        return int(item["value"].get("tokens", 0))
+        return int(self.db.counter(TOKEN_COUNTER))
 
-    def _add_token_spend(self, delta_tokens: int):
-        key = f"budget_tokens:{_today_key()}"
-        cur = self._get_token_spend()
-        self.db.cache_put(key, {"tokens": int(cur + delta_tokens)}, ttl_ms=86_400_000)
+    def _add_token_spend(self, delta_tokens: int, reserved_at_ms: Optional[int] = None):
+        if reserved_at_ms is None:
+            self.db.incr(TOKEN_COUNTER, delta_tokens, window_ms=BUDGET_WINDOW_MS)
+        else:
+            self.db.settle(TOKEN_COUNTER, delta_tokens, reserved_at_ms, window_ms=BUDGET_WINDOW_MS)
 
-    def _ensure_token_budget(self, need_tokens: int):
+    def _reserve_tokens(self, need_tokens: int) -> int:
+        """Reserve `need_tokens` of today's token budget (counted even when unlimited); returns the reservation time."""
+        now_ms = int(time.time() * 1000)
         if DAILY_TOKEN_BUDGET <= 0:
-            return
-        if self._get_token_spend() + need_tokens > DAILY_TOKEN_BUDGET:
+            self.db.incr(TOKEN_COUNTER, need_tokens, window_ms=BUDGET_WINDOW_MS, now_ms=now_ms)
+            return now_ms
+        if self.db.reserve(TOKEN_COUNTER, need_tokens, DAILY_TOKEN_BUDGET, window_ms=BUDGET_WINDOW_MS, now_ms=now_ms) is None:
             raise BudgetExceeded("Daily LLM token budget exceeded")
+        return now_ms
 
     # --------------- Cache -----------------
     def _cache_get(self, key: str) -> Optional[str]:
@@ -146,7 +151,7 @@ class LLMRouter:
             tokens_in = self._approx_tokens(prompt)
             tokens_out = 800  # cap
             est = self._estimate_usd(OPENAI_MODEL, tokens_in, tokens_out)
-            self._ensure_budget(est)
+            reserved_at = self._reserve_budget(est)
 
             headers = {
                 "Authorization": f"Bearer {OPENAI_API_KEY}",
@@ -157,14 +162,18 @@ class LLMRouter:
                 "messages": [{"role": "user", "content": prompt}],
                 "temperature": 0.2,
             }
-            r = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=body, timeout=60)
-            r.raise_for_status()
-            data = r.json()
-            text = data["choices"][0]["message"]["content"]
+            try:
+                r = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=body, timeout=60)
+                r.raise_for_status()
+                data = r.json()
+                text = data["choices"][0]["message"]["content"]
+            except Exception:
+                self._add_spend(-est, reserved_at)  # release the reservation
+                raise
             # charge actual (still approximate without usage in response)
             used_in = tokens_in
             used_out = self._approx_tokens(text)
-            self._add_spend(self._estimate_usd(OPENAI_MODEL, used_in, used_out))
+            self._add_spend(self._estimate_usd(OPENAI_MODEL, used_in, used_out) - est, reserved_at)
             self._cache_put(key, text)
             return text
 
@@ -205,10 +214,15 @@ class LLMRouter:
             prompt = "\n".join(m.get("content", "") for m in messages)
             tokens_in = self._approx_tokens(prompt)
             tokens_out_cap = int(max_tokens or 800)
-            self._ensure_token_budget(tokens_in + tokens_out_cap)
-            text = llama_provider.chat(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens)
+            reserved = tokens_in + tokens_out_cap
+            reserved_at = self._reserve_tokens(reserved)
+            try:
+                text = llama_provider.chat(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens)
+            except Exception:
+                self._add_token_spend(-reserved, reserved_at)
+                raise
             used_out = self._approx_tokens(text)
-            self._add_token_spend(tokens_in + used_out)
+            self._add_token_spend(tokens_in + used_out - reserved, reserved_at)
             return text
 
         # Default: use generate() path with Ollama
@@ -0,0 +1,155 @@
+# packages/memory/olympus_memory/blobs.py
+"""
+Storage codec for large step outputs and event payloads.
+
+Any string (or list) inside an output/payload whose encoded size reaches
+OLY_BLOB_THRESHOLD_BYTES is moved into the content-addressed `blobs` table and
+replaced in the row by a small reference:
+
+    {"$blob": "<sha256>", "bytes": 182734, "preview": "first chars..."}
+
+The same file content in `steps.output_json` and in the `step.done` event
+therefore lands in one blob row. Blobs are compressed with zstd when the
+`zstandard` package is installed, zlib otherwise, and stored raw when that does
+not save at least 10%. `preview` (OLY_BLOB_PREVIEW_CHARS) lets summaries show a
+snippet without loading the blob.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, Iterable, Set, Tuple
+
+try:
+    import zstandard  # optional: better ratio and speed than zlib
+except Exception:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+BLOB_THRESHOLD_BYTES = int(os.getenv("OLY_BLOB_THRESHOLD_BYTES", "4096"))
+BLOB_PREVIEW_CHARS = int(os.getenv("OLY_BLOB_PREVIEW_CHARS", "512"))
+BLOB_CODEC = os.getenv("OLY_BLOB_CODEC", "zstd" if zstandard is not None else "zlib").lower()
+
+REF_KEY = "$blob"
+
+
+def is_ref(v: Any) -> bool:
+    return isinstance(v, dict) and REF_KEY in v
+
+
+def _compress(raw: bytes) -> Tuple[str, bytes]:
+    if BLOB_CODEC == "zstd" and zstandard is not None:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=3).compress(raw)
+    elif BLOB_CODEC in ("zlib", "zstd"):
+        codec, data = "zlib", zlib.compress(raw, 6)
+    else:
+        return "raw", raw
+    if len(data) > len(raw) * 0.9:
+        return "raw", raw
+    return codec, data
+
+
+def decode(codec: str, data: bytes) -> bytes:
+    if codec == "raw":
+        return bytes(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+def externalize(obj: Any, blobs: Dict[str, Tuple[Any, ...]]) -> Any:
+    """
+    Return `obj` with large strings/lists swapped for blob refs. Rows for the `blobs`
+    table (hash, kind, codec, size, stored_size, data, created_at) are added to `blobs`.
+    """
+    if isinstance(obj, dict):
+        if is_ref(obj):
+            return obj  # already externalized (e.g. a step re-persisted from a lazy load)
+        return {k: externalize(v, blobs) for k, v in obj.items()}
+    if isinstance(obj, str):
+        if len(obj) * 4 < BLOB_THRESHOLD_BYTES:  # cheap bound before encoding
+            return obj
+        raw, kind = obj.encode("utf-8"), "text"
+    elif isinstance(obj, list):
+        items = [externalize(v, blobs) for v in obj]
+        raw = json.dumps(items, ensure_ascii=False).encode("utf-8")
+        if len(raw) < BLOB_THRESHOLD_BYTES:
+            return items
+        kind = "json"
+    else:
+        return obj
+    if len(raw) < BLOB_THRESHOLD_BYTES:
+        return obj
+    h = hashlib.sha256(raw).hexdigest()
+    if h not in blobs:
+        codec, data = _compress(raw)
+        blobs[h] = (h, kind, codec, len(raw), len(data), data, int(time.time() * 1000))
+    ref: Dict[str, Any] = {REF_KEY: h, "bytes": len(raw)}
+    if kind == "text" and BLOB_PREVIEW_CHARS > 0:
+        ref["preview"] = obj[:BLOB_PREVIEW_CHARS]
+    return ref
+
+
+def collect_refs(obj: Any, out: Set[str]) -> Set[str]:
+    if isinstance(obj, dict):
+        if is_ref(obj):
+            out.add(obj[REF_KEY])
+        else:
+            for v in obj.values():
+                collect_refs(v, out)
+    elif isinstance(obj, list):
+        for v in obj:
+            collect_refs(v, out)
+    return out
+
+
+def substitute(obj: Any, values: Dict[str, Any]) -> Any:
+    """Replace refs with their decoded values (refs missing from `values` are kept)."""
+    if isinstance(obj, dict):
+        if is_ref(obj):
+            return values.get(obj[REF_KEY], obj)
+        return {k: substitute(v, values) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [substitute(v, values) for v in obj]
+    return obj
+
+
+def load_value(kind: str, codec: str, data: bytes) -> Any:
+    raw = decode(codec, data)
+    return raw.decode("utf-8") if kind == "text" else json.loads(raw)
+
+
+def preview(v: Any, n: int) -> Any:
+    """A string's first `n` chars (+ '...'), also for refs; other values as-is."""
+    if is_ref(v):
+        text = v.get("preview") or ""
+        return text[:n] + "..." if text else None
+    if isinstance(v, str):
+        return v[:n] + ("..." if len(v) > n else "")
+    return v
+
+
+def resolve(rows: Iterable[Dict[str, Any]], fields: Iterable[str], fetch) -> None:
+    """
+    Decode blob refs in `fields` of each row in place. `fetch(hashes)` returns
+    {hash: value}; it is called once per batch and only if a ref is present.
+    """
+    rows = list(rows)
+    fields = list(fields)
+    wanted: Set[str] = set()
+    for r in rows:
+        for f in fields:
+            collect_refs(r.get(f), wanted)
+    if not wanted:
+        return
+    values = fetch(wanted)
+    for r in rows:
+        for f in fields:
+            if r.get(f) is not None:
+                r[f] = substitute(r[f], values)
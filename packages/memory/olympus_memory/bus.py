@@ -0,0 +1,86 @@
+# packages/memory/olympus_memory/bus.py
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Set
+
+
+class Subscription:
+    """
+    A bounded per-subscriber queue of events for one plan, owned by an asyncio loop.
+    If the consumer falls behind and the queue fills, further events are dropped and
+    `overflowed` is set; the consumer should then re-read from the DB by cursor.
+    """
+
+    def __init__(self, bus: "EventBus", plan_id: str, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.plan_id = plan_id
+        self.overflowed = False
+        self._bus = bus
+        self._loop = loop
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue)
+
+    def _put(self, ev: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None if none arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._bus._unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class EventBus:
+    """
+    In-process fan-out of appended plan events to asyncio subscribers.
+    publish() is thread-safe and never blocks: delivery is scheduled on each
+    subscriber's loop. Events written by other processes are not seen here.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subs: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, plan_id: str) -> Subscription:
+        """Subscribe to a plan's events; must be called from the consuming event loop."""
+        sub = Subscription(self, plan_id, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subs.setdefault(plan_id, set()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.plan_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.plan_id]
+
+    def subscribers(self, plan_id: Optional[str] = None) -> int:
+        with self._lock:
+            if plan_id is not None:
+                return len(self._subs.get(plan_id, ()))
+            return sum(len(s) for s in self._subs.values())
+
+    def publish(self, ev: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs.get(ev.get("plan_id"), ()))
+        for sub in subs:
+            try:
+                sub._loop.call_soon_threadsafe(sub._put, dict(ev))
+            except RuntimeError:  # subscriber's loop is closed
+                self._unsubscribe(sub)
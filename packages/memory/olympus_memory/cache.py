@@ -0,0 +1,120 @@
+# packages/memory/olympus_memory/cache.py
+"""
+Caching around the `cache_items` table (LLM responses, step memos, budgets).
+
+`L1Cache` is the in-process LRU that `MemoryDB.cache_get` consults before SQLite.
+
+Expired rows are otherwise only removed when the same key is read again, so
+`CacheSweeper` calls `MemoryDB.sweep_cache()` every OLY_CACHE_SWEEP_INTERVAL_S
+seconds: expired rows are deleted in batches and the table is then trimmed to
+OLY_CACHE_MAX_ENTRIES / OLY_CACHE_MAX_BYTES by LRU or LFU (OLY_CACHE_EVICTION).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:  # db.py imports L1Cache from here
+    from .db import MemoryDB
+
+CACHE_SWEEP_INTERVAL_S = float(os.getenv("OLY_CACHE_SWEEP_INTERVAL_S", "60"))  # 0 disables
+L1_MAX_ENTRIES = int(os.getenv("OLY_CACHE_L1_ENTRIES", "1024"))  # 0 disables the L1
+L1_MAX_VALUE_BYTES = int(os.getenv("OLY_CACHE_L1_MAX_VALUE_BYTES", "65536"))  # larger rows skip it
+
+
+class L1Cache:
+    """
+    Bounded LRU of decoded cache rows ({"key", "value", "meta", "created_at",
+    "expires_at"}) that honours each row's expires_at. Returned rows are shared, so
+    callers must not mutate them.
+
+    `generation()` is bumped by every local write or invalidation; a fill computed
+    from a SQLite read passes the generation it saw before reading and is dropped
+    if a write happened meanwhile, so a slow reader cannot reinstate a stale row.
+    """
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_value_bytes: int = L1_MAX_VALUE_BYTES):
+        self.max_entries = max_entries
+        self.max_value_bytes = max_value_bytes
+        self._lock = threading.Lock()
+        self._rows: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._gen = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def generation(self) -> int:
+        return self._gen
+
+    def get(self, key: str, now_ms: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None and row["expires_at"] is not None and row["expires_at"] < now_ms:
+                del self._rows[key]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(key)
+            self.hits += 1
+            return row
+
+    def put(self, key: str, row: Dict[str, Any], size: int, generation: Optional[int] = None) -> None:
+        """Store `row`; with `generation`, only if no write happened since it was taken."""
+        with self._lock:
+            if generation is None:
+                self._gen += 1  # a local write: racing fills of older reads must not land
+            elif generation != self._gen:
+                return
+            if size > self.max_value_bytes:
+                self._rows.pop(key, None)
+                return
+            self._rows[key] = row
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._gen += 1
+            self._rows.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._gen += 1
+            self._rows.clear()
+
+
+class CacheSweeper:
+    """Runs `db.sweep_cache()` every `interval_s` seconds in a daemon thread."""
+
+    def __init__(self, db: MemoryDB, interval_s: float = CACHE_SWEEP_INTERVAL_S):
+        self.db = db
+        self.interval_s = interval_s
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None and self.interval_s > 0:
+            self._thread = threading.Thread(target=self._loop, name="memorydb-cache-sweep", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.last_result = self.db.sweep_cache()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
@@ -3,10 +3,20 @@ from __future__ import annotations
 
 import json
 import os
+import re
 import sqlite3
+import struct
 import threading
 import time
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import blobs as blobcodec
+from .bus import EventBus
+from .cache import L1_MAX_ENTRIES, L1Cache
+from .migrate import SEARCH_BACKFILL, migrate
+from .pool import LockStats, ReadPool
+from .vectors import VectorIndex
 
 # Public helpers expected by tests and callers that import `olympus_memory`
 # These are light wrappers around sqlite3 to ensure WAL mode and a base
@@ -43,15 +53,12 @@ def get_connection(readonly: bool = False) -> sqlite3.Connection:
 
 def ensure_base_schema() -> None:
     """
-    Create a minimal base schema used by tests, including schema_migrations.
-    Idempotent.
+    Bring the configured DB up to the current schema (see migrate.py), recording
+    applied versions in schema_migrations. Idempotent.
     """
     conn = get_connection(readonly=False)
     try:
-        with conn:
-            conn.execute(
-                "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER NOT NULL)"
-            )
+        migrate(conn)
     finally:
         conn.close()
 
@@ -60,277 +67,1518 @@ DEFAULT_DB_PATH = os.getenv(
     os.getenv("OLYMPUS_DB", os.path.abspath(".data/olympus.db")),
 )
 
-_SCHEMA = """
-PRAGMA journal_mode=WAL;
-PRAGMA synchronous=NORMAL;
-
-CREATE TABLE IF NOT EXISTS schema_version (
-  version INTEGER NOT NULL
-);
-
-INSERT INTO schema_version(version) SELECT 1 WHERE NOT EXISTS(SELECT 1 FROM schema_version);
-
-CREATE TABLE IF NOT EXISTS plans (
-  id TEXT PRIMARY KEY,
-  title TEXT NOT NULL,
-  state TEXT NOT NULL,
-  budget_json TEXT NOT NULL,
-  metadata_json TEXT NOT NULL,
-  created_at INTEGER NOT NULL,
-  updated_at INTEGER NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS steps (
-  id TEXT PRIMARY KEY,
-  plan_id TEXT NOT NULL,
-  name TEXT NOT NULL,
-  state TEXT NOT NULL,
-  attempts INTEGER NOT NULL,
-  max_retries INTEGER NOT NULL,
-  capability_json TEXT NOT NULL,
-  input_json TEXT NOT NULL,
-  output_json TEXT,
-  error TEXT,
-  deps_json TEXT NOT NULL,
-  guard_json TEXT NOT NULL,
-  started_at INTEGER,
-  ended_at INTEGER,
-  FOREIGN KEY(plan_id) REFERENCES plans(id) ON DELETE CASCADE
-);
-
-CREATE TABLE IF NOT EXISTS events (
-  id TEXT PRIMARY KEY,
-  ts INTEGER NOT NULL,
-  type TEXT NOT NULL,
-  plan_id TEXT NOT NULL,
-  step_id TEXT,
-  payload_json TEXT NOT NULL
-);
-
-CREATE INDEX IF NOT EXISTS idx_events_plan ON events(plan_id, ts);
-
-CREATE TABLE IF NOT EXISTS cache_items (
-  key TEXT PRIMARY KEY,
-  value_json TEXT NOT NULL,
-  meta_json TEXT NOT NULL,
-  created_at INTEGER NOT NULL,
-  expires_at INTEGER
-);
-
-CREATE TABLE IF NOT EXISTS facts (
-  id TEXT PRIMARY KEY,
-  kind TEXT NOT NULL,
-  data_json TEXT NOT NULL,
-  created_at INTEGER NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS entities (
-  id TEXT PRIMARY KEY,
-  type TEXT NOT NULL,
-  data_json TEXT NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS relations (
-  id TEXT PRIMARY KEY,
-  src_id TEXT NOT NULL,
-  dst_id TEXT NOT NULL,
-  type TEXT NOT NULL,
-  data_json TEXT NOT NULL
-);
-
-CREATE TABLE IF NOT EXISTS embeddings (
-  id TEXT PRIMARY KEY,
-  dim INTEGER NOT NULL,
-  vector BLOB NOT NULL,
-  meta_json TEXT NOT NULL
-);
-"""
+# Read-only connections served alongside the single writer; 0 => share the writer.
+READ_POOL_SIZE = int(os.getenv("OLY_DB_READ_POOL_SIZE", "4"))
+# 'immediate' commits every plan/step/event write; 'batched' buffers them (write-behind)
+# and commits one transaction per flush interval or once FLUSH_MAX_ITEMS rows are queued.
+DURABILITY = os.getenv("OLY_DB_DURABILITY", "immediate").lower()
+FLUSH_INTERVAL_MS = int(os.getenv("OLY_DB_FLUSH_INTERVAL_MS", "200"))
+FLUSH_MAX_ITEMS = int(os.getenv("OLY_DB_FLUSH_MAX_ITEMS", "500"))
+# cache_items budget enforced by sweep_cache(); 0 disables a limit. Keys starting with a
+# pinned prefix (daily budgets) are never evicted, only expired.
+CACHE_MAX_ENTRIES = int(os.getenv("OLY_CACHE_MAX_ENTRIES", "100000"))
+CACHE_MAX_BYTES = int(os.getenv("OLY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_EVICTION = os.getenv("OLY_CACHE_EVICTION", "lru").lower()  # lru | lfu
+CACHE_PINNED_PREFIXES = tuple(p for p in os.getenv("OLY_CACHE_PINNED_PREFIXES", "budget").split(",") if p)
+# cache_get records hits in memory; they are written once this many keys are pending.
+CACHE_TOUCH_FLUSH_KEYS = 1000
 
 
 def _dict_factory(cursor, row):
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 
+_UPSERT_PLAN_SQL = """INSERT INTO plans(id,title,state,budget_json,metadata_json,created_at,updated_at)
+   VALUES(?,?,?,?,?,?,?)
+   ON CONFLICT(id) DO UPDATE SET
+     title=excluded.title, state=excluded.state,
+     budget_json=excluded.budget_json, metadata_json=excluded.metadata_json,
+     updated_at=excluded.updated_at
+"""
+
+_UPSERT_STEP_SQL = """INSERT INTO steps(id,plan_id,name,state,attempts,max_retries,
+                     capability_json,input_json,output_json,error,
+                     deps_json,guard_json,started_at,ended_at)
+   VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+   ON CONFLICT(id) DO UPDATE SET
+     plan_id=excluded.plan_id, name=excluded.name, state=excluded.state,
+     attempts=excluded.attempts, max_retries=excluded.max_retries,
+     capability_json=excluded.capability_json, input_json=excluded.input_json,
+     output_json=excluded.output_json, error=excluded.error,
+     deps_json=excluded.deps_json, guard_json=excluded.guard_json,
+     started_at=excluded.started_at, ended_at=excluded.ended_at
+"""
+
+_INSERT_EVENT_SQL = """INSERT INTO events(id,ts,type,plan_id,step_id,payload_json)
+   VALUES(?,?,?,?,?,?)"""
+
+_TERMINAL_PLAN_STATES = ("DONE", "FAILED", "CANCELLED")
+
+# Events kept when a plan is rolled up: revision lineage is looked up through them.
+_ROLLUP_KEEP_EVENT_TYPES = ("plan.revised", "plan.revised_to")
+
+
+def _like_prefix(prefix: str) -> str:
+    """LIKE pattern (with ESCAPE '\\') matching strings that start with `prefix` literally."""
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _type_filter(types: Iterable[str]) -> Tuple[str, List[Any]]:
+    """SQL condition on events.type: entries match exactly, or by prefix when they end in '*'."""
+    types = list(types)
+    exact = [t for t in types if not t.endswith("*")]
+    prefixes = [t[:-1] for t in types if t.endswith("*")]
+    alts: List[str] = []
+    params: List[Any] = []
+    if exact:
+        alts.append(f"type IN ({','.join('?' * len(exact))})")
+        params += exact
+    for pre in prefixes:
+        alts.append("type LIKE ? ESCAPE '\\'")
+        params.append(_like_prefix(pre))
+    return "(" + " OR ".join(alts) + ")", params
+
+
+# One statement: add to the counter, or restart it if its window has passed.
+# SET expressions all see the row's old values.
+_INCR_COUNTER_SQL = """INSERT INTO counters(key,value,window_start,expires_at,updated_at) VALUES(?,?,?,?,?)
+   ON CONFLICT(key) DO UPDATE SET
+     value=CASE WHEN counters.expires_at <= excluded.updated_at THEN excluded.value
+                ELSE counters.value + excluded.value END,
+     window_start=CASE WHEN counters.expires_at <= excluded.updated_at THEN excluded.window_start
+                       ELSE counters.window_start END,
+     expires_at=CASE WHEN counters.expires_at <= excluded.updated_at THEN excluded.expires_at
+                     ELSE counters.expires_at END,
+     updated_at=excluded.updated_at
+   RETURNING value"""
+
+
+_UPSERT_ENTITY_SQL = """INSERT INTO entities(id,type,data_json) VALUES(?,?,?)
+   ON CONFLICT(id) DO UPDATE SET type=excluded.type, data_json=excluded.data_json"""
+
+_UPSERT_EMBEDDING_SQL = """INSERT INTO embeddings(id,dim,vector,meta_json) VALUES(?,?,?,?)
+   ON CONFLICT(id) DO UPDATE SET dim=excluded.dim, vector=excluded.vector, meta_json=excluded.meta_json"""
+
+_UPSERT_RELATION_SQL = """INSERT INTO relations(id,src_id,dst_id,type,data_json) VALUES(?,?,?,?,?)
+   ON CONFLICT(id) DO UPDATE SET
+     src_id=excluded.src_id, dst_id=excluded.dst_id, type=excluded.type, data_json=excluded.data_json"""
+
+
+def _graph_edge(direction: str, node: str) -> Tuple[str, str]:
+    """(condition that relation `r` touches `node`, expression for its other end) for a direction."""
+    if direction == "out":
+        return f"r.src_id = {node}", "r.dst_id"
+    if direction == "in":
+        return f"r.dst_id = {node}", "r.src_id"
+    if direction == "both":
+        return (
+            f"(r.src_id = {node} OR r.dst_id = {node})",
+            f"CASE WHEN r.src_id = {node} THEN r.dst_id ELSE r.src_id END",
+        )
+    raise ValueError(f"Unknown graph direction: {direction}")
+
+
+def _type_in(types: Optional[Iterable[str]]) -> Tuple[str, Dict[str, Any]]:
+    types = list(types) if types else []
+    if not types:
+        return "", {}
+    params = {f"t{i}": t for i, t in enumerate(types)}
+    return f" AND r.type IN ({','.join(':' + k for k in params)})", params
+
+
+def _relation_row(r: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": r["id"], "src_id": r["src_id"], "dst_id": r["dst_id"], "type": r["type"],
+            "data": json.loads(r["data_json"])}
+
+
+def _window(window_ms: Optional[int], now_ms: int) -> Tuple[Optional[int], Optional[int]]:
+    if not window_ms:
+        return None, None
+    start = now_ms - now_ms % window_ms
+    return start, start + window_ms
+
+
+# One BM25-ranked query per search kind against the FTS5 tables of migration 8; `rank`
+# is bm25() (lower is better). {plan} is replaced by the optional plan filter.
+_SEARCH_SQL = {
+    "fact": """SELECT f.id, NULL AS plan_id, f.kind AS label, f.created_at AS ts,
+                      snippet(fts_facts, 1, '[', ']', '...', :tokens) AS snippet, fts_facts.rank AS rank
+               FROM fts_facts JOIN facts f ON f.rowid = fts_facts.rowid
+               WHERE fts_facts MATCH :q {plan} ORDER BY fts_facts.rank LIMIT :limit""",
+    "step": """SELECT s.id, s.plan_id, s.name AS label, s.ended_at AS ts,
+                      snippet(fts_steps, 1, '[', ']', '...', :tokens) AS snippet, fts_steps.rank AS rank
+               FROM fts_steps JOIN steps s ON s.rowid = fts_steps.rowid
+               WHERE fts_steps MATCH :q {plan} ORDER BY fts_steps.rank LIMIT :limit""",
+    "chat": """SELECT e.id, e.plan_id, e.type AS label, e.ts,
+                      snippet(fts_chat, 0, '[', ']', '...', :tokens) AS snippet, fts_chat.rank AS rank
+               FROM fts_chat JOIN events e ON e.rowid = fts_chat.rowid
+               WHERE fts_chat MATCH :q {plan} ORDER BY fts_chat.rank LIMIT :limit""",
+}
+SEARCH_KINDS = tuple(_SEARCH_SQL)
+
+# Fallback without FTS5: substring match on the raw row text (JSON keys included),
+# ranked by how many query terms occur. {score} sums one LIKE per term.
+_LIKE_SEARCH_SQL = {
+    "fact": """SELECT id, NULL AS plan_id, kind AS label, created_at AS ts,
+                      substr(data_json, 1, :chars) AS snippet, -({score}) AS rank
+               FROM facts WHERE ({score}) > 0 {plan} ORDER BY rank, ts DESC LIMIT :limit""",
+    "step": """SELECT id, plan_id, name AS label, ended_at AS ts,
+                      substr({text}, 1, :chars) AS snippet, -({score}) AS rank
+               FROM steps WHERE ({score}) > 0 {plan} ORDER BY rank, ts DESC LIMIT :limit""",
+    "chat": """SELECT id, plan_id, type AS label, ts,
+                      substr(payload_json, 1, :chars) AS snippet, -({score}) AS rank
+               FROM events WHERE type GLOB 'chat.*' AND ({score}) > 0 {plan} ORDER BY rank, ts DESC LIMIT :limit""",
+}
+_LIKE_SEARCH_TEXT = {
+    "fact": "data_json",
+    "step": "(coalesce(output_json, '') || ' ' || coalesce(error, ''))",
+    "chat": "payload_json",
+}
+
+_SEARCH_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _search_terms(text: str) -> List[str]:
+    return list(dict.fromkeys(t.lower() for t in _SEARCH_TERM_RE.findall(text)))
+
+
+def _fts_query(text: str) -> str:
+    """Free text as an FTS5 query: every word quoted (no operators), any word may match."""
+    return " OR ".join(f'"{t}"' for t in _search_terms(text))
+
+
+def _like_search_sql(kind: str, n_terms: int) -> str:
+    text = _LIKE_SEARCH_TEXT[kind]
+    score = " + ".join(f"({text} LIKE :t{i} ESCAPE '\\')" for i in range(n_terms))
+    return _LIKE_SEARCH_SQL[kind].replace("{text}", text).replace("{score}", score)
+
+
+_INSERT_BLOB_SQL = """INSERT OR IGNORE INTO blobs(hash,kind,codec,size,stored_size,data,created_at)
+   VALUES(?,?,?,?,?,?,?)"""
+
+# Write-behind tables, in the order they are flushed within one transaction
+# (blobs first, so no committed row ever references a missing blob).
+_WRITE_BEHIND_SQL = {
+    "blobs": _INSERT_BLOB_SQL,
+    "plans": _UPSERT_PLAN_SQL,
+    "steps": _UPSERT_STEP_SQL,
+    "events": _INSERT_EVENT_SQL,
+}
+
+
+def _plan_params(plan_dict: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
+        plan_dict["id"],
+        plan_dict["title"],
+        plan_dict["state"],
+        json.dumps(plan_dict["budget"]),
+        json.dumps(plan_dict.get("metadata", {})),
+        plan_dict["created_at"],
+        plan_dict["updated_at"],
+    )
+
+
+def _step_params(step_dict: Dict[str, Any], blobs: Dict[str, Tuple[Any, ...]]) -> Tuple[Any, ...]:
+    output = step_dict.get("output")
+    return (
+        step_dict["id"],
+        step_dict["plan_id"],
+        step_dict["name"],
+        step_dict["state"],
+        step_dict["attempts"],
+        step_dict.get("max_retries", 0),
+        json.dumps(step_dict["capability"]),
+        json.dumps(step_dict.get("input", {})),
+        json.dumps(blobcodec.externalize(output, blobs)) if output is not None else None,
+        step_dict.get("error"),
+        json.dumps(step_dict.get("deps", [])),
+        json.dumps(step_dict.get("guard", {})),
+        step_dict.get("started_at"),
+        step_dict.get("ended_at"),
+    )
+
+
+def _event_params(ev: Dict[str, Any], blobs: Dict[str, Tuple[Any, ...]]) -> Tuple[Any, ...]:
+    return (
+        ev["id"],
+        ev["ts"],
+        ev["type"],
+        ev["plan_id"],
+        ev.get("step_id"),
+        json.dumps(blobcodec.externalize(ev.get("payload", {}), blobs)),
+    )
+
+
 class MemoryDB:
-    """Lightweight SQLite store for plans, steps, events, cache, and knowledge graph."""
+    """Lightweight SQLite store for plans, steps, events, cache, and knowledge graph.
+
+    Writes are serialized through a single connection. Reads go through a bounded
+    pool of read-only connections (WAL allows them to proceed during writes); set
+    `read_pool_size=0` (or OLY_DB_READ_POOL_SIZE=0) to share the writer connection.
 
-    def __init__(self, path: str = DEFAULT_DB_PATH):
+    With `durability="batched"` plan/step/event writes are buffered and committed
+    together by a background flusher; call `flush()` to force them out. Up to one
+    flush interval of writes can be lost if the process dies. Plan/step/event reads
+    flush first, so callers always observe their own writes.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        read_pool_size: Optional[int] = None,
+        durability: Optional[str] = None,
+    ):
         self.path = path
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
         self._lock = threading.RLock()
+        self._stats = LockStats()
+        self.bus = EventBus()  # live feed of append_event for in-process subscribers (SSE)
         self._conn = sqlite3.connect(self.path, check_same_thread=False)
         self._conn.row_factory = _dict_factory
-        with self._conn:
-            self._conn.executescript(_SCHEMA)
+        # auto_vacuum only takes effect on a new, empty file; existing DBs keep their mode
+        # until a full VACUUM (enable_incremental_vacuum). Lets compact() shrink the file.
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        migrate(self._conn)
+        # Migration 8 skips the FTS5 indexes on SQLite builds without FTS5
+        self._fts = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='fts_facts'").fetchone() is not None
+        size = READ_POOL_SIZE if read_pool_size is None else read_pool_size
+        self._pool = ReadPool(self.path, size, self._stats, _dict_factory) if size > 0 else None
+
+        mode = (durability or DURABILITY).lower()
+        if mode not in ("immediate", "batched"):
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.durability = mode
+        self._batched = mode == "batched"
+        self._buf_lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Tuple[Any, ...]]] = {t: {} for t in _WRITE_BEHIND_SQL}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._cache_lock = threading.Lock()
+        self._cache_touches: Dict[str, Tuple[int, int]] = {}  # key -> (last access ms, new hits)
+        self._cache_counts = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        # Decoded hot rows served without SQLite; see _l1_current() for cross-process validity.
+        self._l1: Optional[L1Cache] = L1Cache() if L1_MAX_ENTRIES > 0 else None
+        self._l1_version = self._conn.execute("PRAGMA data_version").fetchone()["data_version"]
+        self._vectors: Optional[VectorIndex] = None  # built by the first knn()
+        if self._batched:
+            self._flusher = threading.Thread(target=self._flush_loop, name="memorydb-flush", daemon=True)
+            self._flusher.start()
 
     def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+        self._flush_cache_touches()
+        if self._pool is not None:
+            self._pool.close()
         with self._lock:
             self._conn.close()
 
+    # ----------------- Connections -----------------
+    @contextmanager
+    def _write(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Serialized write transaction on the writer connection.
+        immediate=True takes SQLite's write lock up front (BEGIN IMMEDIATE) so reads inside
+        the transaction are consistent with its writes across processes sharing the file.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._stats.record("write", time.perf_counter() - start)
+            with self._conn:
+                if immediate:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                yield self._conn
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """Connection for read-only queries: pooled when enabled, else the writer under the lock."""
+        if self._pool is not None:
+            with self._pool.connection() as conn:
+                yield conn
+            return
+        start = time.perf_counter()
+        with self._lock:
+            self._stats.record("read", time.perf_counter() - start)
+            yield self._conn
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool sizing and cumulative lock wait times (seconds) for metrics export."""
+        return {
+            "read_pool_size": self._pool.size if self._pool else 0,
+            "read_pool_open": self._pool.opened() if self._pool else 0,
+            "read_pool_in_use": self._pool.in_use() if self._pool else 0,
+            "locks": self._stats.snapshot(),
+        }
+
+    # ----------------- Write-behind -----------------
+    def _enqueue(self, table: str, key: str, params: Tuple[Any, ...]) -> None:
+        # Later writes to the same row replace earlier ones still in the buffer.
+        with self._buf_lock:
+            self._pending[table][key] = params
+            queued = sum(len(v) for v in self._pending.values())
+        if queued >= FLUSH_MAX_ITEMS:
+            self.flush()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(FLUSH_INTERVAL_MS / 1000.0):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self) -> int:
+        """Commit all buffered writes in one transaction. Returns the number of rows written."""
+        with self._buf_lock:
+            if not any(self._pending.values()):
+                return 0
+        # Hold the writer lock across swap+commit so concurrent flushes cannot reorder rows.
+        with self._lock:
+            with self._buf_lock:
+                batch, self._pending = self._pending, {t: {} for t in _WRITE_BEHIND_SQL}
+            try:
+                with self._write() as conn:
+                    for table, sql in _WRITE_BEHIND_SQL.items():
+                        if batch[table]:
+                            conn.executemany(sql, list(batch[table].values()))
+            except Exception:
+                # Put the batch back without clobbering newer writes queued meanwhile.
+                with self._buf_lock:
+                    for table, rows in batch.items():
+                        for key, params in rows.items():
+                            self._pending[table].setdefault(key, params)
+                raise
+        return sum(len(v) for v in batch.values())
+
     # ----------------- Plans & Steps -----------------
     def upsert_plan(self, plan_dict: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                """INSERT INTO plans(id,title,state,budget_json,metadata_json,created_at,updated_at)
-                   VALUES(?,?,?,?,?,?,?)
-                   ON CONFLICT(id) DO UPDATE SET
-                     title=excluded.title, state=excluded.state,
-                     budget_json=excluded.budget_json, metadata_json=excluded.metadata_json,
-                     updated_at=excluded.updated_at
-                """,
-                (
-                    plan_dict["id"],
-                    plan_dict["title"],
-                    plan_dict["state"],
-                    json.dumps(plan_dict["budget"]),
-                    json.dumps(plan_dict.get("metadata", {})),
-                    plan_dict["created_at"],
-                    plan_dict["updated_at"],
-                ),
-            )
+        params = _plan_params(plan_dict)
+        if self._batched:
+            self._enqueue("plans", plan_dict["id"], params)
+            return
+        with self._write() as conn:
+            conn.execute(_UPSERT_PLAN_SQL, params)
+
+    def _enqueue_blobs(self, blobs: Dict[str, Tuple[Any, ...]]) -> None:
+        for h, params in blobs.items():
+            self._enqueue("blobs", h, params)
 
     def upsert_step(self, step_dict: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                """INSERT INTO steps(id,plan_id,name,state,attempts,max_retries,
-                                     capability_json,input_json,output_json,error,
-                                     deps_json,guard_json,started_at,ended_at)
-                   VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                   ON CONFLICT(id) DO UPDATE SET
-                     plan_id=excluded.plan_id, name=excluded.name, state=excluded.state,
-                     attempts=excluded.attempts, max_retries=excluded.max_retries,
-                     capability_json=excluded.capability_json, input_json=excluded.input_json,
-                     output_json=excluded.output_json, error=excluded.error,
-                     deps_json=excluded.deps_json, guard_json=excluded.guard_json,
-                     started_at=excluded.started_at, ended_at=excluded.ended_at
-                """,
-                (
-                    step_dict["id"],
-                    step_dict["plan_id"],
-                    step_dict["name"],
-                    step_dict["state"],
-                    step_dict["attempts"],
-                    step_dict.get("max_retries", 0),
-                    json.dumps(step_dict["capability"]),
-                    json.dumps(step_dict.get("input", {})),
-                    json.dumps(step_dict.get("output")) if step_dict.get("output") is not None else None,
-                    step_dict.get("error"),
-                    json.dumps(step_dict.get("deps", [])),
-                    json.dumps(step_dict.get("guard", {})),
-                    step_dict.get("started_at"),
-                    step_dict.get("ended_at"),
-                ),
-            )
+        blobs: Dict[str, Tuple[Any, ...]] = {}
+        params = _step_params(step_dict, blobs)
+        if self._batched:
+            self._enqueue_blobs(blobs)
+            self._enqueue("steps", step_dict["id"], params)
+            return
+        with self._write() as conn:
+            if blobs:
+                conn.executemany(_INSERT_BLOB_SQL, list(blobs.values()))
+            conn.execute(_UPSERT_STEP_SQL, params)
+
+    def upsert_steps(self, step_dicts: Iterable[Dict[str, Any]]) -> int:
+        """Upsert many steps with one executemany in a single transaction. Returns the row count."""
+        blobs: Dict[str, Tuple[Any, ...]] = {}
+        rows = [(d["id"], _step_params(d, blobs)) for d in step_dicts]
+        if not rows:
+            return 0
+        if self._batched:
+            self._enqueue_blobs(blobs)
+            for key, params in rows:
+                self._enqueue("steps", key, params)
+            return len(rows)
+        with self._write() as conn:
+            if blobs:
+                conn.executemany(_INSERT_BLOB_SQL, list(blobs.values()))
+            conn.executemany(_UPSERT_STEP_SQL, [params for _, params in rows])
+        return len(rows)
 
     def get_plan(self, plan_id: str) -> Optional[Dict[str, Any]]:
-        with self._lock:
-            row = self._conn.execute("SELECT * FROM plans WHERE id=?", (plan_id,)).fetchone()
-            if not row:
-                return None
-            row["budget"] = json.loads(row.pop("budget_json"))
-            row["metadata"] = json.loads(row.pop("metadata_json"))
-            return row
+        self.flush()
+        with self._read() as conn:
+            row = conn.execute("SELECT * FROM plans WHERE id=?", (plan_id,)).fetchone()
+        if not row:
+            return None
+        row["budget"] = json.loads(row.pop("budget_json"))
+        row["metadata"] = json.loads(row.pop("metadata_json"))
+        return row
 
-    def get_steps(self, plan_id: str) -> List[Dict[str, Any]]:
-        with self._lock:
-            rows = self._conn.execute("SELECT * FROM steps WHERE plan_id=? ORDER BY id", (plan_id,)).fetchall()
-            for r in rows:
-                r["capability"] = json.loads(r.pop("capability_json"))
-                r["input"] = json.loads(r.pop("input_json"))
-                r["deps"] = json.loads(r.pop("deps_json"))
-                r["guard"] = json.loads(r.pop("guard_json"))
-                if r.get("output_json") is not None:
-                    r["output"] = json.loads(r.pop("output_json"))
-                else:
-                    r["output"] = None
-            return rows
+    def get_steps(self, plan_id: str, resolve_blobs: bool = True) -> List[Dict[str, Any]]:
+        """
+        Steps of a plan. With resolve_blobs=False large output values stay as
+        {"$blob", "bytes", "preview"} refs (see blobs.py) and are never decoded.
+        """
+        self.flush()
+        with self._read() as conn:
+            rows = conn.execute("SELECT * FROM steps WHERE plan_id=? ORDER BY id", (plan_id,)).fetchall()
+        for r in rows:
+            r["capability"] = json.loads(r.pop("capability_json"))
+            r["input"] = json.loads(r.pop("input_json"))
+            r["deps"] = json.loads(r.pop("deps_json"))
+            r["guard"] = json.loads(r.pop("guard_json"))
+            if r.get("output_json") is not None:
+                r["output"] = json.loads(r.pop("output_json"))
+            else:
+                r["output"] = None
+        if resolve_blobs:
+            blobcodec.resolve(rows, ("output",), self.get_blobs)
+        return rows
 
     # ----------------- Events (append-only transcript) -----------------
     def append_event(self, ev: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                """INSERT INTO events(id,ts,type,plan_id,step_id,payload_json)
-                   VALUES(?,?,?,?,?,?)""",
+        blobs: Dict[str, Tuple[Any, ...]] = {}
+        params = _event_params(ev, blobs)
+        if self._batched:
+            self._enqueue_blobs(blobs)
+            self._enqueue("events", ev["id"], params)
+        else:
+            with self._write() as conn:
+                if blobs:
+                    conn.executemany(_INSERT_BLOB_SQL, list(blobs.values()))
+                conn.execute(_INSERT_EVENT_SQL, params)
+        self.bus.publish(ev)
+
+    def events_page(
+        self,
+        plan_id: str,
+        after_ts: Optional[int] = None,
+        after_id: Optional[str] = None,
+        limit: int = 100,
+        types: Optional[Iterable[str]] = None,
+        step_id: Optional[str] = None,
+        resolve_blobs: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        One page of a plan's events in append order, strictly after the cursor event
+        (after_ts alone: after that millisecond). If the cursor event no longer exists,
+        the page restarts at the beginning of its millisecond.
+        `types` entries match exactly, or by prefix when they end in '*' ("step.*").
+        """
+        self.flush()
+        where = ["plan_id=?"]
+        params: List[Any] = [plan_id]
+        if after_ts is not None:
+            if after_id is not None:
+                where.append("(ts, rowid) > (?, COALESCE((SELECT rowid FROM events WHERE id=?), -1))")
+                params += [after_ts, after_id]
+            else:
+                where.append("ts > ?")
+                params.append(after_ts)
+        if types:
+            clause, type_params = _type_filter(types)
+            where.append(clause)
+            params += type_params
+        if step_id is not None:
+            where.append("step_id=?")
+            params.append(step_id)
+        params.append(limit)
+        with self._read() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM events WHERE {' AND '.join(where)} ORDER BY ts, rowid LIMIT ?", params
+            ).fetchall()
+        for r in rows:
+            r["payload"] = json.loads(r.pop("payload_json"))
+        if resolve_blobs:
+            blobcodec.resolve(rows, ("payload",), self.get_blobs)
+        return rows
+
+    def events_for_plan(
+        self,
+        plan_id: str,
+        types: Optional[Iterable[str]] = None,
+        step_id: Optional[str] = None,
+        page_size: int = 1000,
+        resolve_blobs: bool = True,
+    ) -> Iterable[Dict[str, Any]]:
+        """All matching events in append order, fetched lazily one page at a time."""
+        types = list(types) if types else None
+        after_ts, after_id = None, None
+        while True:
+            page = self.events_page(plan_id, after_ts, after_id, page_size, types, step_id, resolve_blobs)
+            yield from page
+            if len(page) < page_size:
+                return
+            after_ts, after_id = page[-1]["ts"], page[-1]["id"]
+
+    def event_summary(self, plan_id: str) -> Dict[str, Any]:
+        """Event counts by type plus the cursor of the newest event (None if there are none)."""
+        self.flush()
+        with self._read() as conn:
+            counts = conn.execute(
+                "SELECT type, COUNT(*) AS n FROM events WHERE plan_id=? GROUP BY type", (plan_id,)
+            ).fetchall()
+            last = conn.execute(
+                "SELECT ts, id FROM events WHERE plan_id=? ORDER BY ts DESC, rowid DESC LIMIT 1", (plan_id,)
+            ).fetchone()
+        by_type = {r["type"]: r["n"] for r in counts}
+        return {
+            "count": sum(by_type.values()),
+            "by_type": by_type,
+            "cursor": {"after_ts": last["ts"], "after_id": last["id"]} if last else None,
+        }
+
+    # ----------------- Blobs (large output/payload values) -----------------
+    def get_blobs(self, hashes: Iterable[str]) -> Dict[str, Any]:
+        """Decoded values for the given blob hashes (missing hashes are omitted)."""
+        hashes = list(hashes)
+        out: Dict[str, Any] = {}
+        with self._read() as conn:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i : i + 500]
+                rows = conn.execute(
+                    f"SELECT hash, kind, codec, data FROM blobs WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for r in rows:
+                    out[r["hash"]] = blobcodec.load_value(r["kind"], r["codec"], r["data"])
+        return out
+
+    def get_blob(self, blob_hash: str) -> Optional[Any]:
+        return self.get_blobs([blob_hash]).get(blob_hash)
+
+    def blob_stats(self) -> Dict[str, int]:
+        self.flush()
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n, COALESCE(SUM(size),0) AS size, COALESCE(SUM(stored_size),0) AS stored FROM blobs"
+            ).fetchone()
+        return {"count": int(row["n"]), "bytes": int(row["size"]), "stored_bytes": int(row["stored"])}
+
+    # ----------------- Plan runs (crash recovery) -----------------
+    def save_plan_run(self, plan_id: str, consent: Optional[Dict[str, Any]] = None, resumed: bool = False) -> None:
+        """Record that a plan run started (or resumed); a resume keeps the original consent if none is given."""
+        consent_json = json.dumps(consent) if consent is not None else None
+        with self._write() as conn:
+            conn.execute(
+                """INSERT INTO plan_runs(plan_id,consent_json,started_at,resumes) VALUES(?,?,?,0)
+                   ON CONFLICT(plan_id) DO UPDATE SET
+                     consent_json=COALESCE(excluded.consent_json, plan_runs.consent_json),
+                     resumes=plan_runs.resumes + ?""",
+                (plan_id, consent_json, int(time.time() * 1000), 1 if resumed else 0),
+            )
+
+    def get_plan_run(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._read() as conn:
+            row = conn.execute("SELECT * FROM plan_runs WHERE plan_id=?", (plan_id,)).fetchone()
+        if not row:
+            return None
+        row["consent"] = json.loads(row.pop("consent_json")) if row.get("consent_json") else None
+        return row
+
+    def claim_plan_run(self, plan_id: str, owner: str, lease_ms: int, now_ms: Optional[int] = None) -> bool:
+        """
+        Make `owner` the executor of a plan: succeeds if `owner` already holds it or the
+        current owner's heartbeat is older than `lease_ms`, so one claimant wins a race.
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._write() as conn:
+            cur = conn.execute(
+                """INSERT INTO plan_runs(plan_id,started_at,owner,heartbeat_at) VALUES(?,?,?,?)
+                   ON CONFLICT(plan_id) DO UPDATE SET owner=excluded.owner, heartbeat_at=excluded.heartbeat_at
+                   WHERE plan_runs.owner IS excluded.owner OR plan_runs.heartbeat_at < ?""",
+                (plan_id, now_ms, owner, now_ms, now_ms - lease_ms),
+            )
+            return cur.rowcount == 1
+
+    def heartbeat_plan_run(self, plan_id: str, owner: str) -> bool:
+        """Refresh the heartbeat of a plan `owner` holds; False means another executor claimed it."""
+        with self._write() as conn:
+            cur = conn.execute(
+                "UPDATE plan_runs SET heartbeat_at=? WHERE plan_id=? AND owner=?",
+                (int(time.time() * 1000), plan_id, owner),
+            )
+            return cur.rowcount == 1
+
+    def interrupted_plans(self, lease_ms: int, now_ms: Optional[int] = None) -> List[str]:
+        """
+        Ids of plans left QUEUED/RUNNING whose executor went away: nothing in the step
+        queue and no plan_runs heartbeat within `lease_ms`. Queue-mode plans with leased
+        or ready rows are excluded (lease expiry already redelivers their steps), as are
+        plans another process is running inline. Callers still claim_plan_run first.
+        """
+        self.flush()
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        with self._read() as conn:
+            rows = conn.execute(
+                """SELECT id FROM plans p
+                   WHERE state IN ('QUEUED','RUNNING')
+                     AND NOT EXISTS (SELECT 1 FROM step_queue q WHERE q.plan_id = p.id)
+                     AND NOT EXISTS (SELECT 1 FROM plan_runs r WHERE r.plan_id = p.id AND r.heartbeat_at >= ?)
+                   ORDER BY updated_at""",
+                (now_ms - lease_ms,),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    # ----------------- Step queue (distributed workers) -----------------
+    def transition_plan(self, plan_id: str, state: str, from_states: Optional[Iterable[str]] = None) -> bool:
+        """
+        Set a plan's state if it is currently in `from_states` (default: any non-terminal
+        state). Returns True when this call made the change, so exactly one caller wins.
+        """
+        self.flush()
+        now_ms = int(time.time() * 1000)
+        if from_states is None:
+            cond, params = "state NOT IN (?,?,?)", _TERMINAL_PLAN_STATES
+        else:
+            allowed = tuple(from_states)
+            cond, params = f"state IN ({','.join('?' * len(allowed))})", allowed
+        with self._write() as conn:
+            cur = conn.execute(
+                f"UPDATE plans SET state=?, updated_at=? WHERE id=? AND {cond}",
+                (state, now_ms, plan_id, *params),
+            )
+            return cur.rowcount == 1
+
+    def enqueue_ready_steps(self, plan_id: str, consent: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Queue every PENDING/BLOCKED step of the plan whose deps are all DONE/SKIPPED
+        (already-queued steps are left alone). Nothing is queued once a step has failed.
+        Returns plan progress: total, done, running, failed step ids, enqueued count.
+        """
+        self.flush()
+        now_ms = int(time.time() * 1000)
+        consent_json = json.dumps(consent) if consent is not None else None
+        with self._write(immediate=True) as conn:
+            rows = conn.execute("SELECT id, state, deps_json FROM steps WHERE plan_id=?", (plan_id,)).fetchall()
+            done = {r["id"] for r in rows if r["state"] in ("DONE", "SKIPPED")}
+            failed = [r["id"] for r in rows if r["state"] == "FAILED"]
+            ready = []
+            if not failed:
+                ready = [
+                    r["id"]
+                    for r in rows
+                    if r["state"] in ("PENDING", "BLOCKED") and all(d in done for d in json.loads(r["deps_json"]))
+                ]
+            cur = conn.executemany(
+                "INSERT OR IGNORE INTO step_queue(step_id,plan_id,enqueued_at,consent_json) VALUES(?,?,?,?)",
+                [(sid, plan_id, now_ms, consent_json) for sid in ready],
+            )
+            return {
+                "total": len(rows),
+                "done": len(done),
+                "running": sum(1 for r in rows if r["state"] == "RUNNING"),
+                "failed": failed,
+                "enqueued": max(cur.rowcount, 0),
+            }
+
+    def claim_step(self, worker_id: str, lease_ms: int) -> Optional[Dict[str, Any]]:
+        """Atomically lease the oldest visible queue row to `worker_id` (None if the queue is empty)."""
+        now_ms = int(time.time() * 1000)
+        with self._write() as conn:
+            row = conn.execute(
+                """UPDATE step_queue SET worker_id=?, lease_expires_at=?, deliveries=deliveries+1
+                   WHERE step_id=(
+                     SELECT step_id FROM step_queue WHERE lease_expires_at < ?
+                     ORDER BY enqueued_at LIMIT 1
+                   )
+                   RETURNING step_id, plan_id, deliveries, consent_json""",
+                (worker_id, now_ms + lease_ms, now_ms),
+            ).fetchone()
+        if not row:
+            return None
+        row["consent"] = json.loads(row.pop("consent_json")) if row.get("consent_json") else None
+        return row
+
+    def heartbeat_lease(self, step_id: str, worker_id: str, lease_ms: int) -> bool:
+        """Extend a lease still held by `worker_id`; False means it expired and was re-claimed."""
+        with self._write() as conn:
+            cur = conn.execute(
+                "UPDATE step_queue SET lease_expires_at=? WHERE step_id=? AND worker_id=?",
+                (int(time.time() * 1000) + lease_ms, step_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def ack_step(self, step_id: str, worker_id: str) -> bool:
+        """Remove a finished step from the queue if `worker_id` still holds its lease."""
+        with self._write() as conn:
+            cur = conn.execute("DELETE FROM step_queue WHERE step_id=? AND worker_id=?", (step_id, worker_id))
+            return cur.rowcount == 1
+
+    def drop_queued(self, plan_id: str) -> int:
+        """Remove all queue rows of a plan (e.g. after it failed or was cancelled)."""
+        with self._write() as conn:
+            return conn.execute("DELETE FROM step_queue WHERE plan_id=?", (plan_id,)).rowcount
+
+    def queue_stats(self) -> Dict[str, int]:
+        now_ms = int(time.time() * 1000)
+        with self._read() as conn:
+            row = conn.execute(
+                """SELECT COALESCE(SUM(lease_expires_at < ?), 0) AS ready,
+                          COALESCE(SUM(lease_expires_at >= ?), 0) AS leased
+                   FROM step_queue""",
+                (now_ms, now_ms),
+            ).fetchone()
+        return {"ready": int(row["ready"]), "leased": int(row["leased"])}
+
+    # ----------------- Retention & compaction (see retention.py) -----------------
+    def prune_events(
+        self,
+        types: Iterable[str],
+        max_age_ms: Optional[int] = None,
+        keep_last: Optional[int] = None,
+        now_ms: Optional[int] = None,
+        batch_size: int = 5000,
+    ) -> int:
+        """
+        Delete events of the given types older than `max_age_ms` and/or beyond the newest
+        `keep_last` per plan (or chat session). Deletes run in batches of `batch_size`
+        rows, one short write transaction each. Returns the number of rows deleted.
+        """
+        self.flush()
+        clause, params = _type_filter(types)
+        now_ms = now_ms or int(time.time() * 1000)
+        selects: List[Tuple[str, List[Any]]] = []
+        if max_age_ms is not None:
+            selects.append((f"SELECT rowid FROM events WHERE {clause} AND ts < ? LIMIT ?", params + [now_ms - max_age_ms]))
+        if keep_last is not None:
+            selects.append((
+                f"""SELECT rowid FROM (
+                      SELECT rowid, ROW_NUMBER() OVER (PARTITION BY plan_id ORDER BY ts DESC, rowid DESC) AS rn
+                      FROM events WHERE {clause})
+                    WHERE rn > ? LIMIT ?""",
+                params + [keep_last],
+            ))
+        deleted = 0
+        for select, select_params in selects:
+            while True:
+                with self._write() as conn:
+                    n = conn.execute(f"DELETE FROM events WHERE rowid IN ({select})", select_params + [batch_size]).rowcount
+                deleted += n
+                if n < batch_size:
+                    break
+        return deleted
+
+    def archivable_plans(self, updated_before_ms: int, limit: int = 100) -> List[str]:
+        """Terminal plans last updated before `updated_before_ms` that have not been rolled up yet."""
+        self.flush()
+        with self._read() as conn:
+            rows = conn.execute(
+                f"""SELECT id FROM plans p
+                    WHERE state IN ({','.join('?' * len(_TERMINAL_PLAN_STATES))}) AND updated_at < ?
+                      AND NOT EXISTS (SELECT 1 FROM plan_rollups r WHERE r.plan_id = p.id)
+                    ORDER BY updated_at LIMIT ?""",
+                (*_TERMINAL_PLAN_STATES, updated_before_ms, limit),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def rollup_plan(self, plan_id: str, rollup: Dict[str, Any], through_event_id: Optional[str] = None) -> bool:
+        """
+        Replace a terminal plan's history with its rollup row: delete its events up to and
+        including `through_event_id` (the last one archived; revision links are kept),
+        clear step outputs and drop its run checkpoint. Returns False if the plan is no
+        longer terminal or was already rolled up.
+        """
+        self.flush()
+        with self._write(immediate=True) as conn:
+            row = conn.execute(
+                """SELECT p.state, r.plan_id AS rolled FROM plans p
+                   LEFT JOIN plan_rollups r ON r.plan_id = p.id WHERE p.id=?""",
+                (plan_id,),
+            ).fetchone()
+            if not row or row["state"] not in _TERMINAL_PLAN_STATES or row["rolled"]:
+                return False
+            conn.execute(
+                """INSERT INTO plan_rollups(plan_id,state,archived_at,archive_path,steps_json,events_json,first_ts,last_ts)
+                   VALUES(?,?,?,?,?,?,?,?)""",
                 (
-                    ev["id"],
-                    ev["ts"],
-                    ev["type"],
-                    ev["plan_id"],
-                    ev.get("step_id"),
-                    json.dumps(ev.get("payload", {})),
+                    plan_id,
+                    row["state"],
+                    int(time.time() * 1000),
+                    rollup.get("archive_path"),
+                    json.dumps(rollup.get("steps", {})),
+                    json.dumps(rollup.get("events", {})),
+                    rollup.get("first_ts"),
+                    rollup.get("last_ts"),
                 ),
             )
+            if through_event_id is not None:
+                conn.execute(
+                    f"""DELETE FROM events WHERE plan_id=?
+                          AND rowid <= (SELECT rowid FROM events WHERE id=?)
+                          AND type NOT IN ({','.join('?' * len(_ROLLUP_KEEP_EVENT_TYPES))})""",
+                    (plan_id, through_event_id, *_ROLLUP_KEEP_EVENT_TYPES),
+                )
+            conn.execute("UPDATE steps SET output_json=NULL WHERE plan_id=?", (plan_id,))
+            conn.execute("DELETE FROM plan_runs WHERE plan_id=?", (plan_id,))
+        return True
+
+    def get_rollup(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        with self._read() as conn:
+            row = conn.execute("SELECT * FROM plan_rollups WHERE plan_id=?", (plan_id,)).fetchone()
+        if not row:
+            return None
+        row["steps"] = json.loads(row.pop("steps_json"))
+        row["events"] = json.loads(row.pop("events_json"))
+        return row
+
+    def gc_blobs(self, min_age_ms: int = 60_000, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Delete blobs no step output or event payload references any more (and older than
+        `min_age_ms`). References live in blob_refs, maintained by triggers. Blob hashes
+        are paged through on the read pool, and each page is deleted in its own short write
+        transaction that re-checks age and references, so a blob that gains a reference
+        in between is kept and writers wait for one page at most.
+        """
+        cutoff = int(time.time() * 1000) - min_age_ms
+        self.flush()
+        count = freed = 0
+        after = ""
+        while True:
+            with self._read() as conn:
+                page = [
+                    r["hash"]
+                    for r in conn.execute("SELECT hash FROM blobs WHERE hash > ? ORDER BY hash LIMIT ?", (after, batch_size))
+                ]
+            if not page:
+                break
+            after = page[-1]
+            marks = ",".join("?" * len(page))
+            with self._write(immediate=True) as conn:
+                rows = conn.execute(
+                    f"""DELETE FROM blobs WHERE hash IN ({marks}) AND created_at < ?
+                          AND NOT EXISTS (SELECT 1 FROM blob_refs r WHERE r.hash = blobs.hash)
+                        RETURNING stored_size""",
+                    page + [cutoff],
+                ).fetchall()
+            count += len(rows)
+            freed += sum(r["stored_size"] for r in rows)
+            if len(page) < batch_size:
+                break
+        return {"count": count, "stored_bytes": freed}
+
+    def storage_stats(self) -> Dict[str, int]:
+        """Page accounting and on-disk size (main file + WAL) in bytes."""
+        with self._lock:
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()["page_size"]
+            pages = self._conn.execute("PRAGMA page_count").fetchone()["page_count"]
+            free = self._conn.execute("PRAGMA freelist_count").fetchone()["freelist_count"]
+            auto_vacuum = self._conn.execute("PRAGMA auto_vacuum").fetchone()["auto_vacuum"]
+        wal = self.path + "-wal"
+        return {
+            "page_size": page_size,
+            "pages": pages,
+            "free_pages": free,
+            "auto_vacuum": auto_vacuum,  # 0 none, 1 full, 2 incremental
+            "db_bytes": os.path.getsize(self.path),
+            "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0,
+        }
 
-    def events_for_plan(self, plan_id: str) -> Iterable[Dict[str, Any]]:
+    def compact(self, max_pages: Optional[int] = None) -> Dict[str, int]:
+        """
+        Hand free pages back to the filesystem (incremental vacuum, at most `max_pages`
+        per call when given) and checkpoint + truncate the WAL. Without
+        auto_vacuum=INCREMENTAL only the checkpoint runs. Returns the checkpoint result.
+        """
+        self.flush()
         with self._lock:
-            for r in self._conn.execute(
-                "SELECT * FROM events WHERE plan_id=? ORDER BY ts ASC", (plan_id,)
-            ):
-                r["payload"] = json.loads(r.pop("payload_json"))
-                yield r
+            if self._conn.execute("PRAGMA auto_vacuum").fetchone()["auto_vacuum"] == 2:
+                # executescript steps the pragma to completion; execute() frees a single page
+                arg = f"({int(max_pages)})" if max_pages else ""
+                self._conn.executescript(f"PRAGMA incremental_vacuum{arg};")
+            row = self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {"busy": row["busy"], "log_frames": row["log"], "checkpointed": row["checkpointed"]}
+
+    def enable_incremental_vacuum(self) -> None:
+        """Switch an existing DB to auto_vacuum=INCREMENTAL. Rewrites the file (full VACUUM)."""
+        self.flush()
+        with self._lock:
+            self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self._conn.execute("VACUUM")
+        # VACUUM may renumber rowids, which the search index is keyed on.
+        self.rebuild_search_index()
 
     # ----------------- Cache (CAG) -----------------
     def cache_get(self, key: str, now_ms: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        The live row for `key`, or None. Hot keys come from the in-process L1 (the
+        returned dict is then shared: do not mutate it).
+        """
         now_ms = now_ms or int(time.time() * 1000)
-        with self._lock:
-            row = self._conn.execute("SELECT * FROM cache_items WHERE key=?", (key,)).fetchone()
-            if not row:
-                return None
-            if row["expires_at"] is not None and row["expires_at"] < now_ms:
-                # expired: delete
-                with self._conn:
-                    self._conn.execute("DELETE FROM cache_items WHERE key=?", (key,))
-                return None
-            return {
-                "key": row["key"],
-                "value": json.loads(row["value_json"]),
-                "meta": json.loads(row["meta_json"]),
-                "created_at": row["created_at"],
-                "expires_at": row["expires_at"],
-            }
+        l1 = self._l1 if self._l1_current() else None
+        if l1 is not None:
+            hit = l1.get(key, now_ms)
+            if hit is not None:
+                self._touch_cache(key, now_ms)
+                return hit
+            generation = l1.generation()
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT key, value_json, meta_json, created_at, expires_at FROM cache_items WHERE key=?", (key,)
+            ).fetchone()
+        if row and row["expires_at"] is not None and row["expires_at"] < now_ms:
+            # expired: delete (unless a concurrent cache_put refreshed it)
+            with self._write() as conn:
+                n = conn.execute("DELETE FROM cache_items WHERE key=? AND expires_at < ?", (key, now_ms)).rowcount
+            with self._cache_lock:
+                self._cache_counts["expired"] += n
+            row = None
+        if not row:
+            with self._cache_lock:
+                self._cache_counts["misses"] += 1
+            return None
+        self._touch_cache(key, now_ms)
+        item = {
+            "key": row["key"],
+            "value": json.loads(row["value_json"]),
+            "meta": json.loads(row["meta_json"]),
+            "created_at": row["created_at"],
+            "expires_at": row["expires_at"],
+        }
+        if l1 is not None:
+            l1.put(key, item, len(row["value_json"]), generation)
+        return item
 
     def cache_put(self, key: str, value: Dict[str, Any], ttl_ms: Optional[int], meta: Optional[Dict[str, Any]] = None) -> None:
         now_ms = int(time.time() * 1000)
         exp = None if ttl_ms is None else now_ms + ttl_ms
-        meta = meta or {}
-        with self._lock, self._conn:
-            self._conn.execute(
-                """INSERT INTO cache_items(key,value_json,meta_json,created_at,expires_at)
-                   VALUES(?,?,?,?,?)
+        value_json, meta_json = json.dumps(value), json.dumps(meta or {})
+        with self._write() as conn:
+            conn.execute(
+                """INSERT INTO cache_items(key,value_json,meta_json,created_at,expires_at,size,last_access)
+                   VALUES(?,?,?,?,?,?,?)
                    ON CONFLICT(key) DO UPDATE SET
                      value_json=excluded.value_json,
                      meta_json=excluded.meta_json,
                      created_at=excluded.created_at,
-                     expires_at=excluded.expires_at
+                     expires_at=excluded.expires_at,
+                     size=excluded.size,
+                     last_access=excluded.last_access
                 """,
-                (key, json.dumps(value), json.dumps(meta), now_ms, exp),
+                (key, value_json, meta_json, now_ms, exp, len(key) + len(value_json) + len(meta_json), now_ms),
             )
+        if self._l1 is not None:
+            # write-through with a decoded copy, so later mutation of `value` cannot leak in
+            item = {"key": key, "value": json.loads(value_json), "meta": json.loads(meta_json),
+                    "created_at": now_ms, "expires_at": exp}
+            self._l1.put(key, item, len(value_json))
+
+    def _l1_current(self) -> bool:
+        """
+        True if the L1 may be used for this lookup. `PRAGMA data_version` on the writer
+        connection changes only when another connection (another process or MemoryDB
+        on the same file) commits; the L1 is then dropped, as any cache row may have
+        changed. Our own writes update the L1 directly. If the writer is busy in another
+        thread the check is skipped and the lookup goes to SQLite instead.
+        """
+        if self._l1 is None or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            version = self._conn.execute("PRAGMA data_version").fetchone()["data_version"]
+        finally:
+            self._lock.release()
+        if version != self._l1_version:
+            self._l1.clear()
+            self._l1_version = version
+        return True
+
+    def _touch_cache(self, key: str, now_ms: int) -> None:
+        # Access time and hit count are buffered so a cache hit stays a pure read.
+        with self._cache_lock:
+            self._cache_counts["hits"] += 1
+            _, hits = self._cache_touches.get(key, (0, 0))
+            self._cache_touches[key] = (now_ms, hits + 1)
+            pending = len(self._cache_touches)
+        if pending >= CACHE_TOUCH_FLUSH_KEYS:
+            self._flush_cache_touches()
+
+    def _flush_cache_touches(self) -> None:
+        with self._cache_lock:
+            touches, self._cache_touches = self._cache_touches, {}
+        if touches:
+            with self._write() as conn:
+                conn.executemany(
+                    "UPDATE cache_items SET last_access=MAX(COALESCE(last_access,0),?), hits=hits+? WHERE key=?",
+                    [(ts, hits, key) for key, (ts, hits) in touches.items()],
+                )
+
+    def sweep_cache(
+        self,
+        now_ms: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        policy: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> Dict[str, int]:
+        """
+        Delete expired cache rows, then evict least recently (lru) or least frequently
+        (lfu, ties by recency) used rows until the table fits `max_entries`/`max_bytes`
+        (defaults: OLY_CACHE_MAX_ENTRIES / OLY_CACHE_MAX_BYTES / OLY_CACHE_EVICTION).
+        Works in batches of `batch_size` rows, one short write transaction each.
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        policy = (policy or CACHE_EVICTION).lower()
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown cache eviction policy: {policy}")
+        self._flush_cache_touches()
+
+        expired = 0
+        while True:
+            with self._write() as conn:
+                n = conn.execute(
+                    """DELETE FROM cache_items WHERE rowid IN
+                         (SELECT rowid FROM cache_items WHERE expires_at < ? LIMIT ?)""",
+                    (now_ms, batch_size),
+                ).rowcount
+            expired += n
+            if n < batch_size:
+                break
+
+        evicted = 0
+        if max_entries > 0 or max_bytes > 0:
+            pinned = "".join(" AND key NOT LIKE ? ESCAPE '\\'" for _ in CACHE_PINNED_PREFIXES)
+            pinned_params = [_like_prefix(p) for p in CACHE_PINNED_PREFIXES]
+            order = "last_access" if policy == "lru" else "hits, last_access"
+            with self._read() as conn:
+                row = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size),0) AS b FROM cache_items").fetchone()
+            over_n = row["n"] - max_entries if max_entries > 0 else 0
+            over_b = row["b"] - max_bytes if max_bytes > 0 else 0
+            while over_n > 0 or over_b > 0:
+                with self._write() as conn:
+                    victims = conn.execute(
+                        f"SELECT rowid AS rid, size FROM cache_items WHERE 1=1{pinned} ORDER BY {order} LIMIT ?",
+                        pinned_params + [batch_size],
+                    ).fetchall()
+                    chosen = []
+                    for v in victims:
+                        if over_n <= 0 and over_b <= 0:
+                            break
+                        chosen.append((v["rid"],))
+                        over_n -= 1
+                        over_b -= v["size"]
+                    conn.executemany("DELETE FROM cache_items WHERE rowid=?", chosen)
+                evicted += len(chosen)
+                if len(victims) < batch_size:
+                    break  # only pinned rows left
+        with self._cache_lock:
+            self._cache_counts["expired"] += expired
+            self._cache_counts["evicted"] += evicted
+        if self._l1 is not None and (expired or evicted):
+            self._l1.clear()
+        return {"expired": expired, "evicted": evicted}
+
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Cumulative hit/miss/expiry/eviction counts of this process (`hits` includes
+        `l1_hits`) plus the current table and L1 sizes.
+        """
+        with self._read() as conn:
+            row = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size),0) AS b FROM cache_items").fetchone()
+        with self._cache_lock:
+            counts = dict(self._cache_counts)
+        l1 = {"l1_hits": self._l1.hits, "l1_entries": len(self._l1)} if self._l1 else {"l1_hits": 0, "l1_entries": 0}
+        return {**counts, **l1, "entries": int(row["n"]), "bytes": int(row["b"])}
+
+    # ----------------- Counters -----------------
+    def incr(self, key: str, delta: float = 1, window_ms: Optional[int] = None, now_ms: Optional[int] = None) -> float:
+        """
+        Atomically add `delta` to a counter and return the new value. With `window_ms`
+        the counter restarts from `delta` once the current window (aligned to
+        multiples of window_ms since the epoch, e.g. UTC days) has ended.
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        with self._write() as conn:
+            return conn.execute(_INCR_COUNTER_SQL, (key, delta, *_window(window_ms, now_ms), now_ms)).fetchall()[0]["value"]
+
+    def counter(self, key: str, now_ms: Optional[int] = None) -> float:
+        """Current value of a counter (0 if unset or its window has ended)."""
+        now_ms = now_ms or int(time.time() * 1000)
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT value FROM counters WHERE key=? AND (expires_at IS NULL OR expires_at > ?)", (key, now_ms)
+            ).fetchone()
+        return row["value"] if row else 0
+
+    def reserve(
+        self,
+        key: str,
+        amount: float,
+        limit: float,
+        window_ms: Optional[int] = None,
+        now_ms: Optional[int] = None,
+    ) -> Optional[float]:
+        """
+        Add `amount` to a counter only if the result stays within `limit`, checked and
+        applied in one BEGIN IMMEDIATE transaction so concurrent callers (in any
+        process) cannot overshoot together. Returns the new value, or None if refused.
+        Settle later with settle(key, actual - amount, reserved_at_ms=now_ms).
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        with self._write(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT value FROM counters WHERE key=? AND (expires_at IS NULL OR expires_at > ?)", (key, now_ms)
+            ).fetchone()
+            if (row["value"] if row else 0) + amount > limit:
+                return None
+            return conn.execute(_INCR_COUNTER_SQL, (key, amount, *_window(window_ms, now_ms), now_ms)).fetchall()[0]["value"]
+
+    def settle(
+        self,
+        key: str,
+        delta: float,
+        reserved_at_ms: int,
+        window_ms: Optional[int] = None,
+        now_ms: Optional[int] = None,
+    ) -> float:
+        """
+        Adjust a reservation made at `reserved_at_ms` by `delta` (actual - reserved).
+        It lands in the reservation's window; once that window has ended a refund is
+        dropped, since the reservation went with the window and subtracting it would
+        start the new one below zero, while extra spend is charged to the current
+        window. The counter never goes below zero. Returns the counter's value.
+        """
+        now_ms = now_ms or int(time.time() * 1000)
+        start, _ = _window(window_ms, reserved_at_ms)
+        with self._write() as conn:
+            row = conn.execute(
+                """UPDATE counters SET value=max(0, value + ?), updated_at=?
+                   WHERE key=? AND window_start IS ? AND (expires_at IS NULL OR expires_at > ?)
+                   RETURNING value""",
+                (delta, now_ms, key, start, now_ms),
+            ).fetchone()
+            if row is not None:
+                return row["value"]
+            if delta > 0:
+                return conn.execute(_INCR_COUNTER_SQL, (key, delta, *_window(window_ms, now_ms), now_ms)).fetchall()[0]["value"]
+            row = conn.execute(
+                "SELECT value FROM counters WHERE key=? AND (expires_at IS NULL OR expires_at > ?)", (key, now_ms)
+            ).fetchone()
+            return row["value"] if row else 0
 
     # ----------------- Facts / Entities / Relations / Embeddings -----------------
     def add_fact(self, fact_id: str, kind: str, data: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                "INSERT OR REPLACE INTO facts(id,kind,data_json,created_at) VALUES(?,?,?,?)",
+        with self._write() as conn:
+            conn.execute(
+                # An upsert, not OR REPLACE: it keeps the rowid and fires the search-index
+                # update trigger (REPLACE deletes without firing delete triggers).
+                "INSERT INTO facts(id,kind,data_json,created_at) VALUES(?,?,?,?)"
+                " ON CONFLICT(id) DO UPDATE SET kind=excluded.kind, data_json=excluded.data_json",
                 (fact_id, kind, json.dumps(data), int(time.time() * 1000)),
             )
 
     def upsert_entity(self, ent_id: str, ent_type: str, data: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                "INSERT OR REPLACE INTO entities(id,type,data_json) VALUES(?,?,?)",
-                (ent_id, ent_type, json.dumps(data)),
-            )
+        self.upsert_entities([{"id": ent_id, "type": ent_type, "data": data}])
 
     def upsert_relation(self, rel_id: str, src_id: str, dst_id: str, rel_type: str, data: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                "INSERT OR REPLACE INTO relations(id,src_id,dst_id,type,data_json) VALUES(?,?,?,?,?)",
-                (rel_id, src_id, dst_id, rel_type, json.dumps(data)),
-            )
+        self.upsert_relations([{"id": rel_id, "src_id": src_id, "dst_id": dst_id, "type": rel_type, "data": data}])
 
-    def put_embedding(self, emb_id: str, vector: bytes, dim: int, meta: Dict[str, Any]) -> None:
-        with self._lock, self._conn:
-            self._conn.execute(
-                "INSERT OR REPLACE INTO embeddings(id,dim,vector,meta_json) VALUES(?,?,?,?)",
-                (emb_id, dim, vector, json.dumps(meta)),
-            )
+    def upsert_entities(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Upsert {"id", "type", "data"} dicts with one executemany in a single transaction."""
+        params = [(r["id"], r["type"], json.dumps(r.get("data") or {})) for r in rows]
+        with self._write() as conn:
+            conn.executemany(_UPSERT_ENTITY_SQL, params)
+        return len(params)
+
+    def upsert_relations(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Upsert {"id", "src_id", "dst_id", "type", "data"} dicts in a single transaction."""
+        params = [(r["id"], r["src_id"], r["dst_id"], r["type"], json.dumps(r.get("data") or {})) for r in rows]
+        with self._write() as conn:
+            conn.executemany(_UPSERT_RELATION_SQL, params)
+        return len(params)
+
+    def put_embedding(self, emb_id: str, vector: Any, dim: int, meta: Dict[str, Any]) -> None:
+        self.put_embeddings([{"id": emb_id, "vector": vector, "dim": dim, "meta": meta}])
+
+    def put_embeddings(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Upsert {"id", "vector", "dim", "meta"} dicts in a single transaction. `vector` is
+        little-endian float32 bytes or a sequence of floats (packed as such).
+        """
+        params = []
+        for r in rows:
+            vec = r["vector"]
+            if not isinstance(vec, (bytes, bytearray, memoryview)):
+                vec = struct.pack(f"<{len(vec)}f", *vec)
+            params.append((r["id"], r.get("dim") or len(vec) // 4, bytes(vec), json.dumps(r.get("meta") or {})))
+        with self._write() as conn:
+            conn.executemany(_UPSERT_EMBEDDING_SQL, params)
+        return len(params)
+
+    def delete_embeddings(self, ids: Iterable[str]) -> int:
+        ids = list(ids)
+        with self._write() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                conn.execute(f"DELETE FROM embeddings WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        return len(ids)
+
+    def knn(
+        self,
+        vector: Any,
+        k: int = 10,
+        filter: Optional[Any] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        The `k` stored embeddings most similar (cosine) to `vector`, best first, as
+        {"id", "score", "meta"} dicts. `filter` is a dict that must equal the matching
+        keys of an embedding's meta, or a callable taking the meta. Uses the local IVF
+        index in vectors.py (numpy required), built on first use and kept in sync with
+        writes; nprobe=0 forces an exact scan.
+        """
+        if k <= 0:
+            return []
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = VectorIndex(self)
+        index = self._vectors
+        if filter is None:
+            hits = index.search(vector, k, nprobe)
+            metas = self._embedding_meta([i for i, _ in hits])
+            return [{"id": i, "score": score, "meta": metas.get(i, {})} for i, score in hits if i in metas]
+        match = filter if callable(filter) else (lambda m: all(m.get(key) == v for key, v in filter.items()))
+        # Over-fetch and widen until k rows pass the filter; the last round is exact.
+        fetch, probe = k * 4, nprobe
+        while True:
+            hits = index.search(vector, fetch, probe)
+            metas = self._embedding_meta([i for i, _ in hits])
+            out = [{"id": i, "score": s, "meta": metas[i]} for i, s in hits if i in metas and match(metas[i])]
+            if len(out) >= k or (probe == 0 and len(hits) < fetch):
+                return out[:k]
+            if len(hits) < fetch:
+                probe = 0  # the probed clusters are exhausted
+            else:
+                fetch *= 4
+
+    def vector_index_stats(self) -> Dict[str, Any]:
+        return self._vectors.stats() if self._vectors is not None else {}
+
+    def _embedding_meta(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._read() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                for r in conn.execute(
+                    f"SELECT id, meta_json FROM embeddings WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall():
+                    out[r["id"]] = json.loads(r["meta_json"])
+        return out
+
+    # ----------------- Knowledge graph queries -----------------
+    def get_entities(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = list(ids)
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._read() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                rows = conn.execute(
+                    f"SELECT id, type, data_json FROM entities WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for r in rows:
+                    out[r["id"]] = {"id": r["id"], "type": r["type"], "data": json.loads(r["data_json"])}
+        return out
+
+    def neighbors(
+        self,
+        node_id: str,
+        types: Optional[Iterable[str]] = None,
+        direction: str = "out",
+        limit: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """Relations leaving (`out`), entering (`in`) or touching (`both`) a node, optionally of `types`."""
+        touches, _ = _graph_edge(direction, ":node")
+        type_sql, params = _type_in(types)
+        with self._read() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM relations r WHERE {touches}{type_sql} LIMIT :limit",
+                {**params, "node": node_id, "limit": limit},
+            ).fetchall()
+        return [_relation_row(r) for r in rows]
+
+    def k_hop(
+        self,
+        node_id: str,
+        k: int = 2,
+        types: Optional[Iterable[str]] = None,
+        direction: str = "out",
+        limit: int = 10_000,
+    ) -> Dict[str, int]:
+        """
+        Nodes within `k` hops of `node_id` (itself included) mapped to their hop
+        distance, nearest first, via one recursive CTE over the relations indexes.
+        """
+        touches, far = _graph_edge(direction, "w.node")
+        type_sql, params = _type_in(types)
+        with self._read() as conn:
+            rows = conn.execute(
+                f"""WITH RECURSIVE walk(node, depth) AS (
+                      SELECT :node, 0
+                      UNION
+                      SELECT {far}, w.depth + 1 FROM walk w JOIN relations r ON {touches}
+                      WHERE w.depth < :k{type_sql}
+                    )
+                    SELECT node, MIN(depth) AS depth FROM walk GROUP BY node ORDER BY depth, node LIMIT :limit""",
+                {**params, "node": node_id, "k": k, "limit": limit},
+            ).fetchall()
+        return {r["node"]: r["depth"] for r in rows}
+
+    def subgraph(
+        self,
+        node_id: str,
+        k: int = 1,
+        types: Optional[Iterable[str]] = None,
+        direction: str = "both",
+        limit: int = 200,
+    ) -> Dict[str, Any]:
+        """
+        The k-hop neighborhood as {"nodes": [...], "edges": [...]}: entity rows (with
+        their hop `depth`; `type`/`data` are None for ids without an entity row) and
+        the relations among them. Compact context for the planner.
+        """
+        depths = self.k_hop(node_id, k, types, direction, limit)
+        entities = self.get_entities(depths)
+        nodes = [
+            {**entities.get(n, {"id": n, "type": None, "data": None}), "depth": d} for n, d in depths.items()
+        ]
+        ids = list(depths)
+        type_sql, params = _type_in(types)
+        edges: List[Dict[str, Any]] = []
+        with self._read() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = {f"n{j}": v for j, v in enumerate(ids[i : i + 500])}
+                marks = ",".join(f":{name}" for name in chunk)
+                rows = conn.execute(
+                    f"SELECT * FROM relations r WHERE r.src_id IN ({marks}){type_sql}", {**params, **chunk}
+                ).fetchall()
+                edges += [_relation_row(r) for r in rows if r["dst_id"] in depths]
+        return {"nodes": nodes, "edges": edges}
+
+    def shortest_path(
+        self,
+        src_id: str,
+        dst_id: str,
+        types: Optional[Iterable[str]] = None,
+        direction: str = "out",
+        max_depth: int = 6,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Relations along a shortest path from `src_id` to `dst_id` ([] if they are the
+        same node, None if there is none within `max_depth` hops).
+
+        Bidirectional BFS: each step expands the smaller frontier with one indexed
+        query per 500 nodes and keeps a visited set. A recursive CTE has no visited
+        set, so on a dense graph it would enumerate every walk up to `max_depth`.
+        """
+        _graph_edge(direction, "")  # validates direction
+        if src_id == dst_id:
+            return []
+        types = list(types) if types else None
+        back = {"out": "in", "in": "out", "both": "both"}[direction]
+        seen_f: Dict[str, Optional[Tuple[str, str]]] = {src_id: None}  # node -> (previous node, relation id)
+        seen_b: Dict[str, Optional[Tuple[str, str]]] = {dst_id: None}
+        front_f, front_b = [src_id], [dst_id]
+        for _ in range(max_depth):
+            forward = len(front_f) <= len(front_b)
+            front, seen, other = (front_f, seen_f, seen_b) if forward else (front_b, seen_b, seen_f)
+            nxt, meet = [], None
+            for near, far, rel_id in self._expand(front, types, direction if forward else back):
+                if far not in seen:
+                    seen[far] = (near, rel_id)
+                    nxt.append(far)
+                    if meet is None and far in other:
+                        meet = far
+            if meet is not None:
+                rel_ids = []
+                node = meet
+                while seen_f[node] is not None:
+                    node, rel_id = seen_f[node]
+                    rel_ids.append(rel_id)
+                rel_ids.reverse()
+                node = meet
+                while seen_b[node] is not None:
+                    node, rel_id = seen_b[node]
+                    rel_ids.append(rel_id)
+                return self._relations_by_id(rel_ids)
+            if not nxt:
+                return None
+            if forward:
+                front_f = nxt
+            else:
+                front_b = nxt
+        return None
+
+    def _expand(self, nodes: List[str], types: Optional[List[str]], direction: str) -> List[Tuple[str, str, str]]:
+        """(near node, far node, relation id) for every edge leaving `nodes` in `direction`."""
+        type_sql, params = _type_in(types)
+        sides = {"out": [("src_id", "dst_id")], "in": [("dst_id", "src_id")]}.get(
+            direction, [("src_id", "dst_id"), ("dst_id", "src_id")]
+        )
+        out: List[Tuple[str, str, str]] = []
+        with self._read() as conn:
+            for i in range(0, len(nodes), 500):
+                chunk = {f"n{j}": v for j, v in enumerate(nodes[i : i + 500])}
+                marks = ",".join(f":{name}" for name in chunk)
+                for near, far in sides:
+                    rows = conn.execute(
+                        f"SELECT r.{near} AS near, r.{far} AS far, r.id FROM relations r WHERE r.{near} IN ({marks}){type_sql}",
+                        {**params, **chunk},
+                    ).fetchall()
+                    out += [(r["near"], r["far"], r["id"]) for r in rows]
+        return out
+
+    def _relations_by_id(self, rel_ids: List[str]) -> List[Dict[str, Any]]:
+        if not rel_ids:
+            return []
+        with self._read() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM relations WHERE id IN ({','.join('?' * len(rel_ids))})", rel_ids
+            ).fetchall()
+        by_id = {r["id"]: _relation_row(r) for r in rows}
+        return [by_id[i] for i in rel_ids if i in by_id]
+
+    # ----------------- Full-text search -----------------
+    def search(
+        self,
+        query: str,
+        kinds: Optional[Iterable[str]] = None,
+        limit: int = 20,
+        plan_id: Optional[str] = None,
+        snippet_tokens: int = 32,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25-ranked full-text search over facts ("fact"), step outputs and errors ("step")
+        and chat.* event payloads ("chat"), all kinds by default. Every word of `query`
+        is a term (FTS5 operators are not interpreted); rows matching more and rarer terms
+        rank first. Returns up to `limit` {"kind", "id", "plan_id", "label", "ts",
+        "snippet", "score"} dicts, best first; `score` is -bm25, so higher is better.
+        Scores of different kinds come from separate indexes and are only roughly comparable.
+        On SQLite builds without FTS5 this degrades to a substring match scored by the
+        number of terms found, with the start of the row as the snippet.
+        """
+        kinds = list(kinds) if kinds else list(SEARCH_KINDS)
+        for kind in kinds:
+            if kind not in _SEARCH_SQL:
+                raise ValueError(f"Unknown search kind: {kind}")
+        q = _fts_query(query)
+        if not q or limit <= 0:
+            return []
+        self.flush()
+        params: Dict[str, Any] = {"q": q, "limit": limit, "tokens": snippet_tokens}
+        plan_sql = ""
+        if plan_id is not None:
+            if "fact" in kinds:
+                kinds.remove("fact")  # facts do not belong to a plan
+            plan_sql, params["plan_id"] = "AND plan_id = :plan_id", plan_id
+        if not self._fts:
+            terms = _search_terms(query)
+            params.update((f"t{i}", "%" + _like_prefix(t)) for i, t in enumerate(terms))
+            params["chars"] = snippet_tokens * 8
+        hits: List[Dict[str, Any]] = []
+        with self._read() as conn:
+            for kind in kinds:
+                sql = _SEARCH_SQL[kind] if self._fts else _like_search_sql(kind, len(terms))
+                for r in conn.execute(sql.replace("{plan}", plan_sql), params).fetchall():
+                    r["kind"], r["score"] = kind, -r.pop("rank")
+                    hits.append(r)
+        hits.sort(key=lambda h: h["score"], reverse=True)
+        return hits[:limit]
+
+    def rebuild_search_index(self) -> None:
+        """Re-index every fact, step output and chat event (e.g. after a full VACUUM)."""
+        if not self._fts:
+            return
+        self.flush()
+        with self._lock:
+            self._conn.executescript(f"BEGIN IMMEDIATE; {SEARCH_BACKFILL} COMMIT;")
@@ -0,0 +1,457 @@
+# packages/memory/olympus_memory/migrate.py
+"""
+Versioned schema migrations for the SQLite store.
+
+`migrate(conn)` applies the entries of MIGRATIONS whose version is not yet
+recorded in `schema_migrations`, in order, each in its own BEGIN IMMEDIATE
+transaction together with its bookkeeping row. When several processes open the
+same file at once, the version is re-checked inside that transaction, so every
+migration runs exactly once. An up-to-date database costs a single SELECT on
+open.
+
+Version 1 is the baseline schema. It is written with IF NOT EXISTS, so files
+created before versioning converge on it. Later migrations must be additive:
+SQLite builds an index while holding the write lock (readers continue under
+WAL), so expect a short pause for writers on large tables.
+
+The `migrations/` directory next to this module holds the Postgres schema of the
+memory service and is not used here.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+# Another process may hold the write lock while it builds an index.
+MIGRATION_BUSY_TIMEOUT_MS = int(os.getenv("OLY_DB_MIGRATION_BUSY_TIMEOUT_MS", "60000"))
+
+_BASELINE = """
+CREATE TABLE IF NOT EXISTS plans (
+  id TEXT PRIMARY KEY,
+  title TEXT NOT NULL,
+  state TEXT NOT NULL,
+  budget_json TEXT NOT NULL,
+  metadata_json TEXT NOT NULL,
+  created_at INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS steps (
+  id TEXT PRIMARY KEY,
+  plan_id TEXT NOT NULL,
+  name TEXT NOT NULL,
+  state TEXT NOT NULL,
+  attempts INTEGER NOT NULL,
+  max_retries INTEGER NOT NULL,
+  capability_json TEXT NOT NULL,
+  input_json TEXT NOT NULL,
+  output_json TEXT,
+  error TEXT,
+  deps_json TEXT NOT NULL,
+  guard_json TEXT NOT NULL,
+  started_at INTEGER,
+  ended_at INTEGER,
+  FOREIGN KEY(plan_id) REFERENCES plans(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS events (
+  id TEXT PRIMARY KEY,
+  ts INTEGER NOT NULL,
+  type TEXT NOT NULL,
+  plan_id TEXT NOT NULL,
+  step_id TEXT,
+  payload_json TEXT NOT NULL
+);
+
+-- Keyset pagination orders by (ts, rowid), i.e. insertion order within a millisecond.
+-- Index entries carry the rowid, so these serve plain, type- and step-filtered pages.
+CREATE INDEX IF NOT EXISTS idx_events_plan ON events(plan_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_plan_type ON events(plan_id, type, ts);
+CREATE INDEX IF NOT EXISTS idx_events_plan_step ON events(plan_id, step_id, ts);
+
+-- Execution checkpoint per plan: the consent it was started with (so an interrupted
+-- run can be resumed after a restart) and how often it has been resumed. The owner
+-- and heartbeat columns are added by migration 10.
+CREATE TABLE IF NOT EXISTS plan_runs (
+  plan_id TEXT PRIMARY KEY,
+  consent_json TEXT,
+  started_at INTEGER NOT NULL,
+  resumes INTEGER NOT NULL DEFAULT 0
+);
+
+-- Work queue for distributed workers: one row per runnable step. A row is visible
+-- to claim_step while lease_expires_at < now (0 for never-claimed rows).
+CREATE TABLE IF NOT EXISTS step_queue (
+  step_id TEXT PRIMARY KEY,
+  plan_id TEXT NOT NULL,
+  worker_id TEXT,
+  lease_expires_at INTEGER NOT NULL DEFAULT 0,
+  deliveries INTEGER NOT NULL DEFAULT 0,
+  enqueued_at INTEGER NOT NULL,
+  consent_json TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_step_queue_lease ON step_queue(lease_expires_at, enqueued_at);
+
+-- Content-addressed storage for large output/payload values (see blobs.py);
+-- rows in steps/events hold {"$blob": hash, ...} references instead.
+CREATE TABLE IF NOT EXISTS blobs (
+  hash TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  codec TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  stored_size INTEGER NOT NULL,
+  data BLOB NOT NULL,
+  created_at INTEGER NOT NULL
+);
+
+-- Compact record of a terminal plan whose events were archived (see retention.py).
+-- The plan and step rows stay (outputs cleared); the full history is in archive_path.
+CREATE TABLE IF NOT EXISTS plan_rollups (
+  plan_id TEXT PRIMARY KEY,
+  state TEXT NOT NULL,
+  archived_at INTEGER NOT NULL,
+  archive_path TEXT,
+  steps_json TEXT NOT NULL,
+  events_json TEXT NOT NULL,
+  first_ts INTEGER,
+  last_ts INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS cache_items (
+  key TEXT PRIMARY KEY,
+  value_json TEXT NOT NULL,
+  meta_json TEXT NOT NULL,
+  created_at INTEGER NOT NULL,
+  expires_at INTEGER,
+  size INTEGER NOT NULL DEFAULT 0,
+  last_access INTEGER,
+  hits INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_items(expires_at) WHERE expires_at IS NOT NULL;
+
+-- Atomic numeric counters (LLM spend, token budgets). With a window the value
+-- resets when expires_at passes; windows are aligned to multiples of their length.
+CREATE TABLE IF NOT EXISTS counters (
+  key TEXT PRIMARY KEY,
+  value REAL NOT NULL,
+  window_start INTEGER,
+  expires_at INTEGER,
+  updated_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS facts (
+  id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  data_json TEXT NOT NULL,
+  created_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS entities (
+  id TEXT PRIMARY KEY,
+  type TEXT NOT NULL,
+  data_json TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS relations (
+  id TEXT PRIMARY KEY,
+  src_id TEXT NOT NULL,
+  dst_id TEXT NOT NULL,
+  type TEXT NOT NULL,
+  data_json TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS embeddings (
+  id TEXT PRIMARY KEY,
+  dim INTEGER NOT NULL,
+  vector BLOB NOT NULL,
+  meta_json TEXT NOT NULL
+);
+"""
+
+
+def _json_text(col: str) -> str:
+    # The string leaves of a JSON column, space-separated: keys, numbers and blob hashes
+    # stay out of the index, blob previews stay in. Non-JSON text is indexed as is.
+    return (
+        f"(SELECT group_concat(value, ' ') FROM json_tree(CASE WHEN json_valid({col}) "
+        f"THEN {col} ELSE json_quote({col}) END) WHERE type='text' AND key IS NOT '$blob')"
+    )
+
+
+def _step_text(row: str) -> str:
+    return f"coalesce({_json_text(row + 'output_json')}, '') || ' ' || coalesce({row}error, '')"
+
+
+# Full-text search (MemoryDB.search). Each index is a standalone FTS5 table whose rowid
+# is the source row's rowid, kept in sync by triggers. facts and steps are updated by
+# upserts (ON CONFLICT DO UPDATE), which keep the rowid.
+_SEARCH = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_facts USING fts5(kind, body, tokenize='porter unicode61');
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_steps USING fts5(name, body, tokenize='porter unicode61');
+CREATE VIRTUAL TABLE IF NOT EXISTS fts_chat USING fts5(body, tokenize='porter unicode61');
+
+CREATE TRIGGER IF NOT EXISTS facts_fts_ins AFTER INSERT ON facts BEGIN
+  INSERT INTO fts_facts(rowid, kind, body) VALUES (new.rowid, new.kind, {_json_text("new.data_json")});
+END;
+CREATE TRIGGER IF NOT EXISTS facts_fts_upd AFTER UPDATE OF kind, data_json ON facts BEGIN
+  DELETE FROM fts_facts WHERE rowid=old.rowid;
+  INSERT INTO fts_facts(rowid, kind, body) VALUES (new.rowid, new.kind, {_json_text("new.data_json")});
+END;
+CREATE TRIGGER IF NOT EXISTS facts_fts_del AFTER DELETE ON facts BEGIN
+  DELETE FROM fts_facts WHERE rowid=old.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS steps_fts_ins AFTER INSERT ON steps
+WHEN new.output_json IS NOT NULL OR new.error IS NOT NULL BEGIN
+  INSERT INTO fts_steps(rowid, name, body)
+  VALUES (new.rowid, new.name, {_step_text("new.")});
+END;
+CREATE TRIGGER IF NOT EXISTS steps_fts_upd AFTER UPDATE OF output_json, error ON steps
+WHEN old.output_json IS NOT new.output_json OR old.error IS NOT new.error BEGIN
+  DELETE FROM fts_steps WHERE rowid=old.rowid;
+  INSERT INTO fts_steps(rowid, name, body)
+  SELECT new.rowid, new.name, {_step_text("new.")}
+  WHERE new.output_json IS NOT NULL OR new.error IS NOT NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS steps_fts_del AFTER DELETE ON steps BEGIN
+  DELETE FROM fts_steps WHERE rowid=old.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS events_fts_ins AFTER INSERT ON events
+WHEN new.type GLOB 'chat.*' BEGIN
+  INSERT INTO fts_chat(rowid, body) VALUES (new.rowid, {_json_text("new.payload_json")});
+END;
+CREATE TRIGGER IF NOT EXISTS events_fts_del AFTER DELETE ON events
+WHEN old.type GLOB 'chat.*' BEGIN
+  DELETE FROM fts_chat WHERE rowid=old.rowid;
+END;
+"""
+
+# Indexes rows written before the triggers existed (also used by MemoryDB.rebuild_search_index).
+SEARCH_BACKFILL = f"""
+DELETE FROM fts_facts;
+DELETE FROM fts_steps;
+DELETE FROM fts_chat;
+INSERT INTO fts_facts(rowid, kind, body) SELECT rowid, kind, {_json_text("data_json")} FROM facts;
+INSERT INTO fts_steps(rowid, name, body)
+  SELECT rowid, name, {_step_text("")} FROM steps
+  WHERE output_json IS NOT NULL OR error IS NOT NULL;
+INSERT INTO fts_chat(rowid, body) SELECT rowid, {_json_text("payload_json")} FROM events WHERE type GLOB 'chat.*';
+"""
+
+
+# Change feed for the vector index (vectors.py): every write to embeddings appends its id.
+_EMBEDDING_LOG = """
+CREATE TABLE IF NOT EXISTS embedding_log (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  emb_id TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS embeddings_log_ins AFTER INSERT ON embeddings BEGIN
+  INSERT INTO embedding_log(emb_id) VALUES (new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS embeddings_log_upd AFTER UPDATE ON embeddings BEGIN
+  INSERT INTO embedding_log(emb_id) VALUES (old.id);
+  INSERT INTO embedding_log(emb_id) SELECT new.id WHERE new.id IS NOT old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS embeddings_log_del AFTER DELETE ON embeddings BEGIN
+  INSERT INTO embedding_log(emb_id) VALUES (old.id);
+END;
+"""
+
+
+def _blob_refs_sql(src: str, col: str, row: str) -> str:
+    # One blob_refs row per {"$blob": hash} reference in a step output or event payload.
+    return (
+        f"INSERT OR IGNORE INTO blob_refs(hash, src, src_id) SELECT value, '{src}', {row}id "
+        f"FROM json_tree(CASE WHEN json_valid({row}{col}) THEN {row}{col} ELSE 'null' END) WHERE key = '$blob'"
+    )
+
+
+# Blob references kept current by triggers, so MemoryDB.gc_blobs finds unreferenced
+# blobs with an indexed lookup instead of scanning steps and events for "$blob".
+_BLOB_REFS = f"""
+CREATE TABLE IF NOT EXISTS blob_refs (
+  src TEXT NOT NULL,
+  src_id TEXT NOT NULL,
+  hash TEXT NOT NULL,
+  PRIMARY KEY (src, src_id, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_blob_refs_hash ON blob_refs(hash);
+
+CREATE TRIGGER IF NOT EXISTS steps_blob_refs_ins AFTER INSERT ON steps
+  WHEN new.output_json LIKE '%"$blob"%' BEGIN
+  {_blob_refs_sql("steps", "output_json", "new.")};
+END;
+CREATE TRIGGER IF NOT EXISTS steps_blob_refs_upd AFTER UPDATE OF output_json ON steps BEGIN
+  DELETE FROM blob_refs WHERE src='steps' AND src_id=old.id;
+  {_blob_refs_sql("steps", "output_json", "new.")} AND new.output_json LIKE '%"$blob"%';
+END;
+CREATE TRIGGER IF NOT EXISTS steps_blob_refs_del AFTER DELETE ON steps BEGIN
+  DELETE FROM blob_refs WHERE src='steps' AND src_id=old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS events_blob_refs_ins AFTER INSERT ON events
+  WHEN new.payload_json LIKE '%"$blob"%' BEGIN
+  {_blob_refs_sql("events", "payload_json", "new.")};
+END;
+CREATE TRIGGER IF NOT EXISTS events_blob_refs_upd AFTER UPDATE OF payload_json ON events BEGIN
+  DELETE FROM blob_refs WHERE src='events' AND src_id=old.id;
+  {_blob_refs_sql("events", "payload_json", "new.")} AND new.payload_json LIKE '%"$blob"%';
+END;
+CREATE TRIGGER IF NOT EXISTS events_blob_refs_del AFTER DELETE ON events BEGIN
+  DELETE FROM blob_refs WHERE src='events' AND src_id=old.id;
+END;
+
+INSERT OR IGNORE INTO blob_refs(hash, src, src_id)
+  SELECT j.value, 'steps', s.id FROM steps s,
+    json_tree(CASE WHEN json_valid(s.output_json) THEN s.output_json ELSE 'null' END) j
+  WHERE s.output_json LIKE '%"$blob"%' AND j.key = '$blob';
+INSERT OR IGNORE INTO blob_refs(hash, src, src_id)
+  SELECT j.value, 'events', e.id FROM events e,
+    json_tree(CASE WHEN json_valid(e.payload_json) THEN e.payload_json ELSE 'null' END) j
+  WHERE e.payload_json LIKE '%"$blob"%' AND j.key = '$blob';
+"""
+
+
+def _add_cache_accounting(conn: sqlite3.Connection) -> None:
+    # Size, recency and hit count for cache eviction; files from before had none.
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(cache_items)").fetchall()}
+    if "size" not in cols:
+        conn.execute("ALTER TABLE cache_items ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE cache_items SET size=length(key)+length(value_json)+length(meta_json)")
+    if "last_access" not in cols:
+        conn.execute("ALTER TABLE cache_items ADD COLUMN last_access INTEGER")
+        conn.execute("UPDATE cache_items SET last_access=created_at")
+    if "hits" not in cols:
+        conn.execute("ALTER TABLE cache_items ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON cache_items(last_access)")
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """Whether this SQLite build has FTS5, which is a compile-time option."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def _add_search(conn: sqlite3.Connection) -> None:
+    # Without FTS5 the store still opens; MemoryDB.search falls back to LIKE.
+    if not fts5_available(conn):
+        return
+    for stmt in _statements(_SEARCH + SEARCH_BACKFILL):
+        conn.execute(stmt)
+
+
+def _add_plan_run_owner(conn: sqlite3.Connection) -> None:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(plan_runs)").fetchall()}
+    if "owner" not in cols:
+        conn.execute("ALTER TABLE plan_runs ADD COLUMN owner TEXT")
+    if "heartbeat_at" not in cols:  # 0: no live executor, so recoverable at once
+        conn.execute("ALTER TABLE plan_runs ADD COLUMN heartbeat_at INTEGER NOT NULL DEFAULT 0")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: Optional[str] = None
+    fn: Optional[Callable[[sqlite3.Connection], None]] = None
+
+    def apply(self, conn: sqlite3.Connection) -> None:
+        if self.sql:
+            for stmt in _statements(self.sql):
+                conn.execute(stmt)
+        if self.fn:
+            self.fn(conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", sql=_BASELINE),
+    Migration(2, "cache_items accounting columns", fn=_add_cache_accounting),
+    # The executor and queue look up a plan's steps by state.
+    Migration(3, "index steps(plan_id, state)", sql="CREATE INDEX IF NOT EXISTS idx_steps_plan_state ON steps(plan_id, state)"),
+    # Retention prunes and counts events by type across plans.
+    Migration(4, "index events(type, ts)", sql="CREATE INDEX IF NOT EXISTS idx_events_type ON events(type, ts)"),
+    Migration(5, "index relations(src_id, type)", sql="CREATE INDEX IF NOT EXISTS idx_relations_src ON relations(src_id, type)"),
+    # Superseded by schema_migrations; it only ever held version 1.
+    Migration(6, "drop legacy schema_version", sql="DROP TABLE IF EXISTS schema_version"),
+    # Graph traversal walks edges backwards too (direction="in"/"both").
+    Migration(7, "index relations(dst_id, type)", sql="CREATE INDEX IF NOT EXISTS idx_relations_dst ON relations(dst_id, type)"),
+    Migration(8, "full-text search over facts, step outputs and chat", fn=_add_search),
+    Migration(9, "embedding change log", sql=_EMBEDDING_LOG),
+    # Recovery only takes over plans whose executor stopped heartbeating.
+    Migration(10, "plan_runs owner and heartbeat", fn=_add_plan_run_owner),
+    # Blob GC looks references up instead of scanning every step and event.
+    Migration(11, "blob reference table", sql=_BLOB_REFS),
+]
+
+
+def _statements(script: str):
+    # Split on ';' where SQLite agrees a statement ends (not inside strings or triggers).
+    buf = ""
+    for piece in script.split(";"):
+        buf += piece + ";"
+        if sqlite3.complete_statement(buf):
+            if any(line.strip() and not line.strip().startswith("--") for line in buf[:-1].splitlines()):
+                yield buf.strip()
+            buf = ""
+
+
+def _ensure_version_table(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER NOT NULL, name TEXT, applied_at INTEGER)")
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(schema_migrations)").fetchall()}
+    if "name" not in cols:  # created by an older ensure_base_schema()
+        conn.execute("ALTER TABLE schema_migrations ADD COLUMN name TEXT")
+        conn.execute("ALTER TABLE schema_migrations ADD COLUMN applied_at INTEGER")
+    conn.commit()
+
+
+def applied_versions(conn: sqlite3.Connection) -> List[int]:
+    cur = conn.cursor()
+    cur.row_factory = None  # plain tuples whatever the connection uses
+    return sorted(r[0] for r in cur.execute("SELECT version FROM schema_migrations").fetchall())
+
+
+def migrate(conn: sqlite3.Connection, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """Apply pending migrations in version order. Returns the versions this call applied."""
+    migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+    row_factory, conn.row_factory = conn.row_factory, None
+    try:
+        _ensure_version_table(conn)
+        applied = set(applied_versions(conn))
+        pending = [m for m in migrations if m.version not in applied]
+        if not pending:
+            return []
+        busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute(f"PRAGMA busy_timeout={MIGRATION_BUSY_TIMEOUT_MS}")
+        done: List[int] = []
+        try:
+            for m in pending:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if conn.execute("SELECT 1 FROM schema_migrations WHERE version=?", (m.version,)).fetchone():
+                        conn.rollback()  # another process got here first
+                        continue
+                    m.apply(conn)
+                    conn.execute(
+                        "INSERT INTO schema_migrations(version,name,applied_at) VALUES(?,?,?)",
+                        (m.version, m.name, int(time.time() * 1000)),
+                    )
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                done.append(m.version)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        return done
+    finally:
+        conn.row_factory = row_factory
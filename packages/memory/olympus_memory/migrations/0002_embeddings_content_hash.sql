@@ -0,0 +1,3 @@
+-- md5 of the fact content an embedding was computed from; the retrieval ingest
+-- re-embeds only facts whose content (or embedding model) changed.
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
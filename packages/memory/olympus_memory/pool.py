@@ -0,0 +1,96 @@
+# packages/memory/olympus_memory/pool.py
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+
+class LockStats:
+    """Thread-safe accumulator for connection/lock wait times, keyed by kind ('write', 'read')."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, float]] = {}
+
+    def record(self, kind: str, wait_s: float) -> None:
+        with self._lock:
+            d = self._data.setdefault(kind, {"acquisitions": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0})
+            d["acquisitions"] += 1
+            d["wait_seconds_total"] += wait_s
+            if wait_s > d["wait_seconds_max"]:
+                d["wait_seconds_max"] = wait_s
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._data.items()}
+
+
+class ReadPool:
+    """
+    Bounded pool of read-only sqlite3 connections.
+    Connections are opened lazily (up to `size`) and handed out LIFO so hot
+    connections keep their page cache warm. Callers block when all are in use.
+    """
+
+    def __init__(self, path: str, size: int, stats: LockStats, row_factory: Callable[..., Any]):
+        if size <= 0:
+            raise ValueError("ReadPool size must be positive")
+        self.path = path
+        self.size = size
+        self._stats = stats
+        self._row_factory = row_factory
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = self._row_factory
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ReadPool is closed")
+            if len(self._all) < self.size:
+                conn = self._open()
+                self._all.append(conn)
+                return conn
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        start = time.perf_counter()
+        conn = self._acquire()
+        self._stats.record("read", time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def in_use(self) -> int:
+        with self._lock:
+            return len(self._all) - self._idle.qsize()
+
+    def opened(self) -> int:
+        with self._lock:
+            return len(self._all)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            conns, self._all = self._all, []
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
@@ -0,0 +1,262 @@
+# packages/memory/olympus_memory/retention.py
+"""
+Retention, archival and compaction for the append-only tables.
+
+One `run_retention(db)` pass:
+
+1. prunes events per type policy: older than `max_age_days` and/or beyond the
+   newest `keep_last` per plan or chat session (chat.* events share the table);
+2. archives terminal plans idle for OLY_RETENTION_ARCHIVE_AFTER_DAYS -- plan, steps
+   and events with blobs resolved -- to gzip NDJSON (Parquet with OLY_ARCHIVE_FORMAT=
+   parquet and pyarrow installed) under OLY_RETENTION_ARCHIVE_DIR, then rolls each
+   one up into a `plan_rollups` row;
+3. deletes blobs nothing references any more;
+4. runs an incremental VACUUM and truncates the WAL, and reports the bytes reclaimed.
+
+Policies come from OLY_RETENTION_POLICIES, a JSON list such as
+    [{"type": "chat.*", "max_age_days": 90, "keep_last": 1000}]
+`RetentionWorker` repeats the pass every OLY_RETENTION_INTERVAL_S in a daemon thread;
+it is off unless that is set, since archival and pruning delete rows.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .db import MemoryDB
+
+try:
+    import pyarrow  # optional: columnar archives
+    import pyarrow.parquet
+except Exception:  # pragma: no cover
+    pyarrow = None  # type: ignore
+
+DAY_MS = 24 * 3600 * 1000
+
+RETENTION_INTERVAL_S = int(os.getenv("OLY_RETENTION_INTERVAL_S", "0"))  # opt-in; 0 disables the worker
+ARCHIVE_AFTER_DAYS = float(os.getenv("OLY_RETENTION_ARCHIVE_AFTER_DAYS", "14"))  # 0 disables archival
+ARCHIVE_DIR = os.getenv("OLY_RETENTION_ARCHIVE_DIR", ".data/archive")
+ARCHIVE_FORMAT = os.getenv("OLY_ARCHIVE_FORMAT", "ndjson").lower()
+ARCHIVE_BATCH = int(os.getenv("OLY_RETENTION_ARCHIVE_BATCH", "100"))  # plans per run
+VACUUM_PAGES = int(os.getenv("OLY_RETENTION_VACUUM_PAGES", "0"))  # 0: free all pages
+
+
+@dataclass
+class RetentionPolicy:
+    type: str  # exact event type, or a prefix ending in '*'
+    max_age_days: Optional[float] = None
+    keep_last: Optional[int] = None  # newest N per plan / chat session
+
+
+DEFAULT_POLICIES = [
+    RetentionPolicy("step.progress", max_age_days=7, keep_last=200),
+    RetentionPolicy("step.cache_hit", max_age_days=30),
+    RetentionPolicy("chat.*", max_age_days=180, keep_last=5000),
+]
+
+
+def load_policies() -> List[RetentionPolicy]:
+    raw = os.getenv("OLY_RETENTION_POLICIES")
+    if not raw:
+        return list(DEFAULT_POLICIES)
+    return [RetentionPolicy(**p) for p in json.loads(raw)]
+
+
+class _NdjsonArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self._raw = open(path, "xb")
+        self._fh = io.TextIOWrapper(gzip.GzipFile(fileobj=self._raw, mode="wb"), encoding="utf-8")
+
+    def write(self, kind: str, plan_id: str, row: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps({"kind": kind, **row}, ensure_ascii=False, default=str) + "\n")
+
+    def close(self) -> None:
+        self._fh.close()  # writes the gzip trailer; leaves the raw file open
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+
+class _ParquetArchive:
+    def __init__(self, path: str):
+        self.path = path
+        open(path, "xb").close()  # claim the name now; close() then fills our own file
+        self._rows: List[Dict[str, Any]] = []
+
+    def write(self, kind: str, plan_id: str, row: Dict[str, Any]) -> None:
+        self._rows.append(
+            {"kind": kind, "plan_id": plan_id, "id": row.get("id"), "ts": row.get("ts"),
+             "type": row.get("type"), "data": json.dumps(row, ensure_ascii=False, default=str)}
+        )
+
+    def close(self) -> None:
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(self._rows), self.path, compression="zstd")
+
+
+def _open_archive(archive_dir: str, fmt: str):
+    os.makedirs(archive_dir, exist_ok=True)
+    # Passes from several processes can start in the same second; the suffix keeps
+    # their names apart and "xb" guarantees one never overwrites another's archive.
+    stamp = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    if fmt == "parquet" and pyarrow is not None:
+        return _ParquetArchive(os.path.join(archive_dir, f"plans-{stamp}.parquet"))
+    return _NdjsonArchive(os.path.join(archive_dir, f"plans-{stamp}.ndjson.gz"))
+
+
+def archive_plans(
+    db: MemoryDB,
+    plan_ids: Iterable[str],
+    archive_dir: str = ARCHIVE_DIR,
+    fmt: str = ARCHIVE_FORMAT,
+) -> Dict[str, Any]:
+    """
+    Write the full history of `plan_ids` to one archive file, then roll each plan up.
+    Rows are only deleted after the file is closed and synced.
+    """
+    plan_ids = list(plan_ids)
+    if not plan_ids:
+        return {"plans": 0, "path": None}
+    archive = _open_archive(archive_dir, fmt)
+    rollups = []
+    try:
+        for plan_id in plan_ids:
+            plan = db.get_plan(plan_id)
+            if plan is None:
+                continue
+            archive.write("plan", plan_id, plan)
+            steps: Dict[str, int] = {}
+            for step in db.get_steps(plan_id):
+                steps[step["state"]] = steps.get(step["state"], 0) + 1
+                archive.write("step", plan_id, step)
+            events: Dict[str, int] = {}
+            first_ts = last_ts = last_id = None
+            for ev in db.events_for_plan(plan_id):
+                events[ev["type"]] = events.get(ev["type"], 0) + 1
+                first_ts = ev["ts"] if first_ts is None else first_ts
+                last_ts, last_id = ev["ts"], ev["id"]
+                archive.write("event", plan_id, ev)
+            rollups.append(
+                (plan_id, {"archive_path": archive.path, "steps": steps, "events": events,
+                           "first_ts": first_ts, "last_ts": last_ts}, last_id)
+            )
+    finally:
+        archive.close()
+    done = sum(1 for plan_id, rollup, last_id in rollups if db.rollup_plan(plan_id, rollup, last_id))
+    return {"plans": done, "path": archive.path}
+
+
+def run_retention(
+    db: MemoryDB,
+    policies: Optional[List[RetentionPolicy]] = None,
+    archive_after_days: float = ARCHIVE_AFTER_DAYS,
+    archive_dir: str = ARCHIVE_DIR,
+    fmt: str = ARCHIVE_FORMAT,
+    now_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """One retention pass; returns what was deleted/archived and the bytes reclaimed on disk."""
+    started = time.perf_counter()
+    now_ms = now_ms or int(time.time() * 1000)
+    before = db.storage_stats()
+    pruned: Dict[str, int] = {}
+    for p in load_policies() if policies is None else policies:
+        n = db.prune_events(
+            [p.type],
+            max_age_ms=int(p.max_age_days * DAY_MS) if p.max_age_days is not None else None,
+            keep_last=p.keep_last,
+            now_ms=now_ms,
+        )
+        if n:
+            pruned[p.type] = n
+    archived: Dict[str, Any] = {"plans": 0, "path": None}
+    if archive_after_days > 0:
+        ids = db.archivable_plans(now_ms - int(archive_after_days * DAY_MS), limit=ARCHIVE_BATCH)
+        archived = archive_plans(db, ids, archive_dir, fmt)
+    blobs = db.gc_blobs()
+    db.compact(VACUUM_PAGES or None)
+    after = db.storage_stats()
+    size_before = before["db_bytes"] + before["wal_bytes"]
+    size_after = after["db_bytes"] + after["wal_bytes"]
+    return {
+        "events_pruned": pruned,
+        "plans_archived": archived["plans"],
+        "archive_path": archived["path"],
+        "blobs_deleted": blobs["count"],
+        "bytes_before": size_before,
+        "bytes_after": size_after,
+        "reclaimed_bytes": max(0, size_before - size_after),
+        "free_pages": after["free_pages"],
+        "auto_vacuum": after["auto_vacuum"],
+        "duration_s": round(time.perf_counter() - started, 3),
+    }
+
+
+class RetentionWorker:
+    """Runs `run_retention` every `interval_s` seconds in a daemon thread."""
+
+    def __init__(
+        self,
+        db: MemoryDB,
+        interval_s: float = RETENTION_INTERVAL_S,
+        on_report: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.db = db
+        self.interval_s = interval_s
+        self.on_report = on_report
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None and self.interval_s > 0:
+            self._thread = threading.Thread(target=self._loop, name="memorydb-retention", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def run_once(self) -> Dict[str, Any]:
+        report = run_retention(self.db)
+        self.last_report = report
+        if self.on_report is not None:
+            self.on_report(report)
+        return report
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+
+
+def main() -> None:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Prune, archive and compact the Olympus DB once")
+    ap.add_argument("--db", default=None, help="DB path (default: OLYMPUS_DB_PATH or .data/olympus.db)")
+    ap.add_argument("--full-vacuum", action="store_true", help="switch to incremental auto_vacuum first (rewrites the file)")
+    args = ap.parse_args()
+    db = MemoryDB(args.db) if args.db else MemoryDB()
+    try:
+        if args.full_vacuum and db.storage_stats()["auto_vacuum"] != 2:
+            db.enable_incremental_vacuum()
+        print(json.dumps(run_retention(db), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+# packages/memory/olympus_memory/vectors.py
+"""
+Embedded approximate nearest-neighbour index over the `embeddings` table
+(`MemoryDB.knn`), for single-node deployments without Postgres/pgvector.
+
+The index is IVF-flat with cosine similarity: vectors are L2-normalised and
+grouped into `nlist` clusters by spherical k-means; a query scores the
+centroids, then scans only the `nprobe` closest clusters. Below
+OLY_VECTOR_FLAT_MAX rows there is a single cluster, i.e. an exact scan.
+
+On disk (OLY_VECTOR_INDEX_DIR, default `<db file>.vec/`) each build writes
+`<gen>.vectors.npy` (rows sorted by cluster), `<gen>.ids.npy`,
+`<gen>.centroids.npy` and `<gen>.offsets.npy`, then swaps `meta.json` to point
+at them. Readers memory-map the arrays, so the OS page cache is shared between
+processes and a restart does not reload vectors into RAM.
+
+Sync: triggers on `embeddings` append the changed id to `embedding_log`
+(migration 9). Before each query the index reads the log past the sequence it
+was built at; changed rows are masked out of the base arrays and held in a
+small in-memory delta that is scanned exactly. When the delta exceeds
+OLY_VECTOR_REBUILD_RATIO of the base, the index is rebuilt and the log trimmed.
+Vectors are stored as little-endian float32 bytes (`put_embedding`); rows whose
+`dim` differs from the index dimension (the most common one) are ignored.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    import numpy as np  # optional: required only for knn()
+except Exception:  # pragma: no cover
+    np = None  # type: ignore
+
+if TYPE_CHECKING:
+    from .db import MemoryDB
+
+VECTOR_INDEX_DIR = os.getenv("OLY_VECTOR_INDEX_DIR", "")  # default: next to the DB file
+VECTOR_NLIST = int(os.getenv("OLY_VECTOR_NLIST", "0"))  # 0: about sqrt(rows)
+VECTOR_NPROBE = int(os.getenv("OLY_VECTOR_NPROBE", "16"))
+VECTOR_FLAT_MAX = int(os.getenv("OLY_VECTOR_FLAT_MAX", "20000"))  # exact scan up to this many rows
+VECTOR_REBUILD_RATIO = float(os.getenv("OLY_VECTOR_REBUILD_RATIO", "0.2"))
+VECTOR_REBUILD_MIN = 1000  # changes always tolerated in the delta before a rebuild
+
+_KMEANS_ITERS = 10
+_KMEANS_SAMPLE_PER_LIST = 64
+_CHUNK = 65536
+
+
+def _normalize(m: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (m / norms).astype(np.float32, copy=False)
+
+
+def _decode(blob: bytes, dim: int) -> Optional["np.ndarray"]:
+    if len(blob) != dim * 4:
+        return None
+    return np.frombuffer(blob, dtype="<f4")
+
+
+def _kmeans(sample: "np.ndarray", nlist: int, seed: int = 0) -> "np.ndarray":
+    """Spherical k-means on normalised rows; returns normalised centroids (nlist x dim)."""
+    rng = np.random.default_rng(seed)
+    cent = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(_KMEANS_ITERS):
+        assign = np.argmax(sample @ cent.T, axis=1)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():  # reseed empty clusters on random points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        cent = _normalize(sums)
+    return cent
+
+
+@dataclass
+class _Snapshot:
+    """Immutable view a query runs against; replaced wholesale on sync."""
+
+    seq: int = 0
+    dim: Optional[int] = None
+    ids: Any = None  # np.ndarray[str], base rows in cluster order
+    vectors: Any = None  # memmap (n x dim) float32
+    centroids: Any = None  # (nlist x dim)
+    offsets: Any = None  # (nlist + 1,) row offsets per cluster
+    masked: FrozenSet[str] = frozenset()  # base ids changed since the build
+    delta_ids: List[str] = field(default_factory=list)
+    delta: Any = None  # (m x dim) current vectors of changed ids
+
+    @property
+    def size(self) -> int:
+        return 0 if self.ids is None else len(self.ids)
+
+
+class VectorIndex:
+    """IVF-flat index over `db`'s embeddings table. Thread-safe; see the module docstring."""
+
+    def __init__(self, db: MemoryDB, path: Optional[str] = None, nlist: int = VECTOR_NLIST, nprobe: int = VECTOR_NPROBE):
+        if np is None:
+            raise RuntimeError("the vector index requires numpy")
+        self.db = db
+        self.path = path or VECTOR_INDEX_DIR or db.path + ".vec"
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._snap = _Snapshot()
+        self._loaded = False
+        self.builds = 0
+
+    # ----------------- Queries -----------------
+    def search(self, vector: Any, k: int, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """(id, cosine similarity) of the best `k` rows, best first. nprobe=0 scans every cluster (exact)."""
+        snap = self.sync()
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if snap.dim is None:
+            return []
+        if q.shape[0] != snap.dim:
+            raise ValueError(f"query has dimension {q.shape[0]}, index has {snap.dim}")
+        q = _normalize(q)
+        ids: List[str] = []
+        scores: List["np.ndarray"] = []
+        if snap.size:
+            rows, base_scores = self._scan_base(snap, q, nprobe if nprobe is not None else self.nprobe)
+            # masked rows can only push results down, so over-fetch by their count
+            top = min(len(rows), k + len(snap.masked))
+            if top:
+                best = np.argpartition(-base_scores, top - 1)[:top]
+                ids += [str(i) for i in snap.ids[rows[best]]]
+                scores.append(base_scores[best])
+        if snap.delta_ids:
+            ids += snap.delta_ids
+            scores.append(snap.delta @ q)
+        if not ids:
+            return []
+        all_scores = np.concatenate(scores)
+        out: List[Tuple[str, float]] = []
+        n_base = len(ids) - len(snap.delta_ids)
+        for i in np.argsort(-all_scores, kind="stable"):
+            if i < n_base and ids[i] in snap.masked:
+                continue
+            out.append((ids[i], float(all_scores[i])))
+            if len(out) == k:
+                break
+        return out
+
+    def _scan_base(self, snap: _Snapshot, q: "np.ndarray", nprobe: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Row numbers and scores of every base row in the probed clusters."""
+        nlist = len(snap.centroids)
+        if nprobe <= 0 or nprobe >= nlist:
+            probe = np.arange(nlist)
+        else:
+            probe = np.argpartition(-(snap.centroids @ q), nprobe - 1)[:nprobe]
+        rows: List["np.ndarray"] = []
+        scores: List["np.ndarray"] = []
+        for c in probe:
+            start, end = int(snap.offsets[c]), int(snap.offsets[c + 1])
+            for s in range(start, end, _CHUNK):
+                e = min(end, s + _CHUNK)
+                rows.append(np.arange(s, e))
+                scores.append(snap.vectors[s:e] @ q)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(scores)
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snap
+        return {
+            "rows": snap.size,
+            "dim": snap.dim,
+            "nlist": 0 if snap.centroids is None else len(snap.centroids),
+            "delta": len(snap.delta_ids),
+            "masked": len(snap.masked),
+            "seq": snap.seq,
+            "builds": self.builds,
+        }
+
+    # ----------------- Sync -----------------
+    def sync(self) -> _Snapshot:
+        """Bring the index up to the latest embedding_log entry. Returns the snapshot to query."""
+        head = self._log_head()
+        snap = self._snap
+        if self._loaded and head == snap.seq:
+            return snap
+        with self._lock:
+            if not self._loaded:
+                self._snap = self._load() or _Snapshot()
+                self._loaded = True
+            snap = self._snap
+            if head == snap.seq:
+                return snap
+            disk = self._read_meta()
+            if disk and disk["seq"] > snap.seq:  # another process rebuilt it
+                snap = self._load() or _Snapshot()
+            synced = self._apply_log(snap, head) if snap.dim is not None else None
+            self._snap = synced or self.rebuild()
+            return self._snap
+
+    def _log_head(self) -> int:
+        # sqlite_sequence, not MAX(seq): AUTOINCREMENT keeps counting after the log is trimmed.
+        with self.db._read() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='embedding_log'").fetchone()
+        return row["seq"] if row else 0
+
+    def _apply_log(self, snap: _Snapshot, head: int) -> Optional[_Snapshot]:
+        """`snap` plus the log entries (snap.seq, head]; None when a rebuild is due instead."""
+        with self.db._read() as conn:
+            rows = conn.execute(
+                "SELECT emb_id FROM embedding_log WHERE seq > ? AND seq <= ?", (snap.seq, head)
+            ).fetchall()
+        if len(rows) != head - snap.seq:
+            return None  # trimmed by a build this process has not seen
+        masked = set(snap.masked) | {r["emb_id"] for r in rows}
+        if len(masked) > max(VECTOR_REBUILD_MIN, VECTOR_REBUILD_RATIO * snap.size):
+            return None
+        current = self._fetch(masked, snap.dim)
+        delta_ids = sorted(current)
+        delta = np.stack([current[i] for i in delta_ids]) if delta_ids else np.empty((0, snap.dim), np.float32)
+        return _Snapshot(
+            head, snap.dim, snap.ids, snap.vectors, snap.centroids, snap.offsets, frozenset(masked), delta_ids, delta
+        )
+
+    def _fetch(self, ids: Any, dim: int) -> Dict[str, "np.ndarray"]:
+        ids = list(ids)
+        out: Dict[str, "np.ndarray"] = {}
+        with self.db._read() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                for r in conn.execute(
+                    f"SELECT id, vector FROM embeddings WHERE dim=? AND id IN ({','.join('?' * len(chunk))})",
+                    [dim, *chunk],
+                ).fetchall():
+                    v = _decode(r["vector"], dim)
+                    if v is not None:
+                        out[r["id"]] = _normalize(v)
+        return out
+
+    # ----------------- Build / persistence -----------------
+    def rebuild(self) -> _Snapshot:
+        """Rebuild from the embeddings table, persist it and trim the log. Returns the new snapshot."""
+        seq = self._log_head()
+        with self.db._read() as conn:
+            top = conn.execute(
+                "SELECT dim, COUNT(*) AS n FROM embeddings GROUP BY dim ORDER BY n DESC, dim LIMIT 1"
+            ).fetchone()
+        if not top:
+            return _Snapshot(seq=seq)
+        dim, n = int(top["dim"]), int(top["n"])
+        os.makedirs(self.path, exist_ok=True)
+        gen = f"{seq}-{uuid.uuid4().hex[:8]}"
+        # Rows changed after `seq` was read are replayed from the log on the next sync.
+        raw_path = self._file(gen, "raw")
+        raw = np.lib.format.open_memmap(raw_path, mode="w+", dtype=np.float32, shape=(n, dim))
+        ids: List[str] = []
+        with self.db._read() as conn:
+            cur = conn.execute("SELECT id, vector FROM embeddings WHERE dim=?", (dim,))
+            while len(ids) < n:
+                batch = cur.fetchmany(4096)
+                if not batch:
+                    break
+                for r in batch:
+                    v = _decode(r["vector"], dim)
+                    if v is not None and len(ids) < n:
+                        raw[len(ids)] = v
+                        ids.append(r["id"])
+        n = len(ids)
+        for s in range(0, n, _CHUNK):
+            raw[s : s + _CHUNK] = _normalize(raw[s : s + _CHUNK])
+
+        nlist = self._nlist_for(n)
+        rng = np.random.default_rng(0)
+        if nlist > 1:
+            sample_n = min(n, nlist * _KMEANS_SAMPLE_PER_LIST)
+            centroids = _kmeans(np.asarray(raw[np.sort(rng.choice(n, sample_n, replace=False))]), nlist)
+            assign = np.concatenate(
+                [np.argmax(raw[s : s + _CHUNK] @ centroids.T, axis=1) for s in range(0, n, _CHUNK)]
+            ) if n else np.empty(0, dtype=np.int64)
+        else:
+            centroids = _normalize(np.asarray(raw[:n].mean(axis=0, keepdims=True) if n else np.zeros((1, dim))))
+            assign = np.zeros(n, dtype=np.int64)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+        vectors = np.lib.format.open_memmap(self._file(gen, "vectors"), mode="w+", dtype=np.float32, shape=(n, dim))
+        for s in range(0, n, _CHUNK):
+            vectors[s : s + _CHUNK] = raw[order[s : s + _CHUNK]]
+        vectors.flush()
+        del vectors, raw
+        os.remove(raw_path)
+        id_arr = np.array(ids, dtype=str)[order] if n else np.array([], dtype="<U1")
+        np.save(self._file(gen, "ids"), id_arr)
+        np.save(self._file(gen, "centroids"), centroids)
+        np.save(self._file(gen, "offsets"), offsets)
+        tmp = os.path.join(self.path, f"meta.{gen}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"gen": gen, "seq": seq, "dim": dim, "rows": n, "nlist": nlist}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        previous = self._read_meta()
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        if previous and previous.get("gen") != gen:
+            self._remove_generation(previous["gen"])
+        with self.db._write() as conn:
+            conn.execute("DELETE FROM embedding_log WHERE seq <= ?", (seq,))
+        self.builds += 1
+        return self._load() or _Snapshot(seq=seq)
+
+    def _nlist_for(self, n: int) -> int:
+        if n <= VECTOR_FLAT_MAX:
+            return 1
+        return max(1, min(n // 39, self.nlist or int(math.sqrt(n))))  # >= 39 points per cluster
+
+    def _file(self, gen: str, name: str) -> str:
+        return os.path.join(self.path, f"{gen}.{name}.npy")
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self) -> Optional[_Snapshot]:
+        meta = self._read_meta()
+        if not meta:
+            return None
+        try:
+            gen = meta["gen"]
+            return _Snapshot(
+                seq=meta["seq"],
+                dim=meta["dim"],
+                ids=np.load(self._file(gen, "ids"), mmap_mode="r"),
+                vectors=np.load(self._file(gen, "vectors"), mmap_mode="r"),
+                centroids=np.load(self._file(gen, "centroids")),
+                offsets=np.load(self._file(gen, "offsets")),
+            )
+        except (OSError, ValueError, KeyError):
+            return None  # a concurrent rebuild removed it; the caller rebuilds or reloads
+
+    def _remove_generation(self, gen: str) -> None:
+        # Only the generation meta.json pointed at: a concurrent build's files are left alone.
+        # Processes still mapping these keep them alive until they unmap (POSIX).
+        for name in ("vectors", "ids", "centroids", "offsets"):
+            try:
+                os.remove(self._file(gen, name))
+            except OSError:
+                pass
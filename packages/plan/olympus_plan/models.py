@@ -8,11 +8,11 @@ from typing import Any, Dict, List, Optional, Set, Tuple
 
 try:
     # pydantic v2
-    from pydantic import BaseModel, Field, field_validator, model_validator
+    from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
     PydV2 = True
 except Exception:
     # pydantic v1 fallback
-    from pydantic import BaseModel, Field, validator as field_validator, root_validator as model_validator
+    from pydantic import BaseModel, Field, PrivateAttr, validator as field_validator, root_validator as model_validator
     PydV2 = False
 
 
@@ -73,25 +73,50 @@ class Step(BaseModel):
     error: Optional[str] = None
     output: Optional[Dict[str, Any]] = None
 
+    # Change tracking for incremental persistence; new steps start dirty.
+    _dirty: bool = PrivateAttr(default=True)
+
     @field_validator("deps", mode="before")
     def _dedup_deps(cls, v: Any) -> Any:
         if not v:
             return []
         return list(dict.fromkeys(v))  # order-preserving dedup
 
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self) -> None:
+        """Flag the step for persistence after a change made outside the mark_* helpers."""
+        self._dirty = True
+
+    def clear_dirty(self) -> None:
+        self._dirty = False
+
+    def mark_pending(self) -> None:
+        """Return an interrupted step to the runnable pool; attempts are kept."""
+        self.state = StepState.PENDING
+        self.started_at = None
+        self.ended_at = None
+        self.error = None
+        self._dirty = True
+
     def mark_running(self) -> None:
         self.state = StepState.RUNNING
         self.started_at = self.started_at or int(time.time() * 1000)
+        self._dirty = True
 
     def mark_done(self, output: Optional[Dict[str, Any]] = None) -> None:
         self.state = StepState.DONE
         self.output = output
         self.ended_at = int(time.time() * 1000)
+        self._dirty = True
 
     def mark_failed(self, err: str) -> None:
         self.state = StepState.FAILED
         self.error = err
         self.ended_at = int(time.time() * 1000)
+        self._dirty = True
 
     def can_run(self, completed: Set[str]) -> bool:
         if self.state not in (StepState.PENDING, StepState.BLOCKED):
@@ -146,6 +171,9 @@ class Plan(BaseModel):
         blocked_or_pending = [s for s in self.steps if s.state in (StepState.PENDING, StepState.BLOCKED)]
         return [s for s in blocked_or_pending if s.can_run(completed)]
 
+    def dirty_steps(self) -> List[Step]:
+        return [s for s in self.steps if s.is_dirty]
+
     def all_done(self) -> bool:
         return all(s.state in (StepState.DONE, StepState.SKIPPED) for s in self.steps)
 
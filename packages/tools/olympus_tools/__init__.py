@@ -11,7 +11,7 @@ from .fs import (
     REQUIRE_CONSENT,
 )
 from .search import glob_paths, search_file_content, SEARCH_SCOPE
-from .shell import run_shell_command, EXEC_SCOPE
+from .shell import run_shell_command, run_shell_command_async, EXEC_SCOPE
 from .git import git_status, git_add, git_commit, GIT_SCOPE
 
 __all__ = [
@@ -29,6 +29,7 @@ __all__ = [
     "search_file_content",
     "SEARCH_SCOPE",
     "run_shell_command",
+    "run_shell_command_async",
     "EXEC_SCOPE",
     "git_status",
     "git_add",
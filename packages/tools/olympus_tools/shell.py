@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import shlex
 import subprocess
-from typing import Dict, List, Optional
+import uuid
+from typing import BinaryIO, Callable, Dict, List, Optional
 
 from .fs import _normalize, ConsentToken, REQUIRE_CONSENT
 
 EXEC_SCOPE = "exec_shell"
 
+# Bounded capture for run_shell_command_async: bytes of each stream kept in memory.
+HEAD_BYTES = int(os.getenv("OLY_SHELL_HEAD_BYTES", "16384"))
+TAIL_BYTES = int(os.getenv("OLY_SHELL_TAIL_BYTES", "65536"))
+SPILL_DIR = ".artifacts/shell"  # sandbox-relative; full logs of truncated streams
+
 
 def _check_exec_consent(token: Optional[ConsentToken]):
     if not REQUIRE_CONSENT:
@@ -17,6 +24,12 @@ def _check_exec_consent(token: Optional[ConsentToken]):
         raise PermissionError("Consent with 'exec_shell' scope required")
 
 
+def _argv(cmd: List[str] | str) -> tuple[List[str], str]:
+    if isinstance(cmd, str):
+        return ["/bin/sh", "-lc", cmd], cmd
+    return list(cmd), " ".join(shlex.quote(x) for x in cmd)
+
+
 def run_shell_command(cmd: List[str] | str, workdir: str = "/", timeout: int = 120, token: Optional[ConsentToken] = None) -> Dict:
     """
     Execute a shell command within the sandboxed workdir.
@@ -27,12 +40,7 @@ def run_shell_command(cmd: List[str] | str, workdir: str = "/", timeout: int = 1
     _check_exec_consent(token)
     cwd = _normalize(workdir)
     os.makedirs(cwd, exist_ok=True)
-    if isinstance(cmd, str):
-        args = ["/bin/sh", "-lc", cmd]
-        display = cmd
-    else:
-        args = cmd
-        display = " ".join(shlex.quote(x) for x in cmd)
+    args, display = _argv(cmd)
     try:
         proc = subprocess.run(
             args,
@@ -59,3 +67,139 @@ def run_shell_command(cmd: List[str] | str, workdir: str = "/", timeout: int = 1
             "stderr": (e.stderr or "") + f"\nTIMEOUT after {timeout}s",
         }
 
+
+class _StreamCapture:
+    """
+    Bounded capture of one output stream: keeps the first `head_bytes` and the last
+    `tail_bytes`. Once the stream outgrows both, everything (including what was already
+    buffered) is spilled to `spill_path` so the full log survives on disk.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int, spill_path: Optional[str]):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_path = spill_path
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self._spill: Optional[BinaryIO] = None
+
+    def feed(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        if self._spill is not None:
+            self._spill.write(chunk)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if not chunk:
+            return
+        if self._spill is None and self.spill_path and len(self.tail) + len(chunk) > self.tail_bytes:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            self._spill = open(self.spill_path, "wb")
+            self._spill.write(bytes(self.head) + bytes(self.tail) + chunk)
+        self.tail += chunk
+        if len(self.tail) > self.tail_bytes:
+            del self.tail[: len(self.tail) - self.tail_bytes]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill is not None
+
+    def text(self) -> str:
+        if not self.truncated:
+            return (bytes(self.head) + bytes(self.tail)).decode(errors="replace")
+        omitted = self.total - len(self.head) - len(self.tail)
+        return (
+            bytes(self.head).decode(errors="replace")
+            + f"\n... [{omitted} bytes omitted] ...\n"
+            + bytes(self.tail).decode(errors="replace")
+        )
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+
+
+async def run_shell_command_async(
+    cmd: List[str] | str,
+    workdir: str = "/",
+    timeout: int = 120,
+    token: Optional[ConsentToken] = None,
+    on_output: Optional[Callable[[str, bytes], None]] = None,
+    head_bytes: Optional[int] = None,
+    tail_bytes: Optional[int] = None,
+    spill: bool = True,
+) -> Dict:
+    """
+    Async variant of run_shell_command using asyncio subprocesses.
+    stdout/stderr are read incrementally; on_output(stream_name, chunk) is called per chunk.
+    Only the head and tail of each stream are kept in memory; when a stream is truncated
+    the full output is spilled to `<stream>_log` (a sandbox-relative path under .artifacts/shell).
+    Returns the run_shell_command shape plus byte counts, `truncated` and the log paths.
+    """
+    _check_exec_consent(token)
+    cwd = _normalize(workdir)
+    os.makedirs(cwd, exist_ok=True)
+    args, display = _argv(cmd)
+    run_id = uuid.uuid4().hex
+    captures: Dict[str, _StreamCapture] = {}
+    for name in ("stdout", "stderr"):
+        rel = f"{SPILL_DIR}/{run_id}.{name}.log"
+        captures[name] = _StreamCapture(
+            HEAD_BYTES if head_bytes is None else head_bytes,
+            TAIL_BYTES if tail_bytes is None else tail_bytes,
+            _normalize(rel) if spill else None,
+        )
+    proc = await asyncio.create_subprocess_exec(
+        *args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+
+    async def pump(stream: asyncio.StreamReader, name: str) -> None:
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return
+            captures[name].feed(chunk)
+            if on_output is not None:
+                on_output(name, chunk)
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(proc.stdout, "stdout"), pump(proc.stderr, "stderr"), proc.wait()),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        try:
+            # Timed out or cancelled by the caller: kill the child and reap it (shielded,
+            # so a second cancel cannot skip it) to leave no zombie or open transport.
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                await asyncio.shield(proc.wait())
+        finally:
+            for c in captures.values():
+                c.close()
+    out, err = captures["stdout"], captures["stderr"]
+    result = {
+        "cwd": cwd,
+        "cmd": display,
+        "exit_code": 124 if timed_out else proc.returncode,
+        "stdout": out.text(),
+        "stderr": err.text() + (f"\nTIMEOUT after {timeout}s" if timed_out else ""),
+        "stdout_bytes": out.total,
+        "stderr_bytes": err.total,
+        "truncated": out.truncated or err.truncated,
+    }
+    for name, c in captures.items():
+        result[f"{name}_log"] = f"{SPILL_DIR}/{run_id}.{name}.log" if c.spilled else None
+    return result
@@ -25,13 +25,31 @@ def run_plan(plan_id: str) -> None:
     r.raise_for_status()
 
 
+def plan_state(plan_id: str) -> str:
+    r = httpx.get(f"{API}/v1/plan/{plan_id}", timeout=10)
+    r.raise_for_status()
+    return r.json()["plan"]["state"]
+
+
 def wait(plan_id: str, timeout_s: int = 60) -> str:
+    # Follow the SSE feed (closes once the plan settles); poll only if streaming fails.
     deadline = time.time() + timeout_s
+    try:
+        timeout = httpx.Timeout(timeout_s, connect=10)
+        with httpx.stream("GET", f"{API}/v1/plan/{plan_id}/events/stream", timeout=timeout) as r:
+            r.raise_for_status()
+            for _line in r.iter_lines():
+                if time.time() >= deadline:
+                    return "TIMEOUT"
+        state = plan_state(plan_id)
+        if state in ("DONE", "FAILED", "CANCELLED"):
+            return state
+    except httpx.ReadTimeout:
+        return "TIMEOUT"
+    except httpx.HTTPError:
+        pass
     while time.time() < deadline:
-        r = httpx.get(f"{API}/v1/plan/{plan_id}", timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        state = data["plan"]["state"]
+        state = plan_state(plan_id)
         if state in ("DONE", "FAILED", "CANCELLED"):
             return state
         time.sleep(0.5)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Hashing embedder throughput: embed() one text at a time vs embed_batch().
+
+Generates `--docs` synthetic documents (Zipf-distributed words, ~`--words`
+tokens each), embeds them with the per-text function and with embed_batch
+in-process and with `--processes` workers, and checks the results agree.
+
+usage: python scripts/bench_embed.py [--docs 100000] [--words 60] [--processes 4]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from services.retrieval.app import embed as embedder  # noqa: E402
+
+
+def corpus(docs: int, words: int, vocab: int = 50_000) -> List[str]:
+    rng = np.random.default_rng(0)
+    lexicon = [f"w{i}" for i in range(vocab)]
+    ids = (rng.zipf(1.2, size=docs * words) - 1) % vocab
+    lens = rng.integers(words // 2, words * 3 // 2, size=docs)
+    out, pos = [], 0
+    for n in lens:
+        out.append(" ".join(lexicon[i] for i in ids[pos : pos + n]))
+        pos = (pos + n) % (len(ids) - words * 2)
+    return out
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=100_000)
+    ap.add_argument("--words", type=int, default=60)
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args(argv)
+    texts = corpus(args.docs, args.words)
+
+    t = time.perf_counter()
+    ref = [embedder.embed(x) for x in texts]
+    base = time.perf_counter() - t
+    print(f"embed() x {args.docs}: {base:.2f}s ({args.docs / base:,.0f} docs/s)")
+
+    embedder._token_code.cache_clear()
+    for label, procs in (("embed_batch, cold cache", 1), ("embed_batch, warm cache", 1),
+                         (f"embed_batch, {args.processes} processes", args.processes)):
+        t = time.perf_counter()
+        m = embedder.embed_batch(texts, processes=procs)
+        dt = time.perf_counter() - t
+        err = float(np.abs(m - np.asarray(ref, dtype=np.float32)).max())
+        print(f"{label}: {dt:.2f}s ({args.docs / dt:,.0f} docs/s, {base / dt:.1f}x, max abs diff {err:.1e})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
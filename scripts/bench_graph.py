@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Knowledge-graph load and query latency on a random graph (default 1M edges).
+
+Builds `--edges` relations over `--nodes` entities with batched upserts into a
+fresh DB file, then times neighbors / k_hop / subgraph / shortest_path from
+random start nodes and reports the median and p95 per query.
+
+usage: python scripts/bench_graph.py [--nodes 100000] [--edges 1000000] [--queries 50]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from packages.memory.olympus_memory.db import MemoryDB  # noqa: E402
+
+REL_TYPES = ("imports", "calls", "owns", "mentions")
+
+
+def load(db: MemoryDB, nodes: int, edges: int, batch: int) -> float:
+    rnd = random.Random(7)
+    start = time.perf_counter()
+    for i in range(0, nodes, batch):
+        db.upsert_entities({"id": f"n{j}", "type": "node", "data": {}} for j in range(i, min(nodes, i + batch)))
+    for i in range(0, edges, batch):
+        db.upsert_relations(
+            {"id": f"e{j}", "src_id": f"n{rnd.randrange(nodes)}", "dst_id": f"n{rnd.randrange(nodes)}",
+             "type": REL_TYPES[j % len(REL_TYPES)], "data": {}}
+            for j in range(i, min(edges, i + batch))
+        )
+    return time.perf_counter() - start
+
+
+def timed(fn: Callable[[], object], n: int) -> List[float]:
+    out = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t) * 1000)
+    return out
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--nodes", type=int, default=100_000)
+    ap.add_argument("--edges", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--batch", type=int, default=50_000)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MemoryDB(os.path.join(tmp, "graph.db"))
+        secs = load(db, args.nodes, args.edges, args.batch)
+        print(f"loaded {args.nodes} nodes / {args.edges} edges in {secs:.1f}s ({args.edges / secs:,.0f} edges/s)")
+
+        rnd = random.Random(11)
+        pick = lambda: f"n{rnd.randrange(args.nodes)}"  # noqa: E731
+        cases = {
+            "neighbors(out)": lambda: db.neighbors(pick()),
+            "k_hop(k=2,out)": lambda: db.k_hop(pick(), k=2),
+            "k_hop(k=3,out)": lambda: db.k_hop(pick(), k=3),
+            "k_hop(k=2,both,typed)": lambda: db.k_hop(pick(), k=2, types=["imports", "calls"], direction="both"),
+            "subgraph(k=1,both)": lambda: db.subgraph(pick(), k=1),
+            "shortest_path(out)": lambda: db.shortest_path(pick(), pick(), max_depth=8),
+            "shortest_path(both)": lambda: db.shortest_path(pick(), pick(), direction="both", max_depth=8),
+        }
+        print(f"{'query':>24} {'p50_ms':>8} {'p95_ms':>8}")
+        for name, fn in cases.items():
+            ms = sorted(timed(fn, args.queries))
+            p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+            print(f"{name:>24} {statistics.median(ms):>8.2f} {p95:>8.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Scheduling overhead of PlanExecutor.run for no-op plans of 10 / 1k / 10k steps.
+
+Tools are no-ops and persistence goes to an in-memory sink, so the numbers
+measure the scheduler itself (dependency tracking, dispatch, wake-ups).
+
+usage: python scripts/bench_scheduler.py [--sizes 10,1000,10000] [--concurrency 16]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from apps.worker.olympus_worker.main import PlanExecutor, ToolRegistry  # noqa: E402
+from packages.plan.olympus_plan.models import CapabilityRef, Plan, Step  # noqa: E402
+from packages.tools.olympus_tools.fs import ConsentToken  # noqa: E402
+
+
+class NullDB:
+    """Accepts the MemoryDB write calls the executor makes and discards them."""
+
+    def upsert_plan(self, plan_dict: Dict[str, Any]) -> None:
+        pass
+
+    def upsert_steps(self, rows: List[Dict[str, Any]]) -> int:
+        return len(rows)
+
+    def append_event(self, ev: Dict[str, Any]) -> None:
+        pass
+
+    def flush(self) -> int:
+        return 0
+
+
+def build_plan(n: int, shape: str) -> Plan:
+    cap = CapabilityRef(name="noop")
+    steps: List[Step] = []
+    width = max(1, n // 100)  # layered: at most 100 levels deep
+    for i in range(n):
+        deps: List[str] = []
+        if shape == "layered" and i >= width:
+            deps = [steps[i - width].id]
+        steps.append(Step(name=f"s{i}", capability=cap, deps=deps))
+    return Plan(title=f"bench-{shape}-{n}", steps=steps)
+
+
+async def bench_one(n: int, shape: str, concurrency: int) -> float:
+    reg = ToolRegistry()
+    reg.register("noop", lambda args, consent: {}, scopes=[], pool="inline")
+    ex = PlanExecutor(db=NullDB(), registry=reg)  # type: ignore[arg-type]
+    ex.sem = asyncio.Semaphore(concurrency)
+    plan = build_plan(n, shape)
+    start = time.perf_counter()
+    await ex.run(plan, consent=ConsentToken(token="bench", scopes=["*"]))
+    elapsed = time.perf_counter() - start
+    assert plan.state.value == "DONE", plan.state
+    return elapsed
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,1000,10000")
+    ap.add_argument("--concurrency", type=int, default=16)
+    args = ap.parse_args(argv)
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    print(f"{'steps':>7} {'shape':>8} {'total_ms':>10} {'us/step':>9}")
+    for shape in ("wide", "layered"):
+        for n in sizes:
+            elapsed = asyncio.run(bench_one(n, shape, args.concurrency))
+            print(f"{n:>7} {shape:>8} {elapsed * 1000:>10.1f} {elapsed / n * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Local vector index (MemoryDB.knn) build time, query latency and recall@k.
+
+Loads `--rows` clustered random vectors into a fresh DB file, builds the IVF
+index with the first query, then times `--queries` knn() calls and compares
+them with an exact scan (nprobe=0).
+
+usage: python scripts/bench_vectors.py [--rows 100000] [--dim 384] [--k 10] [--nprobe 16]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from packages.memory.olympus_memory.db import MemoryDB  # noqa: E402
+
+
+def main(argv: List[str]) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nprobe", type=int, default=16)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(1, args.rows // 200), args.dim)).astype(np.float32)
+    x = centers[rng.integers(0, len(centers), args.rows)] + 0.5 * rng.normal(size=(args.rows, args.dim)).astype(np.float32)
+    queries = x[rng.integers(0, args.rows, args.queries)] + 0.1 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = MemoryDB(os.path.join(tmp, "vec.db"))
+        t = time.perf_counter()
+        for s in range(0, args.rows, 10_000):
+            db.put_embeddings({"id": f"e{i}", "vector": x[i].tobytes(), "dim": args.dim, "meta": {}}
+                              for i in range(s, min(args.rows, s + 10_000)))
+        print(f"inserted {args.rows} x {args.dim} in {time.perf_counter() - t:.1f}s")
+        t = time.perf_counter()
+        db.knn(queries[0], args.k, nprobe=args.nprobe)
+        print(f"index build {time.perf_counter() - t:.1f}s {db.vector_index_stats()}")
+
+        ms, exact_ms, recall = [], [], []
+        for q in queries:
+            t = time.perf_counter()
+            got = db.knn(q, args.k, nprobe=args.nprobe)
+            ms.append((time.perf_counter() - t) * 1000)
+            t = time.perf_counter()
+            truth = db.knn(q, args.k, nprobe=0)
+            exact_ms.append((time.perf_counter() - t) * 1000)
+            recall.append(len({h["id"] for h in got} & {h["id"] for h in truth}) / args.k)
+        ms.sort()
+        print(f"knn p50 {statistics.median(ms):.2f} ms  p95 {ms[int(len(ms) * 0.95)]:.2f} ms  "
+              f"exact p50 {statistics.median(exact_ms):.2f} ms  recall@{args.k} {statistics.mean(recall):.3f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "1024"))  # 0 disables
+# Bounds staleness from ingests run by other replicas, which do not bump this process's generation.
+SEARCH_CACHE_TTL_S = float(os.environ.get("SEARCH_CACHE_TTL_S", "300"))
+
+
+def normalize_query(query: str) -> str:
+    # Same lowercasing and whitespace split as embed(), so equal keys embed identically.
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    Bounded LRU of search results keyed on (normalized query, k), each entry also
+    holding the query vector. `invalidate()` starts a new ingest generation: results
+    from older generations are no longer served, but their vectors are (embeddings of
+    a query never change), so a repeat search after an ingest skips embedding.
+    Entries expire `ttl_s` seconds after they were stored.
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE, ttl_s=SEARCH_CACHE_TTL_S, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [generation, vector, results, stored_at]
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def get(self, query, k):
+        """(vector, results) for a query: (None, None) on a miss, (vector, None) when stale."""
+        key = (normalize_query(query), k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() - entry[3] > self.ttl_s:
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return None, None
+            self._entries.move_to_end(key)
+            if entry[0] != self.generation:
+                self.stats["stale"] += 1
+                return entry[1], None
+            self.stats["hits"] += 1
+            return entry[1], entry[2]
+
+    def put(self, query, k, vector, results, generation):
+        """Store results computed at `generation` (read before querying); dropped if it has moved on."""
+        if self.max_entries <= 0:
+            return
+        key = (normalize_query(query), k)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = [generation, vector, results, self._clock()]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+
+    def __len__(self):
+        return len(self._entries)
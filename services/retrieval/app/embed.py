@@ -1,7 +1,18 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from hashlib import sha256
 import math
+import os
+
+import numpy as np
 
 DIM = 768
+# Distinct tokens whose (bucket, sign) stay memoized; one SHA-256 per token otherwise.
+TOKEN_CACHE_SIZE = int(os.environ.get("EMBED_TOKEN_CACHE_SIZE", "262144"))
+# embed_batch fans out to this many processes for calls of at least EMBED_PARALLEL_MIN texts
+# (a pool is started per call, so smaller batches are faster in-process; see INGEST_BATCH_SIZE).
+EMBED_PROCESSES = int(os.environ.get("EMBED_PROCESSES", "0"))  # 0/1: in-process only
+EMBED_PARALLEL_MIN = int(os.environ.get("EMBED_PARALLEL_MIN", "20000"))
 
 
 def _tokenize(text: str):
@@ -15,6 +26,13 @@ def _signed_bucket(token: str):
     return idx, sign
 
 
+# Signed bucket as one int: idx + 1 for +1, -(idx + 1) for -1.
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _token_code(token: str) -> int:
+    idx, sign = _signed_bucket(token)
+    return idx + 1 if sign > 0 else -(idx + 1)
+
+
 def embed(text: str):
     vec = [0.0] * DIM
     for tok in _tokenize(text):
@@ -22,3 +40,41 @@ def embed(text: str):
         vec[idx] += sign
     norm = math.sqrt(sum(v * v for v in vec)) or 1.0
     return [v / norm for v in vec]
+
+
+def _embed_chunk(texts, block=4096):
+    out = np.empty((len(texts), DIM), dtype=np.float32)
+    for start in range(0, len(texts), block):
+        toks = []
+        lengths = np.empty(min(block, len(texts) - start), dtype=np.int64)
+        for i, text in enumerate(texts[start : start + block]):
+            words = _tokenize(text)
+            lengths[i] = len(words)
+            toks += words
+        codes = np.fromiter(map(_token_code, toks), dtype=np.int64, count=len(toks))
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        # Scatter-add every (row, bucket) += sign at once over the flattened block.
+        flat = np.bincount(rows * DIM + np.abs(codes) - 1, weights=np.sign(codes), minlength=len(lengths) * DIM)
+        vecs = flat.reshape(len(lengths), DIM)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        out[start : start + len(lengths)] = vecs / norms
+    return out
+
+
+def embed_batch(texts, processes=None):
+    """
+    Embed many texts at once: a (len(texts), DIM) float32 matrix whose rows equal
+    embed(text). With `processes` > 1 (default EMBED_PROCESSES) batches of at least
+    EMBED_PARALLEL_MIN texts are split across a process pool.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, DIM), dtype=np.float32)
+    processes = EMBED_PROCESSES if processes is None else processes
+    if processes <= 1 or len(texts) < EMBED_PARALLEL_MIN:
+        return _embed_chunk(texts)
+    size = math.ceil(len(texts) / processes)
+    chunks = [texts[i : i + size] for i in range(0, len(texts), size)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return np.vstack(list(pool.map(_embed_chunk, chunks)))
@@ -1,22 +1,106 @@
-import asyncpg
-from .embed import embed
-
-async def ingest_facts(dsn: str):
-    conn = await asyncpg.connect(dsn)
-    try:
-        facts = await conn.fetch("SELECT id, content FROM facts")
-        for fact in facts:
-            embedding = embed(fact['content'])
-            await conn.execute(
-                """
-                INSERT INTO embeddings (id, fact_id, vector, model)
-                VALUES ($1, $2, $3, $4)
-                ON CONFLICT (id) DO NOTHING
-                """,
-                f"emb_{fact['id']}",
-                fact['id'],
-                embedding,
-                "text-embedding-ada-002"  # Replace with actual model name
-            )
-    finally:
-        await conn.close()
+import asyncio
+import logging
+import os
+import time
+
+from . import embed as embedder
+
+log = logging.getLogger(__name__)
+
+# embed_batch only fans out to EMBED_PROCESSES processes for calls of at least
+# EMBED_PARALLEL_MIN texts, and ingest embeds one batch per call: raise this to at
+# least EMBED_PARALLEL_MIN when using EMBED_PROCESSES.
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "1000"))
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "sha256-hash-768")
+
+# Facts with no embedding yet, or whose content or model changed since it was embedded.
+# md5 runs server-side, so unchanged facts are skipped without sending their content.
+_PENDING_SQL = """
+SELECT f.id, f.content, md5(f.content) AS content_hash
+FROM facts f
+LEFT JOIN embeddings e ON e.id = 'emb_' || f.id
+WHERE e.id IS NULL OR e.content_hash IS DISTINCT FROM md5(f.content) OR e.model <> $1
+"""
+
+_STAGE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS embeddings_stage
+  (id TEXT, fact_id TEXT, vector vector, model TEXT, content_hash TEXT) ON COMMIT DELETE ROWS
+"""
+
+_MERGE_SQL = """
+INSERT INTO embeddings (id, fact_id, vector, model, content_hash)
+SELECT id, fact_id, vector, model, content_hash FROM embeddings_stage
+ON CONFLICT (id) DO UPDATE SET
+  vector = excluded.vector, model = excluded.model, content_hash = excluded.content_hash
+"""
+
+_HAS_HASH_SQL = """
+SELECT 1 FROM information_schema.columns WHERE table_name = 'embeddings' AND column_name = 'content_hash'
+"""
+
+
+async def ensure_schema(conn):
+    """
+    Bring a database that predates migrations/0002 up to date. Called once when the
+    service opens its pool, never per ingest: the ALTER locks embeddings exclusively.
+    """
+    if not await conn.fetchval(_HAS_HASH_SQL):
+        await conn.execute("ALTER TABLE IF EXISTS embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT")
+
+
+def _timing(report, start):
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 3)
+    report["docs_per_s"] = round(report["embedded"] / elapsed, 1) if elapsed else 0.0
+    return report
+
+
+async def _write_batch(conn, rows, vectors):
+    records = [
+        (f"emb_{r['id']}", r["id"], vec, EMBED_MODEL, r["content_hash"]) for r, vec in zip(rows, vectors)
+    ]
+    async with conn.transaction():
+        await conn.copy_records_to_table("embeddings_stage", records=records)
+        await conn.execute(_MERGE_SQL)
+
+
+async def ingest_facts(pool, batch_size: int = INGEST_BATCH_SIZE, progress=None):
+    """
+    Embed new and changed facts, using two connections of `pool` (whose connections
+    have the pgvector codec registered). A server-side cursor streams the facts in
+    batches of `batch_size`; each batch is embedded with embed_batch and written with
+    COPY into a staging table plus one upsert, committed per batch, so an interrupted
+    run keeps its progress. embeddings.content_hash (md5 of the embedded content)
+    makes re-runs skip facts that are already current (the column comes from
+    migrations/0002, see ensure_schema). Embedding runs in a worker
+    thread so the event loop keeps serving requests. `progress(report)` is called
+    after every batch; the final report is returned.
+    """
+    if embedder.EMBED_PROCESSES > 1 and batch_size < embedder.EMBED_PARALLEL_MIN:
+        log.warning(
+            "ingest: batch size %d is below EMBED_PARALLEL_MIN=%d, so EMBED_PROCESSES=%d is not used",
+            batch_size, embedder.EMBED_PARALLEL_MIN, embedder.EMBED_PROCESSES,
+        )
+    report = {"embedded": 0, "batches": 0, "seconds": 0.0, "docs_per_s": 0.0}
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    async with pool.acquire() as reader, pool.acquire() as writer:
+        await writer.execute(_STAGE_SQL)
+        async with reader.transaction(readonly=True):
+            cursor = await reader.cursor(_PENDING_SQL, EMBED_MODEL)
+            while True:
+                rows = await cursor.fetch(batch_size)
+                if not rows:
+                    break
+                vectors = await loop.run_in_executor(None, embedder.embed_batch, [r["content"] for r in rows])
+                await _write_batch(writer, rows, vectors)
+                report["embedded"] += len(rows)
+                report["batches"] += 1
+                _timing(report, start)
+                log.info(
+                    "ingest: %d facts embedded in %d batches (%.1f docs/s)",
+                    report["embedded"], report["batches"], report["docs_per_s"],
+                )
+                if progress is not None:
+                    progress(dict(report))
+    return _timing(report, start)
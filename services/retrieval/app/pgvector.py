@@ -0,0 +1,26 @@
+import struct
+
+import numpy as np
+
+
+class VectorTypeMissing(RuntimeError):
+    """The database has no pgvector `vector` type yet (extension not created)."""
+
+
+def _encode(value):
+    # pgvector binary format: int16 dim, int16 unused, dim x big-endian float4.
+    vec = np.asarray(value, dtype=">f4").reshape(-1)
+    return struct.pack(">HH", vec.shape[0], 0) + vec.tobytes()
+
+
+def _decode(data):
+    dim, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=4).astype(np.float32)
+
+
+async def register_vector(conn):
+    """Let `conn` send and receive pgvector `vector` values as NumPy arrays (lists also accepted)."""
+    # Checked up front: asyncpg reports an unknown type as a plain ValueError.
+    if await conn.fetchval("SELECT to_regtype('public.vector')") is None:
+        raise VectorTypeMissing("type public.vector does not exist; run CREATE EXTENSION vector")
+    await conn.set_type_codec("vector", schema="public", encoder=_encode, decoder=_decode, format="binary")
@@ -0,0 +1,97 @@
+import sqlite3
+import time
+
+from fastapi.testclient import TestClient
+
+from olympus_memory import MemoryDB
+import apps.api.olympus_api.main as api
+
+
+def _keys(db):
+    conn = sqlite3.connect(db.path)
+    try:
+        return sorted(k for (k,) in conn.execute("SELECT key FROM cache_items"))
+    finally:
+        conn.close()
+
+
+def test_sweep_deletes_expired_rows_in_batches(tmp_path):
+    db = MemoryDB(str(tmp_path / "c.db"))
+    for i in range(25):
+        db.cache_put(f"llm:{i}", {"text": "x"}, ttl_ms=1)
+    db.cache_put("keep", {"text": "y"}, ttl_ms=None)
+    res = db.sweep_cache(now_ms=int(time.time() * 1000) + 10, batch_size=10)
+    assert res == {"expired": 25, "evicted": 0}
+    assert _keys(db) == ["keep"]
+
+
+def test_lru_evicts_least_recently_used_and_spares_pinned_keys(tmp_path):
+    db = MemoryDB(str(tmp_path / "c.db"))
+    db.cache_put("budget:2025-01-01", {"usd": 1.0}, ttl_ms=None)
+    for i in range(5):
+        db.cache_put(f"k{i}", {"text": "x" * 100}, ttl_ms=None)
+        time.sleep(0.002)
+    db.cache_get("k0")  # k0 becomes the most recently used
+    res = db.sweep_cache(max_entries=3, max_bytes=0, policy="lru", batch_size=2)
+    assert res["evicted"] == 3
+    assert _keys(db) == ["budget:2025-01-01", "k0", "k4"]
+    stats = db.cache_stats()
+    assert stats["hits"] == 1 and stats["evicted"] == 3 and stats["entries"] == 3
+
+
+def test_lfu_and_byte_budget(tmp_path):
+    db = MemoryDB(str(tmp_path / "c.db"))
+    for i in range(4):
+        db.cache_put(f"k{i}", {"text": "x" * 1000}, ttl_ms=None)
+    for _ in range(3):
+        db.cache_get("k0")
+    db.cache_get("k3")
+    assert db.cache_get("missing") is None
+    db.sweep_cache(max_entries=0, max_bytes=2500, policy="lfu")
+    assert _keys(db) == ["k0", "k3"]
+    stats = db.cache_stats()
+    assert stats["misses"] == 1 and stats["bytes"] <= 2500
+
+
+def test_cache_counters_on_metrics(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "c.db"))
+    db.cache_put("k", {"v": 1}, ttl_ms=None)
+    db.cache_get("k")
+    db.cache_get("nope")
+    monkeypatch.setattr(api, "DB", db)
+    text = TestClient(api.app).get("/metrics").text
+    assert 'cache_requests_total{result="hit"} 1.0' in text
+    assert 'cache_requests_total{result="miss"} 1.0' in text
+    assert "# TYPE cache_requests_total counter" in text and "# TYPE cache_evictions_total counter" in text
+    assert 'cache_items{unit="entries"} 1.0' in text
+
+
+def test_l1_serves_hot_keys_without_sqlite(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "c.db"))
+    db.cache_put("k", {"v": 1}, ttl_ms=None)
+    assert db.cache_get("k")["value"] == {"v": 1}  # write-through: already in the L1
+
+    def no_sqlite():
+        raise AssertionError("L1 hit went to SQLite")
+
+    monkeypatch.setattr(db, "_read", no_sqlite)
+    assert db.cache_get("k")["value"] == {"v": 1}
+    monkeypatch.undo()
+    assert db.cache_stats()["l1_hits"] == 2
+
+
+def test_l1_is_invalidated_by_writes_from_another_connection(tmp_path):
+    path = str(tmp_path / "c.db")
+    a, b = MemoryDB(path), MemoryDB(path)
+    a.cache_put("budget:today", {"usd": 1.0}, ttl_ms=None)
+    assert b.cache_get("budget:today")["value"] == {"usd": 1.0}  # now cached in b's L1
+    a.cache_put("budget:today", {"usd": 2.5}, ttl_ms=None)
+    assert b.cache_get("budget:today")["value"] == {"usd": 2.5}
+    b.cache_put("budget:today", {"usd": 3.0}, ttl_ms=None)
+    assert a.cache_get("budget:today")["value"] == {"usd": 3.0}
+
+
+def test_l1_honours_expiry(tmp_path):
+    db = MemoryDB(str(tmp_path / "c.db"))
+    db.cache_put("k", {"v": 1}, ttl_ms=1)
+    assert db.cache_get("k", now_ms=int(time.time() * 1000) + 10) is None
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from olympus_memory import MemoryDB
+from packages.llm.olympus_llm import router as llm
+
+DAY = 86_400_000
+
+
+def test_incr_returns_running_total_and_resets_per_window(tmp_path):
+    db = MemoryDB(str(tmp_path / "n.db"))
+    t0 = 10 * DAY + 5
+    assert db.incr("c", 2.5, window_ms=DAY, now_ms=t0) == 2.5
+    assert db.incr("c", 1, window_ms=DAY, now_ms=t0 + 1000) == 3.5
+    assert db.counter("c", now_ms=t0 + 1000) == 3.5
+    assert db.counter("c", now_ms=11 * DAY) == 0  # window over
+    assert db.incr("c", 1, window_ms=DAY, now_ms=11 * DAY + 1) == 1
+    assert db.incr("plain", 4) == 4 and db.counter("plain") == 4
+
+
+def test_concurrent_incr_loses_no_updates(tmp_path):
+    path = str(tmp_path / "n.db")
+    dbs = [MemoryDB(path), MemoryDB(path)]  # two writer connections, like two processes
+
+    def work(db):
+        for _ in range(100):
+            db.incr("hits", 1)
+
+    threads = [threading.Thread(target=work, args=(dbs[i % 2],)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert dbs[0].counter("hits") == 600
+
+
+def test_reserve_never_overshoots_the_limit(tmp_path):
+    path = str(tmp_path / "n.db")
+    dbs = [MemoryDB(path), MemoryDB(path)]
+    granted = []
+
+    def work(db):
+        for _ in range(20):
+            if db.reserve("usd", 1.0, limit=25.0, window_ms=DAY) is not None:
+                granted.append(1)
+
+    threads = [threading.Thread(target=work, args=(dbs[i % 2],)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(granted) == 25 and dbs[0].counter("usd") == 25.0
+    assert dbs[1].reserve("usd", 0.5, limit=25.0) is None
+
+
+def test_router_reserves_and_settles_spend(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "n.db"))
+    r = llm.LLMRouter(base_url="test://stub", db=db)
+    monkeypatch.setattr(llm, "DAILY_USD_BUDGET", 1.0)
+    reserved_at = r._reserve_budget(0.75)
+    assert r._get_spend() == 0.75
+    with pytest.raises(llm.BudgetExceeded):
+        r._reserve_budget(0.5)
+    r._add_spend(0.25 - 0.75, reserved_at)  # actual cost came in lower
+    assert r._get_spend() == pytest.approx(0.25)
+
+    monkeypatch.setattr(llm, "DAILY_TOKEN_BUDGET", 100)
+    r._reserve_tokens(80)
+    with pytest.raises(llm.BudgetExceeded):
+        r._reserve_tokens(30)
+    assert r._get_token_spend() == 80
+
+
+def test_settle_after_window_rollover_never_refunds_into_the_new_window(tmp_path):
+    db = MemoryDB(str(tmp_path / "n.db"))
+    t0 = 10 * DAY + DAY - 50  # reserved just before midnight UTC
+    assert db.reserve("usd", 0.75, limit=1.0, window_ms=DAY, now_ms=t0) == 0.75
+    assert db.settle("usd", 0.25 - 0.75, reserved_at_ms=t0, window_ms=DAY, now_ms=t0 + 10) == 0.25
+    assert db.reserve("usd", 0.75, limit=1.0, window_ms=DAY, now_ms=t0 + 20) == 1.0
+
+    after = 11 * DAY + 100  # settled after the rollover
+    assert db.incr("usd", 0.5, window_ms=DAY, now_ms=after) == 0.5  # another request today
+    assert db.settle("usd", -0.75, reserved_at_ms=t0 + 20, window_ms=DAY, now_ms=after) == 0.5
+    assert db.settle("usd", 0.25, reserved_at_ms=t0 + 20, window_ms=DAY, now_ms=after) == 0.75
+    assert db.reserve("usd", 0.5, limit=1.0, window_ms=DAY, now_ms=after) is None
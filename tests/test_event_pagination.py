@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+
+from olympus_memory import MemoryDB
+import apps.api.olympus_api.main as api
+
+
+def _seed(db, n=25):
+    db.upsert_plan(
+        {"id": "p1", "title": "t", "state": "RUNNING", "budget": {}, "metadata": {}, "created_at": 1, "updated_at": 1}
+    )
+    for i in range(n):
+        # several events share a timestamp: pages must neither skip nor repeat them
+        db.append_event(
+            {"id": f"e{i:03d}", "ts": 1000 + i // 4, "type": "step.done" if i % 2 else "step.started",
+             "plan_id": "p1", "step_id": f"s{i % 3}", "payload": {"i": i}}
+        )
+
+
+def test_keyset_pages_cover_every_event_once(tmp_path):
+    db = MemoryDB(str(tmp_path / "ev.db"))
+    _seed(db)
+    seen, after_ts, after_id = [], None, None
+    while True:
+        page = db.events_page("p1", after_ts, after_id, limit=7)
+        seen += [e["id"] for e in page]
+        if len(page) < 7:
+            break
+        after_ts, after_id = page[-1]["ts"], page[-1]["id"]
+    assert seen == [f"e{i:03d}" for i in range(25)]
+    assert [e["id"] for e in db.events_for_plan("p1", page_size=4)] == seen
+
+
+def test_same_millisecond_events_keep_append_order(tmp_path):
+    db = MemoryDB(str(tmp_path / "ev.db"))
+    for eid in ["zz", "mm", "aa"]:  # ids sort opposite to append order
+        db.append_event({"id": eid, "ts": 5, "type": "t", "plan_id": "p1", "step_id": None, "payload": {}})
+    assert [e["id"] for e in db.events_for_plan("p1")] == ["zz", "mm", "aa"]
+    assert [e["id"] for e in db.events_page("p1", after_ts=5, after_id="zz")] == ["mm", "aa"]
+    assert db.event_summary("p1")["cursor"] == {"after_ts": 5, "after_id": "aa"}
+
+
+def test_type_and_step_filters(tmp_path):
+    db = MemoryDB(str(tmp_path / "ev.db"))
+    _seed(db)
+    done = db.events_page("p1", types=["step.done"], limit=100)
+    assert done and all(e["type"] == "step.done" for e in done)
+    assert len(db.events_page("p1", types=["step.*"], limit=100)) == 25
+    assert db.events_page("p1", types=["step_*"], limit=100) == []  # '_' is literal, not a wildcard
+    s1 = db.events_page("p1", step_id="s1", limit=100)
+    assert {e["step_id"] for e in s1} == {"s1"}
+    summary = db.event_summary("p1")
+    assert summary["count"] == 25
+    assert summary["by_type"] == {"step.started": 13, "step.done": 12}
+    assert summary["cursor"] == {"after_ts": 1006, "after_id": "e024"}
+
+
+def test_plan_endpoint_returns_summary_and_cursor(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "ev.db"))
+    _seed(db)
+    monkeypatch.setattr(api, "DB", db)
+    client = TestClient(api.app)
+    body = client.get("/v1/plan/p1").json()
+    assert body["events"]["count"] == 25
+    assert body["cursor"]["after_id"] == "e024"
+
+    r = client.get("/v1/plan/p1/events", params={"limit": 10, "type": "step.done"})
+    page = r.json()
+    assert len(page["events"]) == 10 and page["has_more"]
+    r = client.get("/v1/plan/p1/events", params={"limit": 10, "type": "step.done", **page["cursor"]})
+    assert len(r.json()["events"]) == 2 and not r.json()["has_more"]
+    assert client.get("/v1/plan/p1/events", params={"after_id": "e001"}).status_code == 400
+    assert client.get("/v1/plan/nope/events").status_code == 404
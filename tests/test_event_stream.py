@@ -0,0 +1,82 @@
+import asyncio
+import json
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from olympus_memory import MemoryDB
+from packages.memory.olympus_memory.bus import EventBus
+import apps.api.olympus_api.main as api
+
+
+def _ev(i, typ="step.done", plan_id="p1"):
+    return {"id": f"e{i:03d}", "ts": 1000 + i, "type": typ, "plan_id": plan_id, "step_id": None, "payload": {"i": i}}
+
+
+def _db(tmp_path, state="RUNNING"):
+    db = MemoryDB(str(tmp_path / "sse.db"))
+    db.upsert_plan(
+        {"id": "p1", "title": "t", "state": state, "budget": {}, "metadata": {}, "created_at": 1, "updated_at": 1}
+    )
+    return db
+
+
+def _frames(text):
+    return [json.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+
+def test_bus_delivers_across_threads_and_flags_overflow():
+    bus = EventBus(max_queue=2)
+
+    async def main():
+        with bus.subscribe("p1") as sub:
+            t = threading.Thread(target=lambda: [bus.publish(_ev(i)) for i in range(3)] + [bus.publish(_ev(9, plan_id="p2"))])
+            t.start()
+            t.join()
+            got = [await sub.get(timeout=1), await sub.get(timeout=1)]
+            assert [e["id"] for e in got] == ["e000", "e001"]
+            assert sub.overflowed
+            assert await sub.get(timeout=0.05) is None
+        assert bus.subscribers() == 0
+
+    loop = asyncio.new_event_loop()  # leave the main thread's default loop untouched for later tests
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def test_stream_replays_and_resumes_from_last_event_id(tmp_path, monkeypatch):
+    db = _db(tmp_path, state="DONE")
+    for i in range(5):
+        db.append_event(_ev(i))
+    db.append_event(_ev(5, "plan.done"))
+    monkeypatch.setattr(api, "DB", db)
+    client = TestClient(api.app)
+    r = client.get("/v1/plan/p1/events/stream")
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert [e["id"] for e in _frames(r.text)] == [f"e{i:03d}" for i in range(6)]
+    r = client.get("/v1/plan/p1/events/stream", headers={"Last-Event-ID": "1003:e003"})
+    assert [e["id"] for e in _frames(r.text)] == ["e004", "e005"]
+    r = client.get("/v1/plan/p1/events/stream", params={"type": "plan.*"})
+    assert [e["type"] for e in _frames(r.text)] == ["plan.done"]
+
+
+def test_stream_pushes_live_events_until_plan_settles(tmp_path, monkeypatch):
+    db = _db(tmp_path)
+    db.append_event(_ev(0))
+    monkeypatch.setattr(api, "DB", db)
+    monkeypatch.setattr(api, "SSE_POLL_MS", 60_000)  # prove delivery comes from the bus, not a re-read
+
+    def producer():
+        while db.bus.subscribers("p1") == 0:
+            time.sleep(0.01)
+        db.append_event(_ev(1))
+        db.append_event(_ev(2, "plan.done"))
+
+    t = threading.Thread(target=producer)
+    t.start()
+    r = TestClient(api.app).get("/v1/plan/p1/events/stream")
+    t.join()
+    assert [e["id"] for e in _frames(r.text)] == ["e000", "e001", "e002"]
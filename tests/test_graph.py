@@ -0,0 +1,46 @@
+import pytest
+
+from olympus_memory import MemoryDB
+
+
+def _graph(tmp_path):
+    db = MemoryDB(str(tmp_path / "g.db"))
+    db.upsert_entities([{"id": n, "type": "file", "data": {"name": n}} for n in "abcdef"])
+    edges = [("a", "b", "imports"), ("b", "c", "imports"), ("c", "d", "imports"),
+             ("a", "e", "owns"), ("e", "d", "owns"), ("f", "a", "imports")]
+    db.upsert_relations(
+        [{"id": f"{s}-{d}", "src_id": s, "dst_id": d, "type": t, "data": {}} for s, d, t in edges]
+    )
+    return db
+
+
+def test_neighbors_and_k_hop(tmp_path):
+    db = _graph(tmp_path)
+    assert {r["dst_id"] for r in db.neighbors("a")} == {"b", "e"}
+    assert [r["src_id"] for r in db.neighbors("a", direction="in")] == ["f"]
+    assert {r["id"] for r in db.neighbors("a", types=["owns"], direction="both")} == {"a-e"}
+    assert db.k_hop("a", k=2) == {"a": 0, "b": 1, "e": 1, "c": 2, "d": 2}
+    assert db.k_hop("a", k=3, types=["imports"]) == {"a": 0, "b": 1, "c": 2, "d": 3}
+    assert db.k_hop("d", k=1, direction="in") == {"d": 0, "c": 1, "e": 1}
+    assert db.k_hop("c", k=2, direction="both")["a"] == 2
+
+
+def test_shortest_path_respects_types_and_direction(tmp_path):
+    db = _graph(tmp_path)
+    assert [r["id"] for r in db.shortest_path("a", "d")] == ["a-e", "e-d"]
+    assert [r["id"] for r in db.shortest_path("a", "d", types=["imports"])] == ["a-b", "b-c", "c-d"]
+    assert db.shortest_path("d", "a") is None
+    assert [r["id"] for r in db.shortest_path("d", "f", direction="both")] == ["e-d", "a-e", "f-a"]
+    assert db.shortest_path("a", "d", max_depth=1) is None
+    assert db.shortest_path("a", "a") == []
+    with pytest.raises(ValueError):
+        db.shortest_path("a", "d", direction="sideways")
+
+
+def test_subgraph_and_upserts_update_in_place(tmp_path):
+    db = _graph(tmp_path)
+    db.upsert_relation("a-b", "a", "b", "calls", {"w": 2})
+    sub = db.subgraph("b", k=1)
+    assert {n["id"]: n["depth"] for n in sub["nodes"]} == {"b": 0, "a": 1, "c": 1}
+    assert {e["id"]: e["type"] for e in sub["edges"]} == {"a-b": "calls", "b-c": "imports"}
+    assert sub["nodes"][0]["data"] == {"name": "b"}
@@ -0,0 +1,102 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from olympus_memory import MemoryDB
+from packages.memory.olympus_memory import blobs
+import apps.api.olympus_api.main as api
+
+BIG = "line of file content\n" * 2000  # ~42 KB, compresses well
+
+
+def _persist(db):
+    db.upsert_plan(
+        {"id": "p1", "title": "t", "state": "DONE", "budget": {}, "metadata": {}, "created_at": 1, "updated_at": 1}
+    )
+    out = {"path": "a.txt", "bytes": len(BIG), "content": BIG}
+    db.upsert_step(
+        {"id": "s1", "plan_id": "p1", "name": "read", "state": "DONE", "attempts": 1,
+         "capability": {"name": "fs.read"}, "input": {"path": "a.txt"}, "output": out}
+    )
+    db.append_event(
+        {"id": "e1", "ts": 1, "type": "step.done", "plan_id": "p1", "step_id": "s1",
+         "payload": {"attempt": 0, "output": out}}
+    )
+
+
+def _raw(db, sql):
+    conn = sqlite3.connect(db.path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_large_values_are_deduplicated_and_compressed(tmp_path):
+    db = MemoryDB(str(tmp_path / "b.db"))
+    _persist(db)
+    stats = db.blob_stats()
+    assert stats["count"] == 1  # step output and step.done payload share one blob
+    assert stats["bytes"] == len(BIG.encode()) and stats["stored_bytes"] < stats["bytes"] // 10
+    output_json, = _raw(db, "SELECT output_json FROM steps")[0]
+    assert '"$blob"' in output_json and len(output_json) < 1000
+
+    assert db.get_steps("p1")[0]["output"]["content"] == BIG
+    assert list(db.events_for_plan("p1"))[0]["payload"]["output"]["content"] == BIG
+    ref = db.get_steps("p1", resolve_blobs=False)[0]["output"]["content"]
+    assert blobs.is_ref(ref) and ref["preview"] == BIG[: blobs.BLOB_PREVIEW_CHARS]
+    assert db.get_blob(ref["$blob"]) == BIG
+    assert db.get_steps("p1")[0]["output"]["path"] == "a.txt"  # small values stay inline
+
+
+def test_batched_mode_writes_blobs_with_rows(tmp_path):
+    db = MemoryDB(str(tmp_path / "b.db"), durability="batched")
+    try:
+        _persist(db)
+        assert db.get_steps("p1")[0]["output"]["content"] == BIG
+    finally:
+        db.close()
+
+
+def test_summary_does_not_decode_blobs(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "b.db"))
+    _persist(db)
+
+    def boom(hashes):
+        raise AssertionError("summary decoded a blob")
+
+    monkeypatch.setattr(db, "get_blobs", boom)
+    monkeypatch.setattr(api, "DB", db)
+    body = TestClient(api.app).get("/v1/plan/p1/summary").json()
+    assert body["steps"][0]["output_preview"]["content"].startswith("line of file content")
+
+
+def test_blob_refs_track_writes_and_gc_pages_through_blobs(tmp_path):
+    db = MemoryDB(str(tmp_path / "b.db"))
+    _persist(db)
+    for i in range(5):  # unreferenced once their events are pruned
+        db.append_event({"id": f"x{i}", "ts": 1, "type": "step.progress", "plan_id": "p1", "payload": {"log": f"{i}" + BIG}})
+    assert sorted(r[0] for r in _raw(db, "SELECT DISTINCT src FROM blob_refs")) == ["events", "steps"]
+    assert db.prune_events(["step.progress"], max_age_ms=0, now_ms=10) == 5
+    freed = db.gc_blobs(min_age_ms=0, batch_size=2)  # three pages
+    assert freed["count"] == 5 and freed["stored_bytes"] > 0
+    assert db.blob_stats()["count"] == 1  # still referenced by s1 and e1
+
+    db.upsert_step({**db.get_steps("p1")[0], "output": None})
+    assert db.gc_blobs(min_age_ms=0)["count"] == 0  # e1 still holds it
+    db.prune_events(["step.done"], max_age_ms=0, now_ms=10)
+    assert _raw(db, "SELECT count(*) FROM blob_refs") == [(0,)]
+    assert db.gc_blobs(min_age_ms=0)["count"] == 1
+
+
+def test_blob_refs_migration_backfills_existing_rows(tmp_path):
+    path = str(tmp_path / "b.db")
+    _persist(MemoryDB(path))
+    conn = sqlite3.connect(path)
+    with conn:  # as if written before migration 11
+        conn.execute("DROP TABLE blob_refs")
+        conn.execute("DELETE FROM schema_migrations WHERE version = 11")
+    conn.close()
+    db = MemoryDB(path)
+    assert sorted(_raw(db, "SELECT src, src_id FROM blob_refs")) == [("events", "e1"), ("steps", "s1")]
+    assert db.gc_blobs(min_age_ms=0)["count"] == 0
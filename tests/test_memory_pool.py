@@ -0,0 +1,71 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from olympus_memory import MemoryDB
+import apps.api.olympus_api.main as api
+
+
+def _plan(pid: str) -> dict:
+    return {
+        "id": pid,
+        "title": "t",
+        "state": "DRAFT",
+        "budget": {},
+        "metadata": {},
+        "created_at": 1,
+        "updated_at": 1,
+    }
+
+
+def test_reads_do_not_wait_for_writer(tmp_path):
+    db = MemoryDB(str(tmp_path / "pool.db"), read_pool_size=2)
+    try:
+        db.upsert_plan(_plan("p1"))
+        db.cache_put("k", {"v": 1}, ttl_ms=None)
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold_writer():
+            with db._write():
+                held.set()
+                release.wait(5)
+
+        t = threading.Thread(target=hold_writer)
+        t.start()
+        held.wait(5)
+        try:
+            # Would deadlock-wait on the writer lock without the read pool
+            assert db.get_plan("p1")["title"] == "t"
+            assert db.get_steps("p1") == []
+            assert db.cache_get("k")["value"] == {"v": 1}
+        finally:
+            release.set()
+            t.join()
+        stats = db.pool_stats()
+        assert stats["read_pool_size"] == 2
+        assert stats["locks"]["read"]["acquisitions"] >= 3
+        assert stats["locks"]["write"]["acquisitions"] >= 2
+    finally:
+        db.close()
+
+
+def test_single_connection_mode(tmp_path):
+    db = MemoryDB(str(tmp_path / "single.db"), read_pool_size=0)
+    try:
+        db.upsert_plan(_plan("p1"))
+        assert db.get_plan("p1")["id"] == "p1"
+        assert db.pool_stats()["read_pool_size"] == 0
+    finally:
+        db.close()
+
+
+
+def test_lock_wait_totals_are_exported_as_counters(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "m.db"))
+    db.upsert_plan(_plan("p1"))
+    monkeypatch.setattr(api, "DB", db)
+    text = TestClient(api.app).get("/metrics").text
+    assert "# TYPE db_lock_acquisitions_total counter" in text
+    assert 'db_lock_acquisitions_total{kind="write"}' in text
+    assert "# TYPE db_lock_wait_seconds_total counter" in text
@@ -0,0 +1,57 @@
+import sqlite3
+
+from olympus_memory import MemoryDB
+from packages.memory.olympus_memory import db as db_module
+
+
+def _plan(pid: str, state: str = "DRAFT") -> dict:
+    return {
+        "id": pid,
+        "title": "t",
+        "state": state,
+        "budget": {},
+        "metadata": {},
+        "created_at": 1,
+        "updated_at": 1,
+    }
+
+
+def test_batched_durability_defers_commit(tmp_path, monkeypatch):
+    # Keep the background flusher out of the way; flush explicitly.
+    monkeypatch.setattr(db_module, "FLUSH_INTERVAL_MS", 60_000)
+    path = str(tmp_path / "batched.db")
+    db = MemoryDB(path, durability="batched")
+    try:
+        db.upsert_plan(_plan("p1"))
+        db.upsert_plan(_plan("p1", state="RUNNING"))
+        db.append_event({"id": "e1", "ts": 1, "type": "plan.started", "plan_id": "p1"})
+        raw = sqlite3.connect(path)
+        try:
+            assert raw.execute("SELECT COUNT(*) FROM plans").fetchone()[0] == 0
+            assert db.flush() == 2  # the two plan upserts coalesce into one row
+            assert raw.execute("SELECT state FROM plans").fetchone()[0] == "RUNNING"
+            assert raw.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+        finally:
+            raw.close()
+        # reads drain the buffer first
+        db.append_event({"id": "e2", "ts": 2, "type": "plan.done", "plan_id": "p1"})
+        assert [e["id"] for e in db.events_for_plan("p1")] == ["e1", "e2"]
+    finally:
+        db.close()
+
+
+def test_batched_flushes_at_size_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "FLUSH_INTERVAL_MS", 60_000)
+    monkeypatch.setattr(db_module, "FLUSH_MAX_ITEMS", 3)
+    path = str(tmp_path / "threshold.db")
+    db = MemoryDB(path, durability="batched")
+    try:
+        for i in range(3):
+            db.append_event({"id": f"e{i}", "ts": i, "type": "x", "plan_id": "p1"})
+        raw = sqlite3.connect(path)
+        try:
+            assert raw.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 3
+        finally:
+            raw.close()
+    finally:
+        db.close()
@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+from olympus_memory import MemoryDB, ensure_base_schema
+from packages.memory.olympus_memory.migrate import MIGRATIONS, Migration, applied_versions, migrate
+
+
+def _names(path, kind):
+    conn = sqlite3.connect(path)
+    try:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type=?", (kind,))}
+    finally:
+        conn.close()
+
+
+def test_fresh_db_gets_every_migration_once(tmp_path):
+    path = str(tmp_path / "m.db")
+    db = MemoryDB(path)
+    assert applied_versions(db._conn) == [m.version for m in MIGRATIONS]
+    assert {"idx_steps_plan_state", "idx_events_type", "idx_relations_src"} <= _names(path, "index")
+    assert "schema_version" not in _names(path, "table")
+    db.close()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert migrate(conn) == []  # reopening is a no-op
+    finally:
+        conn.close()
+
+
+def test_legacy_db_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / "m.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE schema_version (version INTEGER NOT NULL);
+        INSERT INTO schema_version VALUES (1);
+        CREATE TABLE cache_items (key TEXT PRIMARY KEY, value_json TEXT NOT NULL, meta_json TEXT NOT NULL,
+                                  created_at INTEGER NOT NULL, expires_at INTEGER);
+        INSERT INTO cache_items VALUES ('k', '{"v": 1}', '{}', 5, NULL);
+        CREATE TABLE schema_migrations (version INTEGER NOT NULL);
+        """
+    )
+    conn.close()
+    db = MemoryDB(path)
+    assert db.cache_get("k")["value"] == {"v": 1}
+    assert db.cache_stats()["bytes"] == len("k") + len('{"v": 1}') + len("{}")
+    assert "schema_version" not in _names(path, "table")
+    assert applied_versions(db._conn)[-1] == MIGRATIONS[-1].version
+
+
+def test_failed_migration_rolls_back_and_is_retried(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "m.db"))
+    broken = [
+        Migration(1, "t", sql="CREATE TABLE t (x INTEGER)"),
+        Migration(2, "bad", sql="CREATE INDEX idx_t_x ON t(x); INSERT INTO nope VALUES (1);"),
+    ]
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, broken)
+    assert applied_versions(conn) == [1]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name='idx_t_x'").fetchone() is None
+    fixed = broken[:1] + [Migration(2, "ok", sql="CREATE INDEX idx_t_x ON t(x)")]
+    assert migrate(conn, fixed) == [2]
+
+
+def test_ensure_base_schema_and_memorydb_share_one_version_table(tmp_path, monkeypatch):
+    path = str(tmp_path / "olympus.db")
+    monkeypatch.setenv("OLYMPUS_DB_PATH", path)
+    ensure_base_schema()
+    db = MemoryDB(path)
+    assert applied_versions(db._conn) == [m.version for m in MIGRATIONS]
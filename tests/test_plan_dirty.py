@@ -0,0 +1,66 @@
+from olympus_memory import MemoryDB
+from packages.plan.olympus_plan.models import CapabilityRef, Plan, Step
+
+
+def _plan() -> Plan:
+    cap = CapabilityRef(name="fs.read")
+    return Plan(title="t", steps=[Step(name=f"s{i}", capability=cap) for i in range(3)])
+
+
+def test_mark_helpers_set_dirty():
+    p = _plan()
+    assert len(p.dirty_steps()) == 3
+    for s in p.steps:
+        s.clear_dirty()
+    assert p.dirty_steps() == []
+    p.steps[1].mark_running()
+    assert p.dirty_steps() == [p.steps[1]]
+    p.steps[1].clear_dirty()
+    p.steps[1].mark_done({"ok": True})
+    assert p.steps[1].is_dirty
+
+
+def test_persist_plan_writes_only_dirty_steps(tmp_path, monkeypatch):
+    from apps.worker.olympus_worker.main import PlanExecutor
+
+    db = MemoryDB(str(tmp_path / "dirty.db"))
+    try:
+        ex = PlanExecutor(db=db)
+        p = _plan()
+        ex._persist_plan(p)
+        assert len(db.get_steps(p.id)) == 3
+        assert p.dirty_steps() == []
+
+        written = []
+        real = db.upsert_steps
+
+        def spy(rows):
+            rows = list(rows)
+            written.extend(r["id"] for r in rows)
+            return real(rows)
+
+        monkeypatch.setattr(db, "upsert_steps", spy)
+        p.steps[2].mark_failed("boom")
+        ex._persist_plan(p)
+        assert written == [p.steps[2].id]
+        rows = {r["id"]: r for r in db.get_steps(p.id)}
+        assert rows[p.steps[2].id]["state"] == "FAILED"
+        assert rows[p.steps[0].id]["state"] == "PENDING"
+    finally:
+        db.close()
+
+
+def test_upsert_steps_bulk(tmp_path):
+    db = MemoryDB(str(tmp_path / "bulk.db"))
+    try:
+        p = _plan()
+        rows = []
+        for s in p.steps:
+            row = s.dict()
+            row["plan_id"] = p.id
+            rows.append(row)
+        assert db.upsert_steps(rows) == 3
+        assert db.upsert_steps([]) == 0
+        assert len(db.get_steps(p.id)) == 3
+    finally:
+        db.close()
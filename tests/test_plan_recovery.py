@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from olympus_memory import MemoryDB
+from apps.worker.olympus_worker import main as worker_main
+from apps.worker.olympus_worker import queue_worker
+from apps.worker.olympus_worker.main import PlanExecutor, ToolRegistry
+from apps.worker.olympus_worker.queue_worker import StepWorker
+from packages.plan.olympus_plan.models import CapabilityRef, Plan, PlanState, Step, StepState
+from packages.tools.olympus_tools.fs import ConsentToken
+
+
+@pytest.fixture(autouse=True)
+def _heartbeat_to_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(queue_worker, "HEARTBEAT_PATH", str(tmp_path / "worker.json"))
+
+
+def _executor(db, ran):
+    reg = ToolRegistry()
+
+    def rec(args, consent):
+        ran.append(args["n"])
+        return {"n": args["n"]}
+
+    reg.register("rec", rec, scopes=[])
+    return PlanExecutor(db=db, registry=reg)
+
+
+def _crashed_plan(db, max_retries):
+    """Persist a plan as a dead executor leaves it: a DONE, b RUNNING, c PENDING."""
+    cap = CapabilityRef(name="rec")
+    a = Step(name="a", capability=cap, input={"n": "a"})
+    b = Step(name="b", capability=cap, input={"n": "b"}, deps=[a.id])
+    c = Step(name="c", capability=cap, input={"n": "c"}, deps=[b.id])
+    b.guard.max_retries = max_retries
+    a.attempts = 1
+    a.mark_done({"n": "a", "cached": True})
+    b.attempts = 1
+    b.mark_running()
+    plan = Plan(title="crashed", state=PlanState.RUNNING, steps=[a, b, c])
+    PlanExecutor(db=db)._persist_plan(plan)
+    db.save_plan_run(plan.id, {"token": "t", "scopes": ["*"]})
+    return plan
+
+
+def test_resume_reuses_done_steps_and_reschedules_orphans(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    plan = _crashed_plan(db, max_retries=2)
+    ran = []
+    ex = _executor(db, ran)
+    assert asyncio.run(asyncio.wait_for(ex.recover_interrupted(), 5)) == [plan.id]
+    assert ran == ["b", "c"]
+    assert db.get_plan(plan.id)["state"] == "DONE"
+    steps = {s["name"]: s for s in db.get_steps(plan.id)}
+    assert steps["a"]["output"] == {"n": "a", "cached": True}
+    assert steps["b"]["attempts"] == 2
+    resumed = [e for e in db.events_for_plan(plan.id) if e["type"] == "plan.resumed"][0]
+    assert resumed["payload"]["reused_steps"] == [plan.steps[0].id]
+    assert resumed["payload"]["rescheduled"] == [plan.steps[1].id]
+    assert db.get_plan_run(plan.id)["resumes"] == 1
+    assert db.interrupted_plans(lease_ms=0) == []  # DONE, not merely owned
+
+
+def test_orphan_without_retries_left_fails_plan(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    plan = _crashed_plan(db, max_retries=0)
+    ran = []
+    asyncio.run(asyncio.wait_for(_executor(db, ran).recover_interrupted(), 5))
+    assert ran == []
+    assert db.get_plan(plan.id)["state"] == "FAILED"
+    steps = {s["name"]: s for s in db.get_steps(plan.id)}
+    assert steps["b"]["state"] == StepState.FAILED.value
+    assert "interrupted" in steps["b"]["error"]
+
+
+def test_daemon_worker_takes_over_interrupted_plan(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    plan = _crashed_plan(db, max_retries=2)
+    ran = []
+    worker = StepWorker(db=db, executor=_executor(db, ran), worker_id="w1")
+    asyncio.run(asyncio.wait_for(worker.run_forever(stop_when_idle=True), 10))
+    assert ran == ["b", "c"]
+    assert db.get_plan(plan.id)["state"] == "DONE"
+
+
+def test_plan_with_live_owner_is_not_recovered(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    plan = _crashed_plan(db, max_retries=2)
+    assert db.claim_plan_run(plan.id, "api-1", lease_ms=30000)  # running inline elsewhere
+    assert not db.claim_plan_run(plan.id, "api-2", lease_ms=30000)
+    assert db.interrupted_plans(lease_ms=30000) == []
+    ran = []
+    assert asyncio.run(asyncio.wait_for(_executor(db, ran).recover_interrupted(), 5)) == []
+    worker = StepWorker(db=db, executor=_executor(db, ran), worker_id="w1")
+    assert worker.recover() == []
+    asyncio.run(asyncio.wait_for(_executor(db, ran).run_by_id(plan.id), 5))
+    assert ran == [] and db.get_plan(plan.id)["state"] == "RUNNING"
+
+    # the owner stops heartbeating: after one lease exactly one claimant takes over
+    later = db.get_plan_run(plan.id)["heartbeat_at"] + 30001
+    assert db.interrupted_plans(lease_ms=30000, now_ms=later) == [plan.id]
+    assert db.claim_plan_run(plan.id, "api-2", lease_ms=30000, now_ms=later)
+    assert not db.claim_plan_run(plan.id, "w1", lease_ms=30000, now_ms=later)
+    assert not db.heartbeat_plan_run(plan.id, "api-1")
+
+
+def test_executor_stops_when_its_lease_is_stolen(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker_main, "PLAN_HEARTBEAT_MS", 20)
+    db = MemoryDB(str(tmp_path / "r.db"))
+    reg = ToolRegistry()
+    started, ran = [], []
+
+    async def slow(args, consent):
+        started.append(args["n"])
+        await asyncio.sleep(2)
+        ran.append(args["n"])
+        return {"n": args["n"]}
+
+    reg.register("slow", slow, scopes=[])
+    cap = CapabilityRef(name="slow")
+    a = Step(name="a", capability=cap, input={"n": "a"})
+    b = Step(name="b", capability=cap, input={"n": "b"}, deps=[a.id])
+    plan = Plan(title="stolen", steps=[a, b])
+    ex = PlanExecutor(db=db, registry=reg, owner_id="api-1")
+
+    async def scenario():
+        task = asyncio.create_task(ex.run(plan, consent=ConsentToken(token="t", scopes=["*"])))
+        while not started:
+            await asyncio.sleep(0.005)
+        later = db.get_plan_run(plan.id)["heartbeat_at"] + worker_main.PLAN_LEASE_MS + 1
+        assert db.claim_plan_run(plan.id, "w2", worker_main.PLAN_LEASE_MS, now_ms=later)
+        return await asyncio.wait_for(task, 1)
+
+    asyncio.run(scenario())
+    assert started == ["a"] and ran == []  # a was cancelled, b never dispatched
+    assert db.get_plan_run(plan.id)["owner"] == "w2"
+    assert db.get_plan(plan.id)["state"] == "RUNNING"  # left for the new owner
+    types = [e["type"] for e in db.events_for_plan(plan.id)]
+    assert "plan.done" not in types and "plan.failed" not in types
@@ -0,0 +1,88 @@
+import gzip
+import json
+import time
+
+from olympus_memory import MemoryDB
+from packages.memory.olympus_memory.retention import archive_plans, run_retention
+
+BIG = "archived output line\n" * 2000
+DAY = 24 * 3600 * 1000
+
+
+def _ev(i, typ, plan_id="p1", ts=None, payload=None):
+    return {"id": f"{plan_id}-e{i:04d}", "ts": ts if ts is not None else 1000 + i, "type": typ,
+            "plan_id": plan_id, "step_id": None, "payload": payload or {"i": i}}
+
+
+def _plan(db, plan_id, state, updated_at):
+    db.upsert_plan(
+        {"id": plan_id, "title": "t", "state": state, "budget": {}, "metadata": {},
+         "created_at": updated_at, "updated_at": updated_at}
+    )
+    db.upsert_step(
+        {"id": f"{plan_id}-s1", "plan_id": plan_id, "name": "read", "state": "DONE", "attempts": 1,
+         "capability": {"name": "fs.read"}, "input": {}, "output": {"content": BIG}}
+    )
+
+
+def test_prune_by_age_and_count_per_plan(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    now = int(time.time() * 1000)
+    for pid in ("p1", "p2"):
+        for i in range(30):
+            db.append_event(_ev(i, "step.progress", pid, ts=now - 1000 + i))
+    db.append_event(_ev(99, "chat.user", "sess", ts=now - 40 * DAY))
+    db.append_event(_ev(100, "chat.user", "sess", ts=now))
+    db.append_event(_ev(101, "step.done", "p1", ts=now - 400 * DAY))  # no policy: kept
+
+    assert db.prune_events(["step.progress"], keep_last=10, batch_size=7) == 40
+    kept = [e["id"] for e in db.events_for_plan("p1", types=["step.progress"])]
+    assert kept == [f"p1-e{i:04d}" for i in range(20, 30)]
+    assert db.prune_events(["chat.*"], max_age_ms=30 * DAY, now_ms=now) == 1
+    assert [e["id"] for e in db.events_for_plan("sess")] == ["sess-e0100"]
+    assert db.event_summary("p1")["by_type"]["step.done"] == 1
+
+
+def test_terminal_plans_are_archived_rolled_up_and_space_reclaimed(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    now = int(time.time() * 1000)
+    _plan(db, "old", "DONE", now - 30 * DAY)
+    _plan(db, "live", "RUNNING", now - 30 * DAY)
+    for i in range(200):
+        db.append_event(_ev(i, "step.done", "old", payload={"i": i, "pad": "x" * 500}))
+    db.append_event(_ev(500, "plan.revised_to", "old"))
+
+    report = run_retention(db, policies=[], archive_after_days=7, archive_dir=str(tmp_path / "arch"))
+    assert report["plans_archived"] == 1
+    with gzip.open(report["archive_path"], "rt") as fh:
+        records = [json.loads(line) for line in fh]
+    assert [r["kind"] for r in records[:2]] == ["plan", "step"]
+    assert records[1]["output"]["content"] == BIG  # blobs are resolved in the archive
+    assert sum(r["kind"] == "event" for r in records) == 201
+
+    rollup = db.get_rollup("old")
+    assert rollup["events"] == {"step.done": 200, "plan.revised_to": 1} and rollup["steps"] == {"DONE": 1}
+    assert db.event_summary("old")["by_type"] == {"plan.revised_to": 1}  # revision links stay
+    assert db.get_steps("old")[0]["output"] is None
+    assert db.get_rollup("live") is None and db.get_steps("live")[0]["output"]["content"] == BIG
+    assert db.archivable_plans(now) == []
+
+    assert db.gc_blobs(min_age_ms=0)["count"] == 0  # "live" still shares the blob
+    db.upsert_step({**db.get_steps("live")[0], "output": None})
+    assert db.gc_blobs(min_age_ms=0)["count"] == 1
+
+    assert report["auto_vacuum"] == 2 and report["free_pages"] == 0
+    assert report["reclaimed_bytes"] > 100_000  # ~200 * 500 bytes of payloads
+    db.compact()
+    assert db.storage_stats()["wal_bytes"] == 0
+
+
+def test_archives_from_the_same_second_never_overwrite_each_other(tmp_path):
+    db = MemoryDB(str(tmp_path / "r.db"))
+    _plan(db, "a", "DONE", 1)
+    _plan(db, "b", "DONE", 1)
+    first = archive_plans(db, ["a"], archive_dir=str(tmp_path / "arch"))
+    second = archive_plans(db, ["b"], archive_dir=str(tmp_path / "arch"))
+    assert first["path"] != second["path"]
+    with gzip.open(first["path"], "rt") as fh:
+        assert json.loads(fh.readline())["id"] == "a"
@@ -0,0 +1,36 @@
+from services.retrieval.app.cache import SearchCache
+
+
+class _Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_are_keyed_on_normalized_query_and_k():
+    cache = SearchCache(max_entries=2, ttl_s=60)
+    assert cache.get("Deploy the API", 5) == (None, None)
+    cache.put("Deploy the API", 5, [0.1], [{"source": "a"}], cache.generation)
+    assert cache.get("  deploy THE\tapi ", 5) == ([0.1], [{"source": "a"}])
+    assert cache.get("deploy the api", 3) == (None, None)
+    cache.put("b", 5, [0.2], [], cache.generation)
+    assert cache.get("deploy the api", 5)[1] == [{"source": "a"}]  # now more recent than "b"
+    cache.put("c", 5, [0.3], [], cache.generation)  # evicts the least recently used
+    assert cache.get("b", 5) == (None, None) and len(cache) == 2
+    assert cache.stats == {"hits": 2, "misses": 3, "stale": 0}
+
+
+def test_ingest_generation_and_ttl_invalidate_results():
+    clock = _Clock()
+    cache = SearchCache(max_entries=10, ttl_s=30, clock=clock)
+    gen = cache.generation
+    cache.put("q", 5, [0.1], ["old"], gen)
+    cache.invalidate()
+    assert cache.get("q", 5) == ([0.1], None)  # vector still reusable, results are not
+    cache.put("q", 5, [0.1], ["raced"], gen)  # computed before the ingest: dropped
+    assert cache.get("q", 5) == ([0.1], None)
+    cache.put("q", 5, [0.1], ["new"], cache.generation)
+    assert cache.get("q", 5) == ([0.1], ["new"])
+    clock.now = 31
+    assert cache.get("q", 5) == (None, None) and len(cache) == 0
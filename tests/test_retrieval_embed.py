@@ -0,0 +1,59 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.retrieval.app import embed as embedder
+
+
+TEXTS = ["Hello world hello", "", "Ünïcode  Straße\tTEST", "the quick brown fox jumps over the lazy dog"]
+
+
+def test_embed_batch_matches_embed():
+    m = embedder.embed_batch(TEXTS)
+    assert m.dtype == np.float32 and m.shape == (len(TEXTS), embedder.DIM)
+    for row, text in zip(m, TEXTS):
+        np.testing.assert_allclose(row, embedder.embed(text), atol=1e-6)
+    assert not m[1].any()  # empty text stays a zero vector
+    assert embedder.embed_batch([]).shape == (0, embedder.DIM)
+
+
+def test_embed_batch_blocks_and_process_pool_agree(monkeypatch):
+    texts = [f"doc {i} token{i % 7} shared words" for i in range(300)]
+    single = embedder.embed_batch(texts, processes=1)
+    np.testing.assert_array_equal(embedder._embed_chunk(texts, block=64), single)
+    monkeypatch.setattr(embedder, "EMBED_PARALLEL_MIN", 100)
+    np.testing.assert_array_equal(embedder.embed_batch(texts, processes=2), single)
+    assert embedder._token_code.cache_info().hits > 0
+
+
+def test_pgvector_binary_codec_roundtrip():
+    from services.retrieval.app import pgvector
+
+    vec = embedder.embed_batch(["round trip"])[0]
+    data = pgvector._encode(vec)
+    assert len(data) == 4 + 4 * embedder.DIM
+    np.testing.assert_array_equal(pgvector._decode(data), vec)
+    np.testing.assert_array_equal(pgvector._decode(pgvector._encode([1.5, -2.0])), [1.5, -2.0])
+
+
+def test_register_vector_reports_a_missing_extension():
+    from services.retrieval.app import pgvector
+
+    class Conn:
+        def __init__(self, regtype):
+            self.regtype, self.codecs = regtype, []
+
+        async def fetchval(self, sql):
+            return self.regtype
+
+        async def set_type_codec(self, name, **kw):
+            self.codecs.append(name)
+
+    missing = Conn(None)
+    with pytest.raises(pgvector.VectorTypeMissing):
+        asyncio.run(pgvector.register_vector(missing))
+    assert missing.codecs == []
+    present = Conn("vector")
+    asyncio.run(pgvector.register_vector(present))
+    assert present.codecs == ["vector"]
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import threading
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+from services.retrieval.app import embed as embedder
+from services.retrieval.app import ingest
+
+
+class _Tables:
+    """In-memory facts/embeddings; the pending cursor applies _PENDING_SQL's predicate."""
+
+    def __init__(self, facts):
+        self.facts = dict(facts)
+        self.embeddings = {}
+        self.copies = 0
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, n):
+        out, self.rows = self.rows[:n], self.rows[n:]
+        return out
+
+
+class _Conn:
+    def __init__(self, tables):
+        self.t = tables
+        self.stage = []
+        self.in_tx = False
+
+    async def execute(self, sql, *args):
+        assert sql in (ingest._STAGE_SQL, ingest._MERGE_SQL)  # no DDL on the ingest path
+        if sql == ingest._MERGE_SQL:
+            assert self.in_tx
+            for id_, fact_id, vec, model, content_hash in self.stage:
+                self.t.embeddings[id_] = {"fact_id": fact_id, "vector": vec, "model": model, "content_hash": content_hash}
+
+    @asynccontextmanager
+    async def transaction(self, readonly=False):
+        self.in_tx = True
+        try:
+            yield
+        finally:
+            self.in_tx = False
+            self.stage = []  # ON COMMIT DELETE ROWS
+
+    async def cursor(self, sql, model):
+        assert sql == ingest._PENDING_SQL and self.in_tx
+        rows = []
+        for fid, content in sorted(self.t.facts.items()):
+            digest = hashlib.md5(content.encode()).hexdigest()
+            e = self.t.embeddings.get(f"emb_{fid}")
+            if e is None or e["content_hash"] != digest or e["model"] != model:
+                rows.append({"id": fid, "content": content, "content_hash": digest})
+        return _Cursor(rows)
+
+    async def copy_records_to_table(self, table, records):
+        assert table == "embeddings_stage" and self.in_tx
+        self.t.copies += 1
+        self.stage.extend(records)
+
+
+class _Pool:
+    def __init__(self, tables):
+        self.tables = tables
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield _Conn(self.tables)
+
+
+def _ingest(pool, **kw):
+    return asyncio.run(ingest.ingest_facts(pool, **kw))
+
+
+def test_ingest_embeds_only_new_changed_or_remodelled_facts(monkeypatch):
+    tables = _Tables({f"f{i}": f"fact number {i}" for i in range(5)})
+    pool = _Pool(tables)
+    threads, reports = [], []
+    batch = embedder.embed_batch
+
+    def tracked(texts):
+        threads.append(threading.get_ident())
+        return batch(texts)
+
+    monkeypatch.setattr(embedder, "embed_batch", tracked)
+
+    report = _ingest(pool, batch_size=2, progress=reports.append)
+    assert (report["embedded"], report["batches"]) == (5, 3) and len(reports) == 3
+    assert threading.get_ident() not in threads  # embedded off the event loop
+    row = tables.embeddings["emb_f3"]
+    assert row["fact_id"] == "f3" and row["model"] == ingest.EMBED_MODEL
+    np.testing.assert_allclose(row["vector"], embedder.embed("fact number 3"), atol=1e-6)
+
+    copies = tables.copies
+    assert _ingest(pool, batch_size=2)["embedded"] == 0 and tables.copies == copies
+
+    tables.facts["f1"] = "rewritten"
+    tables.facts["f9"] = "brand new"
+    assert _ingest(pool, batch_size=2)["embedded"] == 2
+    np.testing.assert_allclose(tables.embeddings["emb_f1"]["vector"], embedder.embed("rewritten"), atol=1e-6)
+
+    monkeypatch.setattr(ingest, "EMBED_MODEL", "other-model")
+    assert _ingest(pool, batch_size=100)["embedded"] == 6
+
+
+def test_ensure_schema_adds_content_hash_only_when_missing():
+    class Conn:
+        def __init__(self, has_column):
+            self.has_column, self.ddl = has_column, []
+
+        async def fetchval(self, sql):
+            assert sql == ingest._HAS_HASH_SQL
+            return 1 if self.has_column else None
+
+        async def execute(self, sql):
+            self.ddl.append(sql)
+
+    old, current = Conn(False), Conn(True)
+    asyncio.run(ingest.ensure_schema(old))
+    asyncio.run(ingest.ensure_schema(current))
+    assert len(old.ddl) == 1 and "content_hash" in old.ddl[0] and current.ddl == []
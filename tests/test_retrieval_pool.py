@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("asyncpg")
+from services.retrieval.app import main as retrieval  # noqa: E402
+
+
+class _Conn:
+    async def fetchval(self, sql):
+        return 1  # embeddings.content_hash exists
+
+    async def fetch(self, sql, vector, k):
+        return [{"source": "notes", "content": "pooled", "distance": 0.25}][:k]
+
+
+class _Pool:
+    def __init__(self):
+        self.exhausted = False
+        self.in_use = 0
+
+    async def acquire(self, timeout=None):
+        if self.exhausted:
+            raise asyncio.TimeoutError
+        self.in_use += 1
+        return _Conn()
+
+    async def release(self, conn):
+        self.in_use -= 1
+
+    def get_size(self):
+        return 3
+
+    def get_idle_size(self):
+        return 3 - self.in_use
+
+    def get_max_size(self):
+        return retrieval.POOL_MAX_SIZE
+
+    async def close(self):
+        pass
+
+
+def _timeouts():
+    return retrieval.REG.get_sample_value("retrieval_pg_pool_acquire_timeouts_total") or 0.0
+
+
+def test_one_pool_is_shared_and_exhaustion_is_a_503(monkeypatch):
+    created = []
+
+    async def create_pool(dsn, **kwargs):
+        created.append(kwargs)
+        return _Pool()
+
+    monkeypatch.setattr(retrieval.asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(retrieval, "_pool", None)
+    monkeypatch.setattr(retrieval, "SEARCH_CACHE", retrieval.SearchCache(max_entries=0))
+
+    with TestClient(retrieval.app) as client:  # startup opens the pool
+        for query in ("first", "second", "third"):
+            body = client.post("/v1/retrieval/search", json={"query": query, "k": 1}).json()
+            assert body["results"] == [{"source": "notes", "content": "pooled", "distance": 0.25}]
+        assert len(created) == 1 and created[0]["init"] is retrieval._init_connection
+        assert created[0]["max_size"] == retrieval.POOL_MAX_SIZE
+
+        before = _timeouts()
+        retrieval._pool.exhausted = True
+        res = client.post("/v1/retrieval/search", json={"query": "fourth", "k": 1})
+        assert res.status_code == 503
+        assert _timeouts() == before + 1
+
+        text = client.get("/metrics").text
+        assert 'retrieval_pg_pool_connections{state="idle"} 3.0' in text
+        assert 'retrieval_pg_pool_connections{state="in_use"} 0.0' in text
+        assert f'retrieval_pg_pool_connections{{state="max"}} {float(retrieval.POOL_MAX_SIZE)}' in text
+        assert "retrieval_pg_pool_waiting 0.0" in text
+        assert "retrieval_pg_pool_acquire_seconds_count" in text
+    assert retrieval._pool is None  # closed at shutdown
+
+
+def test_startup_survives_a_missing_vector_type_and_retries(monkeypatch):
+    attempts = []
+
+    async def create_pool(dsn, **kwargs):
+        attempts.append(1)
+        if len(attempts) <= 2:  # CREATE EXTENSION vector has not run yet
+            raise retrieval.VectorTypeMissing("type public.vector does not exist")
+        return _Pool()
+
+    monkeypatch.setattr(retrieval.asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(retrieval, "_pool", None)
+    monkeypatch.setattr(retrieval, "SEARCH_CACHE", retrieval.SearchCache(max_entries=0))
+
+    with TestClient(retrieval.app) as client:
+        assert client.get("/health").json() == {"ok": True}
+        assert client.post("/v1/retrieval/search", json={"query": "q", "k": 1}).status_code == 503
+        assert client.post("/v1/retrieval/search", json={"query": "q", "k": 1}).status_code == 200
+    assert len(attempts) == 3
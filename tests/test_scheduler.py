@@ -0,0 +1,142 @@
+import asyncio
+
+from olympus_memory import MemoryDB
+from apps.worker.olympus_worker.main import PlanExecutor, ToolRegistry
+from packages.plan.olympus_plan.models import CapabilityRef, Plan, PlanState, Step, StepState
+from packages.tools.olympus_tools.fs import ConsentToken
+
+CONSENT = ConsentToken(token="t", scopes=["*"])
+
+
+def _executor(tmp_path, order):
+    reg = ToolRegistry()
+
+    def rec(args, consent):
+        order.append(args["n"])
+        if args.get("fail"):
+            raise RuntimeError("boom")
+        return {"n": args["n"]}
+
+    reg.register("rec", rec, scopes=[])
+    return PlanExecutor(db=MemoryDB(str(tmp_path / "sched.db")), registry=reg)
+
+
+def _step(n, deps=(), **extra):
+    s = Step(name=n, capability=CapabilityRef(name="rec"), input={"n": n, **extra}, deps=[d.id for d in deps])
+    s.guard.max_retries = 0
+    return s
+
+
+def test_diamond_runs_in_dependency_order(tmp_path):
+    order = []
+    ex = _executor(tmp_path, order)
+    a = _step("a")
+    b, c = _step("b", [a]), _step("c", [a])
+    d = _step("d", [b, c])
+    plan = Plan(title="diamond", steps=[d, c, b, a])
+    asyncio.run(asyncio.wait_for(ex.run(plan, consent=CONSENT), 5))
+    assert plan.state == PlanState.DONE
+    assert order[0] == "a" and order[-1] == "d"
+    assert [e["type"] for e in ex.db.events_for_plan(plan.id)][-1] == "plan.done"
+
+
+def test_failure_stops_dispatch(tmp_path):
+    order = []
+    ex = _executor(tmp_path, order)
+    a = _step("a", fail=True)
+    b = _step("b", [a])
+    plan = Plan(title="fail", steps=[a, b])
+    asyncio.run(asyncio.wait_for(ex.run(plan, consent=CONSENT), 5))
+    assert plan.state == PlanState.FAILED
+    assert order == ["a"]
+    assert b.state == StepState.PENDING
+
+
+def test_unknown_tool_fails_instead_of_hanging(tmp_path):
+    ex = _executor(tmp_path, [])
+    s = Step(name="x", capability=CapabilityRef(name="nope"))
+    plan = Plan(title="unknown", steps=[s])
+    asyncio.run(asyncio.wait_for(ex.run(plan, consent=CONSENT), 5))
+    assert plan.state == PlanState.FAILED
+    assert "Unknown tool" in (s.error or "")
+
+
+def test_blocking_tools_run_off_the_event_loop(tmp_path):
+    import time
+
+    reg = ToolRegistry()
+    reg.register("sleep", lambda args, consent: time.sleep(0.3) or {}, scopes=[])
+    ex = PlanExecutor(db=MemoryDB(str(tmp_path / "pool.db")), registry=reg)
+    ex.sem = asyncio.Semaphore(4)
+    steps = [Step(name=f"s{i}", capability=CapabilityRef(name="sleep")) for i in range(3)]
+    plan = Plan(title="parallel", steps=steps)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await ex.run(plan, consent=CONSENT)
+        elapsed = time.perf_counter() - start
+        t.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(main())
+    reg.shutdown()
+    assert plan.state == PlanState.DONE
+    assert elapsed < 0.8  # serial execution would take >= 0.9s
+    assert ticks > 5  # the loop kept running while tools blocked
+
+
+def test_async_tools_and_progress_events(tmp_path):
+    from apps.worker.olympus_worker.main import ToolProgress
+
+    reg = ToolRegistry()
+
+    async def coro(args, consent):
+        await asyncio.sleep(0)
+        return {"kind": "coro"}
+
+    async def gen(args, consent):
+        yield ToolProgress(pct=50)
+        yield {"kind": "gen"}
+
+    reg.register("a.coro", coro, scopes=[])
+    reg.register("a.gen", gen, scopes=[])
+    assert reg.resolve("a.coro")["fn"] is None
+    ex = PlanExecutor(db=MemoryDB(str(tmp_path / "async.db")), registry=reg)
+    a = Step(name="a", capability=CapabilityRef(name="a.coro"))
+    b = Step(name="b", capability=CapabilityRef(name="a.gen"))
+    plan = Plan(title="async", steps=[a, b])
+    asyncio.run(asyncio.wait_for(ex.run(plan, consent=CONSENT), 5))
+    assert plan.state == PlanState.DONE
+    assert a.output == {"kind": "coro"} and b.output == {"kind": "gen"}
+    progress = [e for e in ex.db.events_for_plan(plan.id) if e["type"] == "step.progress"]
+    assert [e["payload"] for e in progress] == [{"pct": 50}]
+
+
+
+def test_http_client_is_per_loop_and_closed_with_its_loop():
+    reg = ToolRegistry()
+
+    async def clients():
+        return await reg._http_client(), await reg._http_client()
+
+    first, same = asyncio.run(clients())
+    assert first is same and first.is_closed  # closed by asyncio.run's shutdown
+    second, _ = asyncio.run(clients())
+    assert second is not first and second.is_closed
+    assert len(reg._http) == 0
+
+    async def explicit():
+        client = await reg._http_client()
+        await reg.aclose()
+        return client
+
+    assert asyncio.run(explicit()).is_closed
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from olympus_memory import MemoryDB
+from packages.memory.olympus_memory import migrate
+import apps.api.olympus_api.main as api
+from apps.api.olympus_api.planner import build_context_for_goal
+
+
+def _step(step_id, plan_id, output=None, error=None):
+    return {"id": step_id, "plan_id": plan_id, "name": f"run {step_id}", "state": "DONE", "attempts": 1,
+            "capability": {"name": "shell.run"}, "input": {}, "output": output, "error": error}
+
+
+def _chat(ev_id, plan_id, text, ts):
+    return {"id": ev_id, "ts": ts, "type": "chat.user", "plan_id": plan_id, "payload": {"text": text}}
+
+
+def test_search_ranks_across_kinds_and_tracks_writes(tmp_path):
+    db = MemoryDB(str(tmp_path / "s.db"))
+    db.add_fact("f1", "note", {"text": "the deploy pipeline uses kubernetes manifests"})
+    db.add_fact("f2", "note", {"text": "gardening tips"})
+    db.upsert_step(_step("s1", "p1"))
+    db.upsert_step(_step("s1", "p1", output={"stdout": "kubernetes rollout finished"}))
+    db.append_event(_chat("e1", "sess", "how do I roll back a kubernetes deploy?", 1))
+    db.append_event({"id": "e2", "ts": 2, "type": "step.progress", "plan_id": "p1", "payload": {"text": "kubernetes"}})
+
+    hits = db.search("Kubernetes deploy")
+    assert {(h["kind"], h["id"]) for h in hits} == {("fact", "f1"), ("step", "s1"), ("chat", "e1")}
+    assert hits == sorted(hits, key=lambda h: h["score"], reverse=True)
+    assert "[kubernetes]" in db.search("kubernetes", kinds=["step"])[0]["snippet"]
+    assert db.search('stdout "OR*') == []  # JSON keys are not indexed; operators are plain words
+
+    db.add_fact("f1", "note", {"text": "we moved to nomad"})  # re-indexed, same rowid
+    assert db.search("kubernetes", kinds=["fact"]) == []
+    assert [h["id"] for h in db.search("nomad")] == ["f1"]
+    db.upsert_step(_step("s1", "p1", output=None, error="exit 1: permission denied"))
+    assert [h["id"] for h in db.search("kubernetes rollout permission", kinds=["step"])] == ["s1"]
+    assert db.search("rollout", kinds=["step"]) == []
+    assert db.prune_events(["chat.*"], max_age_ms=0, now_ms=int(time.time() * 1000)) == 1
+    assert db.search("kubernetes", kinds=["chat"]) == []
+    with pytest.raises(ValueError):
+        db.search("x", kinds=["files"])
+
+
+def test_existing_rows_are_indexed_and_rebuild_is_idempotent(tmp_path):
+    db = MemoryDB(str(tmp_path / "s.db"))
+    db.add_fact("f1", "note", {"text": "sqlite fts5 bm25"})
+    with db._write() as conn:  # as if written before the index existed
+        conn.execute("DELETE FROM fts_facts")
+    assert db.search("bm25") == []
+    db.rebuild_search_index()
+    db.rebuild_search_index()
+    assert [h["id"] for h in db.search("bm25")] == ["f1"]
+
+
+def test_chat_history_query_and_planner_context(tmp_path, monkeypatch):
+    db = MemoryDB(str(tmp_path / "s.db"))
+    db.append_event(_chat("e1", "sess", "the staging database password rotates weekly", 1))
+    db.append_event(_chat("e2", "other", "staging database is down", 2))
+    db.add_fact("f1", "runbook", {"text": "restart the staging database with systemctl"})
+    monkeypatch.setattr(api, "DB", db)
+    client = TestClient(api.app)
+
+    body = client.get("/v1/chat/sess/history", params={"q": "staging password"}).json()
+    assert [e["type"] for e in body["events"]] == ["chat.user"] and "[password]" in body["events"][0]["snippet"]
+    assert len(client.get("/v1/chat/sess/history").json()["events"]) == 1
+    res = client.get("/v1/memory/search", params={"q": "staging database", "kind": ["fact", "chat"]}).json()
+    assert {r["id"] for r in res["results"]} == {"e1", "e2", "f1"}
+    assert client.get("/v1/memory/search", params={"q": "x", "kind": "nope"}).status_code == 400
+
+    monkeypatch.setenv("RETRIEVAL_URL", "http://127.0.0.1:9")  # retrieval service unavailable
+    ctx = build_context_for_goal("restart staging with systemctl", db=db)
+    assert ctx.startswith("MEMORY (fact: runbook f1)")
+
+
+def test_store_opens_and_search_falls_back_without_fts5(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrate, "fts5_available", lambda conn: False)
+    db = MemoryDB(str(tmp_path / "s.db"))
+    with db._write() as conn:
+        assert conn.execute("SELECT count(*) AS n FROM sqlite_master WHERE name LIKE 'fts_%'").fetchone()["n"] == 0
+    db.add_fact("f1", "note", {"text": "the deploy pipeline uses kubernetes"})
+    db.add_fact("f2", "note", {"text": "kubernetes 100%done"})
+    db.upsert_step(_step("s1", "p1", output={"stdout": "kubernetes rollout finished"}))
+    db.append_event(_chat("e1", "sess", "roll back a kubernetes deploy", 1))
+    db.append_event({"id": "e2", "ts": 2, "type": "step.progress", "plan_id": "p1", "payload": {"text": "kubernetes"}})
+
+    hits = db.search("Kubernetes deploy")
+    assert {(h["kind"], h["id"]) for h in hits} == {("fact", "f1"), ("fact", "f2"), ("step", "s1"), ("chat", "e1")}
+    assert {h["id"] for h in hits if h["score"] == 2} == {"f1", "e1"}
+    assert db.search("100_done") == []  # LIKE wildcards in terms are literal
+    assert [h["id"] for h in db.search("rollout", plan_id="p1")] == ["s1"]
+    db.rebuild_search_index()  # nothing to rebuild
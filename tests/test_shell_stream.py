@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+from packages.tools.olympus_tools import fs, shell
+from packages.tools.olympus_tools.fs import ConsentToken
+
+CONSENT = ConsentToken(token="t", scopes=["*"])
+
+
+def test_async_shell_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    seen = []
+    out = asyncio.run(
+        shell.run_shell_command_async(
+            "echo out; echo err 1>&2", token=CONSENT, on_output=lambda name, chunk: seen.append(name)
+        )
+    )
+    assert out["exit_code"] == 0
+    assert out["stdout"] == "out\n" and out["stderr"] == "err\n"
+    assert set(seen) == {"stdout", "stderr"}
+    assert out["truncated"] is False and out["stdout_log"] is None
+    slow = asyncio.run(shell.run_shell_command_async(["sleep", "5"], timeout=1, token=CONSENT))
+    assert slow["exit_code"] == 124 and "TIMEOUT" in slow["stderr"]
+
+
+def test_large_output_is_bounded_and_spilled(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    out = asyncio.run(
+        shell.run_shell_command_async(
+            "head -c 1000000 /dev/zero | tr '\\0' x; printf END",
+            token=CONSENT,
+            head_bytes=100,
+            tail_bytes=200,
+        )
+    )
+    assert out["stdout_bytes"] == 1_000_003
+    assert out["truncated"] is True
+    assert out["stdout"].startswith("x" * 100) and out["stdout"].endswith("END")
+    assert len(out["stdout"]) < 400
+    log = os.path.join(str(tmp_path), out["stdout_log"])
+    assert os.path.getsize(log) == 1_000_003
+
+
+def test_shell_run_emits_progress(tmp_path, monkeypatch):
+    from apps.worker.olympus_worker import main as worker
+
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(worker, "SHELL_PROGRESS_INTERVAL_MS", 50)
+    reg = worker.ToolRegistry()
+    progress = []
+    out = asyncio.run(
+        reg.invoke(
+            reg.resolve("shell.run"),
+            {"cmd": "echo hi; sleep 0.3; echo bye"},
+            CONSENT,
+            on_progress=progress.append,
+        )
+    )
+    assert out["stdout"] == "hi\nbye\n"
+    assert progress and progress[-1]["stdout_bytes"] >= 3
+
+
+def test_cancelled_shell_run_kills_and_reaps_the_child(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    procs = []
+    spawn = asyncio.create_subprocess_exec
+
+    async def recording_spawn(*args, **kwargs):
+        procs.append(await spawn(*args, **kwargs))
+        return procs[-1]
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", recording_spawn)
+
+    async def cancel_midway():
+        task = asyncio.create_task(shell.run_shell_command_async(["sleep", "30"], token=CONSENT))
+        while not procs:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert procs[0].returncode is not None  # reaped before the cancel returned, not a zombie
+
+    asyncio.run(asyncio.wait_for(cancel_midway(), 5))
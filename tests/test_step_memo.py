@@ -0,0 +1,99 @@
+import asyncio
+import os
+
+from olympus_memory import MemoryDB
+from apps.worker.olympus_worker import memo
+from apps.worker.olympus_worker.main import PlanExecutor
+from packages.plan.olympus_plan.models import CapabilityRef, Plan, Step
+from packages.tools.olympus_tools import fs
+from packages.tools.olympus_tools.fs import ConsentToken
+
+CONSENT = ConsentToken(token="t", scopes=["*"])
+
+
+def _read_plan(path="notes.txt"):
+    return Plan(title="read", steps=[Step(name="r", capability=CapabilityRef(name="fs.read"), input={"path": path})])
+
+
+def _run(ex, plan):
+    asyncio.run(asyncio.wait_for(ex.run(plan, consent=CONSENT), 5))
+    return [e["type"] for e in ex.db.events_for_plan(plan.id)]
+
+
+def test_memoized_read_hits_until_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    (tmp_path / "notes.txt").write_text("v1")
+    ex = PlanExecutor(db=MemoryDB(str(tmp_path / "memo.db")), memoize=True)
+
+    assert "step.cache_hit" not in _run(ex, _read_plan())
+    second = _read_plan()
+    assert "step.cache_hit" in _run(ex, second)
+    assert second.steps[0].output["content"] == "v1"
+
+    (tmp_path / "notes.txt").write_text("v2 changed")
+    third = _read_plan()
+    assert "step.cache_hit" not in _run(ex, third)
+    assert third.steps[0].output["content"] == "v2 changed"
+
+
+def test_memoization_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    (tmp_path / "notes.txt").write_text("v1")
+    ex = PlanExecutor(db=MemoryDB(str(tmp_path / "memo.db")), memoize=False)
+    _run(ex, _read_plan())
+    assert "step.cache_hit" not in _run(ex, _read_plan())
+    first, second = _read_plan(), _read_plan()
+    first.metadata["memoize"] = second.metadata["memoize"] = True  # per-plan opt-in
+    _run(ex, first)
+    assert "step.cache_hit" in _run(ex, second)
+
+
+def test_memo_key_tracks_directory_listing(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    os.makedirs(tmp_path / "src")
+    args = {"pattern": "*.py", "start": "src"}
+    k1 = memo.memo_key("fs.glob", args)
+    assert k1 == memo.memo_key("fs.glob", dict(reversed(list(args.items()))))
+    (tmp_path / "src" / "a.py").write_text("")
+    assert memo.memo_key("fs.glob", args) != k1
+    assert memo.memo_key("fs.write", {"path": "x"}) is None
+    assert memo.memo_key("fs.read", {"path": "missing.txt"}) is None
+
+
+def test_memo_key_tracks_in_place_edits_in_listings_and_git(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    (tmp_path / "a.txt").write_text("x")
+    listing = memo.memo_key("fs.list", {"path": "/"})
+    dir_mtime = os.stat(tmp_path).st_mtime_ns
+    with open(tmp_path / "a.txt", "a") as f:  # same name, directory mtime unchanged
+        f.write("y" * 5000)
+    assert os.stat(tmp_path).st_mtime_ns == dir_mtime
+    assert memo.memo_key("fs.list", {"path": "/"}) != listing
+
+    (tmp_path / ".git" / "objects").mkdir(parents=True)
+    (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    status = memo.memo_key("git.status", {"workdir": "/"})
+    (tmp_path / ".git" / "objects" / "ab").write_bytes(b"packed")  # not read by the fingerprint
+    assert memo.memo_key("git.status", {"workdir": "/"}) == status
+    (tmp_path / ".git" / "index").write_bytes(b"staged")
+    staged = memo.memo_key("git.status", {"workdir": "/"})
+    assert staged != status
+    (tmp_path / "a.txt").write_text("z")
+    assert memo.memo_key("git.status", {"workdir": "/"}) != staged
+
+
+def test_memo_hit_requires_the_scope_the_tool_enforces(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs, "SANDBOX_ROOT", str(tmp_path))
+    monkeypatch.setattr(fs, "REQUIRE_CONSENT", True)
+    (tmp_path / "a.py").write_text("")
+    ex = PlanExecutor(db=MemoryDB(str(tmp_path / "memo.db")), memoize=True)
+
+    def glob_plan():
+        return Plan(title="glob", steps=[Step(name="g", capability=CapabilityRef(name="fs.glob"), input={"pattern": "*.py"})])
+
+    _run(ex, glob_plan())  # cached under a "*" token
+    plan = glob_plan()
+    asyncio.run(asyncio.wait_for(ex.run(plan, consent=ConsentToken(token="t", scopes=["list_fs"])), 5))
+    types = [e["type"] for e in ex.db.events_for_plan(plan.id)]
+    assert "step.cache_hit" not in types
+    assert plan.steps[0].state.value == "FAILED" and "search_fs" in plan.steps[0].error
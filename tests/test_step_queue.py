@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from olympus_memory import MemoryDB
+from apps.worker.olympus_worker import queue_worker
+from apps.worker.olympus_worker.main import PlanExecutor, ToolRegistry
+from apps.worker.olympus_worker.queue_worker import StepWorker, enqueue_plan
+from packages.plan.olympus_plan.models import CapabilityRef, Plan, Step
+from packages.tools.olympus_tools.fs import ConsentToken
+
+CONSENT = ConsentToken(token="t", scopes=["*"])
+
+
+@pytest.fixture(autouse=True)
+def _heartbeat_to_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(queue_worker, "HEARTBEAT_PATH", str(tmp_path / "worker.json"))
+
+
+def _step(n, deps=(), **extra):
+    s = Step(name=n, capability=CapabilityRef(name="rec"), input={"n": n, **extra}, deps=[d.id for d in deps])
+    s.guard.max_retries = 0
+    return s
+
+
+def _worker(path, wid, order):
+    reg = ToolRegistry()
+
+    async def rec(args, consent):
+        await asyncio.sleep(0.01)
+        order.append((wid, args["n"]))
+        if args.get("fail"):
+            raise RuntimeError("boom")
+        return {"n": args["n"]}
+
+    reg.register("rec", rec, scopes=[])
+    db = MemoryDB(path)
+    return StepWorker(db=db, executor=PlanExecutor(db=db, registry=reg), worker_id=wid, concurrency=2)
+
+
+def _save(db, plan):
+    PlanExecutor(db=db)._persist_plan(plan)
+
+
+def test_lease_claim_expiry_and_ack(tmp_path):
+    db = MemoryDB(str(tmp_path / "q.db"))
+    a = _step("a")
+    plan = Plan(title="one", steps=[a])
+    _save(db, plan)
+    assert enqueue_plan(db, plan.id, CONSENT)["enqueued"] == 1
+    assert enqueue_plan(db, plan.id, CONSENT)["enqueued"] == 0  # idempotent
+
+    item = db.claim_step("w1", lease_ms=50)
+    assert item["step_id"] == a.id and item["deliveries"] == 1
+    assert item["consent"] == {"token": "t", "scopes": ["*"]}
+    assert db.claim_step("w2", lease_ms=50) is None  # leased
+    time.sleep(0.08)
+    item = db.claim_step("w2", lease_ms=10_000)  # lapsed lease is redelivered
+    assert item["deliveries"] == 2
+    assert not db.heartbeat_lease(a.id, "w1", 1000)
+    assert not db.ack_step(a.id, "w1")  # stale holder cannot ack
+    assert db.heartbeat_lease(a.id, "w2", 1000)
+    assert db.ack_step(a.id, "w2")
+    assert db.queue_stats() == {"ready": 0, "leased": 0}
+    db.close()
+
+
+def test_two_workers_complete_diamond(tmp_path):
+    path = str(tmp_path / "shared.db")
+    a = _step("a")
+    b, c = _step("b", [a]), _step("c", [a])
+    d = _step("d", [b, c])
+    plan = Plan(title="diamond", steps=[d, c, b, a])
+    db = MemoryDB(path)
+    _save(db, plan)
+    enqueue_plan(db, plan.id, CONSENT)
+
+    order = []
+    w1, w2 = _worker(path, "w1", order), _worker(path, "w2", order)
+
+    async def run():
+        await asyncio.gather(w1.run_forever(stop_when_idle=True), w2.run_forever(stop_when_idle=True))
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    names = [n for _, n in order]
+    assert sorted(names) == ["a", "b", "c", "d"]
+    assert names[0] == "a" and names[-1] == "d"
+    assert db.get_plan(plan.id)["state"] == "DONE"
+    types = [e["type"] for e in db.events_for_plan(plan.id)]
+    assert types.count("plan.started") == 1 and types.count("plan.done") == 1
+
+
+def test_failure_drops_remaining_steps(tmp_path):
+    path = str(tmp_path / "fail.db")
+    a = _step("a", fail=True)
+    b = _step("b", [a])
+    plan = Plan(title="fail", steps=[a, b])
+    db = MemoryDB(path)
+    _save(db, plan)
+    enqueue_plan(db, plan.id, CONSENT)
+    order = []
+    asyncio.run(asyncio.wait_for(_worker(path, "w1", order).run_forever(stop_when_idle=True), 10))
+    assert [n for _, n in order] == ["a"]
+    assert db.get_plan(plan.id)["state"] == "FAILED"
+    assert db.queue_stats() == {"ready": 0, "leased": 0}
+
+
+def test_redelivery_limit_fails_step(tmp_path, monkeypatch):
+    monkeypatch.setattr(queue_worker, "MAX_DELIVERIES", 1)
+    path = str(tmp_path / "redeliver.db")
+    a = _step("a")
+    plan = Plan(title="crashy", steps=[a])
+    db = MemoryDB(path)
+    _save(db, plan)
+    enqueue_plan(db, plan.id, CONSENT)
+    db.claim_step("dead-worker", lease_ms=1)  # claimed, then the worker "crashes"
+    time.sleep(0.01)
+    order = []
+    asyncio.run(asyncio.wait_for(_worker(path, "w1", order).run_forever(stop_when_idle=True), 10))
+    assert order == []
+    assert db.get_steps(plan.id)[0]["state"] == "FAILED"
+    assert db.get_plan(plan.id)["state"] == "FAILED"
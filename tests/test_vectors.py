@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from olympus_memory import MemoryDB
+from packages.memory.olympus_memory import vectors
+
+
+def _clustered(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(0, 20, n)] + 0.2 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _load(db, x):
+    db.put_embeddings({"id": f"e{i}", "vector": v.tobytes(), "dim": len(v), "meta": {"even": i % 2 == 0}}
+                      for i, v in enumerate(x))
+
+
+def test_ivf_knn_matches_exact_scan_and_persists(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectors, "VECTOR_FLAT_MAX", 100)  # force clustering on a small table
+    x = _clustered(2000)
+    db = MemoryDB(str(tmp_path / "v.db"))
+    _load(db, x)
+    hits = db.knn(x[3], k=5)
+    assert hits[0]["id"] == "e3" and hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert db.vector_index_stats()["nlist"] > 1
+    recall = np.mean([
+        len({h["id"] for h in db.knn(q, 10)} & {h["id"] for h in db.knn(q, 10, nprobe=0)}) / 10 for q in x[:20]
+    ])
+    assert recall >= 0.9
+
+    other = MemoryDB(str(tmp_path / "v.db"))  # another process: maps the saved index
+    assert [h["id"] for h in other.knn(x[3], k=5)] == [h["id"] for h in hits]
+    assert other.vector_index_stats()["builds"] == 0
+    with pytest.raises(ValueError):
+        other.knn([1.0, 2.0], k=1)
+
+
+def test_knn_sees_writes_and_deletes_through_the_log(tmp_path):
+    x = _clustered(300)
+    db = MemoryDB(str(tmp_path / "v.db"))
+    _load(db, x)
+    assert db.knn(x[0], k=1)[0]["id"] == "e0"
+    db.put_embedding("twin", list(x[0] * 3), 16, {"even": False})  # same direction
+    db.put_embedding("e1", x[0].tobytes(), 16, {"even": False})  # moved onto e0
+    assert {h["id"] for h in db.knn(x[0], k=3)} == {"e0", "e1", "twin"}
+    db.delete_embeddings(["e0", "twin"])
+    assert [h["id"] for h in db.knn(x[0], k=1)] == ["e1"]
+    stats = db.vector_index_stats()
+    assert stats["builds"] == 1 and stats["masked"] == 3
+
+
+def test_knn_filter_and_rebuild_after_many_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectors, "VECTOR_REBUILD_MIN", 10)
+    x = _clustered(200)
+    db = MemoryDB(str(tmp_path / "v.db"))
+    _load(db, x)
+    hits = db.knn(x[1], k=5, filter={"even": True})
+    assert len(hits) == 5 and all(h["meta"]["even"] for h in hits)
+    assert db.knn(x[1], k=3, filter=lambda m: not m["even"])[0]["id"] == "e1"
+
+    db.delete_embeddings([f"e{i}" for i in range(100)])
+    assert db.knn(x[1], k=1)[0]["id"] not in {f"e{i}" for i in range(100)}
+    stats = db.vector_index_stats()
+    assert stats["builds"] == 2 and stats["rows"] == 100 and stats["masked"] == 0
+    with db._read() as conn:
+        assert conn.execute("SELECT COUNT(*) AS n FROM embedding_log").fetchone()["n"] == 0